@@ -20,11 +20,24 @@ import cherrypy
 
 from arestor.api import base as api_base
 from arestor.api import admin as api_admin
+from arestor.api import metrics as api_metrics
 from arestor.api import v1 as api_v1
 from arestor import config as arestor_config
+from arestor.common import metrics as arestor_metrics
+from arestor.common import profiler as arestor_profiler
+from arestor.common import timeline as arestor_timeline
+from arestor.common import timing as arestor_timing
+from arestor.common import tracing as arestor_tracing
 from arestor.common import tools as arestor_tools
 
 cherrypy.tools.user_required = arestor_tools.UserManager()
+cherrypy.tools.metrics = arestor_metrics.RequestMetrics()
+cherrypy.tools.storage_debug = arestor_metrics.StorageDebug()
+cherrypy.tools.profiler = arestor_profiler.RequestProfiler()
+cherrypy.tools.slow_requests = arestor_timing.SlowRequestLog()
+cherrypy.tools.timeline = arestor_timeline.TimelineRecorder()
+cherrypy.tools.tracing = arestor_tracing.RequestTracer()
+cherrypy.engine.subscribe("start", arestor_timing.stamp_connections)
 CONFIG = arestor_config.CONFIG
 
 
@@ -35,6 +48,7 @@ class Root(api_base.BaseAPI):
     resources = [
         ("admin", api_admin.AdminEndpoint),
         ("v1", api_v1.ArestorV1),
+        ("metrics", api_metrics.MetricsEndpoint),
     ]
 
     @classmethod
@@ -51,6 +65,13 @@ class Root(api_base.BaseAPI):
                 'server.thread_pool': CONFIG.api.thread_pool,
             },
             '/': {
-                'request.dispatch': api_base.MethodDispatcher()
+                'request.dispatch': api_base.MethodDispatcher(),
+                'tools.metrics.on': CONFIG.api.metrics,
+                'tools.storage_debug.on': CONFIG.api.debug_storage,
+                'tools.profiler.on': True,
+                'tools.slow_requests.on': (
+                    CONFIG.api.slow_request_threshold > 0),
+                'tools.timeline.on': CONFIG.api.timeline,
+                'tools.tracing.on': CONFIG.tracing.enabled,
             }
         }
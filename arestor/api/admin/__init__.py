@@ -15,7 +15,15 @@
 
 """Admin endpoint for the Arestor API."""
 
+from arestor.api.admin import batch
+from arestor.api.admin import configdrive
+from arestor.api.admin import fleet
+from arestor.api.admin import memory
+from arestor.api.admin import network
+from arestor.api.admin import profiler
 from arestor.api.admin import resource
+from arestor.api.admin import template
+from arestor.api.admin import timeline
 from arestor.api import base as base_api
 
 
@@ -25,6 +33,14 @@ class AdminEndpoint(base_api.BaseAPI):
 
     resources = [
         ("resource", resource.ResourceEndpoint),
+        ("batch", batch.BatchEndpoint),
+        ("configdrive", configdrive.ConfigDriveEndpoint),
+        ("template", template.TemplateEndpoint),
+        ("network", network.NetworkEndpoint),
+        ("fleet", fleet.FleetEndpoint),
+        ("profiler", profiler.ProfilerEndpoint),
+        ("memory", memory.MemoryEndpoint),
+        ("timeline", timeline.TimelineEndpoint),
     ]
     """A list that contains all the resources (endpoints) available for the
     current metadata service."""
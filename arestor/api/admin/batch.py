@@ -0,0 +1,99 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for creating multiple resources at once."""
+
+import collections
+import json
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor.api import schema
+from arestor.common import blob
+from arestor.common import constant
+from arestor.common import profile
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+_DESCRIPTION_FIELDS = ("client_id", "namespace", "resource")
+
+
+class BatchEndpoint(base_api.Resource):
+
+    """Create multiple resources with a single request.
+
+    The `resources` parameter must contain a JSON list of resource
+    descriptions, each of them having the same format as the content
+    expected by the resource management endpoint.
+    """
+
+    exposed = True
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def POST(self, resources=None):
+        """Create all the received resources."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        try:
+            descriptions = json.loads(resources or "[]")
+        except ValueError:
+            descriptions = None
+
+        if not isinstance(descriptions, list):
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = "Malformed resources description."
+            cherrypy.response.status = 400
+            return response
+
+        connection = self._redis.rcon
+        writes = []
+        written = collections.defaultdict(set)
+        keys = []
+        for description in descriptions:
+            if (not isinstance(description, dict) or
+                    not all(description.get(field)
+                            for field in _DESCRIPTION_FIELDS)):
+                response["meta"]["status"] = False
+                response["meta"]["verbose"] = ("Incomplete resource "
+                                               "description.")
+                cherrypy.response.status = 400
+                return response
+
+            key = constant.KEY_FORMAT.format(
+                user=description["client_id"],
+                namespace=description["namespace"],
+                name=description["resource"])
+            writes.append((key, dict(
+                (name, value) for name, value in description.items()
+                if name not in _DESCRIPTION_FIELDS)))
+            written[(description["namespace"],
+                     description["client_id"])].add(description["resource"])
+            keys.append(key)
+
+        # NOTE: All the writes are sent to the database in a single
+        # round trip (after the previous values are read, in order to
+        # release the blobs which are overwritten).
+        blob.write(connection, writes)
+        for (namespace, client_id), names in written.items():
+            schema.refresh_derived(connection, namespace, client_id, names)
+            profile.invalidate(namespace, client_id)
+        response["content"] = keys
+        return response
@@ -0,0 +1,83 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for config drive images."""
+
+from concurrent import futures
+import json
+import subprocess
+
+import cherrypy
+from cherrypy.lib import static
+from oslo_log import log as logging
+
+from arestor.api import base as base_api
+from arestor.api.v1 import openstack
+from arestor import config as arestor_config
+from arestor.common import configdrive
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+
+def _error(status, verbose):
+    """Return the representation of an error."""
+    cherrypy.response.status = status
+    cherrypy.response.headers['Content-Type'] = 'application/json'
+    return arestor_util.get_as_bytes(json.dumps(
+        {"meta": {"status": False, "verbose": verbose}, "content": None}))
+
+
+class ConfigDriveEndpoint(base_api.Resource):
+
+    """Render the OpenStack metadata of an instance as a config drive.
+
+    The image is streamed in chunks. While the image is built the request
+    waits for at most `build_timeout` seconds, after that the client is
+    asked to retry later (202 Accepted).
+    """
+
+    exposed = True
+    _cp_config = {"response.stream": True}
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    def GET(self, client_id=None):
+        """Return the config drive image for the required instance."""
+        if not client_id:
+            return _error(400, "The client_id is required.")
+
+        files = openstack.config_drive_files(self._redis.rcon, client_id)
+        try:
+            build = configdrive.BUILDER.build(files)
+        except ValueError as exc:
+            return _error(400, str(exc))
+        try:
+            path = build.result(timeout=CONFIG.configdrive.build_timeout)
+        except futures.TimeoutError:
+            cherrypy.response.headers["Retry-After"] = "1"
+            return _error(202, "The image is being built.")
+        except (OSError, subprocess.CalledProcessError) as exc:
+            LOG.error("Failed to build the config drive for %s: %s",
+                      client_id, exc)
+            return _error(500, "Failed to build the config drive.")
+
+        return static.serve_file(path, "application/x-iso9660-image",
+                                 "attachment", "%s.iso" % client_id)
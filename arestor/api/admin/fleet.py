@@ -0,0 +1,215 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for creating fleets of instances."""
+
+import json
+import uuid
+
+import cherrypy
+from oslo_log import log as logging
+
+from arestor.api import base as base_api
+from arestor.api import schema
+from arestor import config as arestor_config
+from arestor.common import blob
+from arestor.common import constant
+from arestor.common import profile
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+DEFAULT_PREFIX = "instance-"
+
+
+def _error(status, verbose):
+    """Return the representation of an error."""
+    cherrypy.response.status = status
+    cherrypy.response.headers['Content-Type'] = 'application/json'
+    return arestor_util.get_as_bytes(json.dumps(
+        {"meta": {"status": False, "verbose": verbose}, "content": None}))
+
+
+def _uuid_generator(_):
+    """Return a generator for random UUIDs."""
+    return lambda index, client_id: str(uuid.uuid4())
+
+
+def _index_generator(description):
+    """Return a generator for the position of the instance in the fleet."""
+    start = int(description.get("start", 0))
+    return lambda index, client_id: start + index
+
+
+def _format_generator(description):
+    """Return a generator which formats a string for every instance.
+
+    The `{index}` and `{client_id}` placeholders are available.
+    """
+    template = description["format"]
+    start = int(description.get("start", 0))
+    return lambda index, client_id: template.format(index=start + index,
+                                                    client_id=client_id)
+
+
+_GENERATORS = {
+    "uuid": _uuid_generator,
+    "index": _index_generator,
+    "format": _format_generator,
+}
+
+
+class Fleet(object):
+
+    """The description of a fleet of instances.
+
+    ::
+        {
+            "namespace": "openstack",
+            "count": 1000,              # or "ids": ["instance-1", ...]
+            "prefix": "instance-web-",  # used with count
+            "resources": {"availability_zone": "nova", ...},
+            "generators": {
+                "uuid": {"type": "uuid"},
+                "hostname": {"type": "format", "format": "web-{index}"},
+                "launch_index": {"type": "index", "start": 0}
+            }
+        }
+
+    :raises ValueError: if the description is not valid
+    """
+
+    def __init__(self, description):
+        if not isinstance(description, dict):
+            raise ValueError("The fleet description must be an object.")
+
+        self.namespace = description.get("namespace")
+        if not self.namespace:
+            raise ValueError("The namespace is required.")
+
+        if "ids" in description:
+            self.client_ids = [str(client_id)
+                               for client_id in description["ids"]]
+        else:
+            prefix = description.get("prefix", DEFAULT_PREFIX)
+            self.client_ids = ["%s%d" % (prefix, index)
+                               for index in range(int(description["count"]))]
+        if len(self.client_ids) > CONFIG.api.fleet_max_size:
+            raise ValueError("The fleet can contain at most %d instances." %
+                             CONFIG.api.fleet_max_size)
+
+        self.resources = description.get("resources") or {}
+        generators = description.get("generators") or {}
+        if not isinstance(self.resources, dict):
+            raise ValueError("The resources must be an object.")
+        if not isinstance(generators, dict):
+            raise ValueError("The generators must be an object.")
+
+        self.generators = {}
+        for name, generator in generators.items():
+            try:
+                factory = _GENERATORS[generator["type"]]
+            except (KeyError, TypeError):
+                raise ValueError("Invalid generator for %r." % name)
+            self.generators[name] = factory(generator)
+
+        # NOTE: The serialized values and the derived resources which
+        # depend only on them are the same for all the instances.
+        self._static = dict((name, json.dumps(value))
+                            for name, value in self.resources.items()
+                            if name not in self.generators)
+        self._derived = schema.derived_resources(
+            self.namespace, set(self.resources) | set(self.generators))
+
+        # NOTE: The generators fail for the first instance as well, before
+        # anything is written.
+        if self.client_ids:
+            try:
+                self.instance(0, self.client_ids[0])
+            except (KeyError, IndexError, ValueError) as exc:
+                raise ValueError("Invalid generator: %s." % exc)
+
+    def instance(self, index, client_id):
+        """Return the (decoded values, serialized values) of an instance."""
+        values = dict(self.resources)
+        serialized = dict(self._static)
+        for name, generator in self.generators.items():
+            values[name] = generator(index, client_id)
+            serialized[name] = json.dumps(values[name])
+        return values, serialized
+
+    def write(self, connection, start, client_ids):
+        """Write a chunk of instances to the database."""
+        writes = []
+        pipeline = connection.pipeline(transaction=False)
+        for offset, client_id in enumerate(client_ids):
+            values, serialized = self.instance(start + offset, client_id)
+            for name, value in serialized.items():
+                key = constant.KEY_FORMAT.format(
+                    namespace=self.namespace, user=client_id, name=name)
+                writes.append((key, {"data": value}))
+            schema.write_derived(pipeline, self.namespace, client_id,
+                                 self._derived, values)
+
+        blob.write(connection, writes)
+        pipeline.execute()
+        for client_id in client_ids:
+            profile.invalidate(self.namespace, client_id)
+
+
+class FleetEndpoint(base_api.Resource):
+
+    """Create a fleet of instances from a single description.
+
+    The instances are written in chunks and the ids of the instances are
+    streamed back (one JSON document per line) after every chunk.
+    """
+
+    exposed = True
+    _cp_config = {"response.stream": True}
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    def POST(self, fleet=None):
+        """Create all the instances from the fleet."""
+        try:
+            fleet = Fleet(json.loads(fleet or "null"))
+        except (ValueError, KeyError, TypeError) as exc:
+            return _error(400, "Invalid fleet description: %s" % exc)
+
+        connection = self._redis.rcon
+        chunk_size = CONFIG.api.fleet_chunk_size
+
+        def _stream():
+            """Write the chunks and report the created instances."""
+            for start in range(0, len(fleet.client_ids), chunk_size):
+                client_ids = fleet.client_ids[start:start + chunk_size]
+                try:
+                    fleet.write(connection, start, client_ids)
+                except Exception as exc:
+                    LOG.exception("Failed to create the fleet: %s", exc)
+                    yield arestor_util.get_as_bytes(json.dumps(
+                        {"error": str(exc)}) + "\n")
+                    return
+                yield arestor_util.get_as_bytes(json.dumps(
+                    {"created": client_ids}) + "\n")
+
+        cherrypy.response.headers['Content-Type'] = 'application/x-ndjson'
+        return _stream()
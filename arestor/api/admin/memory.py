@@ -0,0 +1,113 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for the memory usage of the running server."""
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor import config as arestor_config
+from arestor.common import memory
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+
+class MemoryEndpoint(base_api.Resource):
+
+    """Report the memory usage and trace the allocations on demand.
+
+    The allocations are traced only during a diagnostic session, which is
+    started with `POST action=start` and which stops on its own after the
+    required duration (or with `DELETE`).
+    """
+
+    exposed = True
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def GET(self, snapshot=None, compare=None, limit=20, group_by="lineno"):
+        """Return the memory usage or the allocations from a snapshot.
+
+        When `compare` is provided the difference between `snapshot` and
+        the `compare` snapshot is returned.
+        """
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        if not snapshot:
+            content = memory.usage()
+            content["tracing"] = memory.TRACER.status()
+            response["content"] = content
+            return response
+
+        if group_by not in memory.GROUP_BY:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = "Invalid group_by %r." % group_by
+            cherrypy.response.status = 400
+            return response
+
+        try:
+            if compare:
+                response["content"] = memory.TRACER.compare(
+                    snapshot, compare, int(limit), group_by)
+            else:
+                response["content"] = memory.TRACER.top(
+                    snapshot, int(limit), group_by)
+        except ValueError as exc:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = str(exc)
+            cherrypy.response.status = 404
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def POST(self, action="snapshot", duration=300, frames=1):
+        """Start a diagnostic session or take a snapshot."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        try:
+            if action == "start":
+                duration = float(duration)
+                if not 0 < duration <= CONFIG.api.memory_max_duration:
+                    raise ValueError("The duration must be between 0 and "
+                                     "%d seconds." %
+                                     CONFIG.api.memory_max_duration)
+                memory.TRACER.start(duration, int(frames))
+                response["content"] = memory.TRACER.status()
+            elif action == "snapshot":
+                response["content"] = {"id": memory.TRACER.snapshot()}
+            else:
+                raise ValueError("Invalid action %r." % action)
+        except ValueError as exc:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = str(exc)
+            cherrypy.response.status = 400
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def DELETE(self):
+        """Stop tracing the allocations and drop the snapshots."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+        memory.TRACER.stop(drop=True)
+        response["content"] = memory.TRACER.status()
+        return response
@@ -0,0 +1,95 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for the source address mappings."""
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor.common import network
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+
+class NetworkEndpoint(base_api.Resource):
+
+    """Map networks (in CIDR notation) to instances.
+
+    The mappings are used in order to identify the instance by the source
+    address of the request, when the `source_ip_lookup` option is set.
+    """
+
+    exposed = True
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def GET(self, address=None):
+        """Return all the mappings or the instance of the given address."""
+        connection = self._redis.rcon
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        if address:
+            response["content"] = network.INDEX.lookup(address, connection)
+            if response["content"] is None:
+                response["meta"]["status"] = False
+                response["meta"]["verbose"] = "Mapping not found"
+            return response
+
+        response["content"] = network.INDEX.mappings(connection)
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def POST(self, network_id=None, client_id=None):
+        """Map the network to the instance."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        if not all([network_id, client_id]):
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = "Incomplete mapping description."
+            cherrypy.response.status = 400
+            return response
+
+        try:
+            network_id = network.INDEX.add(self._redis.rcon, network_id,
+                                           client_id)
+        except ValueError as exc:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = str(exc)
+            cherrypy.response.status = 400
+            return response
+
+        response["content"] = {network_id: client_id}
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def DELETE(self, network_id):
+        """Remove the mapping of the network."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        try:
+            network.INDEX.remove(self._redis.rcon, network_id)
+        except ValueError as exc:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = str(exc)
+            cherrypy.response.status = 400
+        return response
@@ -0,0 +1,123 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for profiling the running server."""
+
+import json
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor import config as arestor_config
+from arestor.common import profiler as arestor_profiler
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+
+def _response(content=None, status=True, verbose="Ok", code=None):
+    """Return the JSON representation of the response."""
+    if code:
+        cherrypy.response.status = code
+    cherrypy.response.headers['Content-Type'] = 'application/json'
+    return arestor_util.get_as_bytes(json.dumps(
+        {"meta": {"status": status, "verbose": verbose},
+         "content": content}))
+
+
+class ProfilerEndpoint(base_api.Resource):
+
+    """Profile the running process for a limited amount of time.
+
+    The `sample` mode returns the results as aggregated statistics or as
+    collapsed stacks (`format=collapsed`), compatible with flamegraph.pl.
+    The `cprofile` mode returns the aggregated statistics or the report
+    of :mod:`pstats` (`format=text`).
+    """
+
+    exposed = True
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    def GET(self, format="json", limit=50):
+        """Return the results of the last profiling session."""
+        # pylint: disable=redefined-builtin
+        session = arestor_profiler.PROFILER.session
+        if session is None:
+            return _response(status=False, verbose="No profiling session",
+                             code=404)
+
+        if format == "collapsed":
+            if session.mode != arestor_profiler.MODE_SAMPLE:
+                return _response(status=False, code=400,
+                                 verbose="Collapsed stacks are available "
+                                         "only for the sample mode.")
+            cherrypy.response.headers['Content-Type'] = 'text/plain'
+            return arestor_util.get_as_bytes(session.collapsed())
+
+        if format == "text":
+            if session.mode != arestor_profiler.MODE_CPROFILE:
+                return _response(status=False, code=400,
+                                 verbose="The text report is available "
+                                         "only for the cprofile mode.")
+            cherrypy.response.headers['Content-Type'] = 'text/plain'
+            return arestor_util.get_as_bytes(session.stats())
+
+        return _response(session.summary(int(limit)))
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    def POST(self, mode=arestor_profiler.MODE_SAMPLE, duration=10,
+             interval=None):
+        """Start a new profiling session."""
+        if mode not in arestor_profiler.MODES:
+            return _response(status=False, code=400,
+                             verbose="Invalid profiling mode %r." % mode)
+        try:
+            duration = float(duration)
+            interval = float(interval or CONFIG.api.profiler_interval)
+        except (TypeError, ValueError):
+            return _response(status=False, code=400,
+                             verbose="Invalid duration or interval.")
+
+        if not 0 < duration <= CONFIG.api.profiler_max_duration:
+            return _response(status=False, code=400,
+                             verbose="The duration must be between 0 and "
+                                     "%d seconds." %
+                                     CONFIG.api.profiler_max_duration)
+        if interval <= 0:
+            return _response(status=False, code=400,
+                             verbose="The interval must be positive.")
+
+        try:
+            session = arestor_profiler.PROFILER.start(mode, duration,
+                                                      interval)
+        except ValueError as exc:
+            return _response(status=False, verbose=str(exc), code=409)
+        return _response(session.summary(limit=0))
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    def DELETE(self):
+        """Stop the active profiling session."""
+        session = arestor_profiler.PROFILER.stop()
+        if session is None:
+            return _response(status=False,
+                             verbose="No active profiling session")
+        return _response(session.summary(limit=0))
@@ -18,6 +18,9 @@
 import cherrypy
 
 from arestor.api import base as base_api
+from arestor.api import schema
+from arestor.common import blob
+from arestor.common import profile
 from arestor.common import tools as arestor_tools
 from arestor.common import util as arestor_util
 
@@ -34,6 +37,7 @@ class ResourceEndpoint(base_api.Resource):
     """Resource management endpoint."""
 
     @cherrypy.tools.user_required()
+    @cherrypy.tools.etags(autotags=True)
     @arestor_util.check_credentials
     @cherrypy.tools.json_out()
     def GET(self, resource_id=None, namespace="*", client_id="*",
@@ -49,7 +53,7 @@ class ResourceEndpoint(base_api.Resource):
                 response["meta"]["status"] = False
                 response["meta"]["verbose"] = "Resource not found"
 
-            response["content"] = resource
+            response["content"] = blob.resolve_fields(connection, resource)
             return response
 
         key = KEY_FORMAT.format(namespace=namespace, user=client_id,
@@ -76,8 +80,9 @@ class ResourceEndpoint(base_api.Resource):
                                 name=resource)
 
         response["content"] = kwargs
-        for name, value in kwargs.items():
-            connection.hset(key, name, value)
+        blob.write(connection, [(key, kwargs)])
+        schema.refresh_derived(connection, namespace, client_id, [resource])
+        profile.invalidate(namespace, client_id)
 
         return response
 
@@ -94,11 +99,13 @@ class ResourceEndpoint(base_api.Resource):
             response["meta"]["verbose"] = "Resource not found"
             return response
 
-        for name, value in content.items():
-            connection.hset(resource_id, name, value)
+        blob.write(connection, [(resource_id, content)])
+        namespace, client_id, resource = schema.split_key(resource_id)
+        schema.refresh_derived(connection, namespace, client_id, [resource])
+        profile.invalidate(namespace, client_id)
 
         new_content = connection.hgetall(resource_id)
-        response["content"] = new_content
+        response["content"] = blob.resolve_fields(connection, new_content)
         return response
 
     @cherrypy.tools.user_required()
@@ -109,5 +116,8 @@ class ResourceEndpoint(base_api.Resource):
         connection = self._redis.rcon
         response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
 
-        connection.delete(resource_id)
+        blob.delete(connection, [resource_id])
+        namespace, client_id, resource = schema.split_key(resource_id)
+        schema.refresh_derived(connection, namespace, client_id, [resource])
+        profile.invalidate(namespace, client_id)
         return response
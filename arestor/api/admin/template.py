@@ -0,0 +1,88 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for user_data templates management."""
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor.common import template as arestor_template
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+
+class TemplateEndpoint(base_api.Resource):
+
+    """user_data templates management endpoint."""
+
+    exposed = True
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def GET(self, name=None):
+        """The representation of the required template.
+
+        All the available templates are listed if no name is provided.
+        """
+        connection = self._redis.rcon
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        if not name:
+            prefix = arestor_template.template_key("")
+            response["content"] = sorted(
+                arestor_util.get_as_string(key)[len(prefix):]
+                for key in connection.keys(pattern=prefix + "*"))
+            return response
+
+        loaded = arestor_template.load(connection, name)
+        if loaded is None:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = "Template not found"
+            return response
+
+        response["content"] = {"name": name, "version": loaded.version,
+                               "template": loaded.compiled.template}
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def POST(self, name=None, template=None):
+        """Create a new template or update an existing one."""
+        connection = self._redis.rcon
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        if not name or template is None:
+            response["meta"]["status"] = False
+            response["meta"]["verbose"] = "Incomplete template description."
+            cherrypy.response.status = 400
+            return response
+
+        version = arestor_template.store(connection, name, template)
+        response["content"] = {"name": name, "version": version}
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def DELETE(self, name):
+        """Delete the required template."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+        arestor_template.delete(self._redis.rcon, name)
+        return response
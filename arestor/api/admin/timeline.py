@@ -0,0 +1,69 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""Arestor API endpoint for the boot timeline of the instances."""
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor import config as arestor_config
+from arestor.common import timeline as arestor_timeline
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+# TODO(mmicu): Find a better way to expose this tool
+cherrypy.tools.user_required = arestor_tools.UserManager()
+
+
+class TimelineEndpoint(base_api.Resource):
+
+    """The metadata requests recorded for every instance.
+
+    The requests are recorded only when the `timeline` option is enabled.
+    """
+
+    exposed = True
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def GET(self, instance_id=None):
+        """Return the boot timeline of the instance.
+
+        When the instance is not provided the number of recorded requests
+        of every instance is returned instead.
+        """
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+        if not CONFIG.api.timeline:
+            response["meta"]["verbose"] = "The timeline is not recorded."
+
+        if not instance_id:
+            response["content"] = arestor_timeline.TIMELINE.instances()
+            return response
+
+        response["content"] = arestor_timeline.TIMELINE.get(instance_id)
+        return response
+
+    @cherrypy.tools.user_required()
+    @arestor_util.check_credentials
+    @cherrypy.tools.json_out()
+    def DELETE(self, instance_id=None):
+        """Drop the boot timeline of the instance (or all of them)."""
+        response = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+        arestor_timeline.TIMELINE.clear(instance_id or None)
+        return response
@@ -21,8 +21,11 @@ import cherrypy
 from oslo_log import log as logging
 
 from arestor import config as arestor_config
+from arestor.common import blob
 from arestor.common import constant
 from arestor.common import exception
+from arestor.common import network
+from arestor.common import profile
 from arestor.common import util as arestor_util
 
 CONFIG = arestor_config.CONFIG
@@ -36,12 +39,25 @@ class MethodDispatcher(cherrypy.dispatch.MethodDispatcher):
     def find_handler(self, path):
         """Return the appropriate page handler, plus any virtual path."""
         vpath = []
+        instance_id = None
+        request = cherrypy.serving.request
         for entity in path.split("/"):
-            if not entity.startswith("instance-"):
+            # NOTE: Only the first `instance-*` segment identifies the
+            # instance, the following ones are part of the resource path
+            # (eg. the `instance-id` from the EC2 meta-data).
+            if instance_id is None and entity.startswith("instance-"):
+                instance_id = entity
+                request.headers["X-Arestor-Instance-ID"] = entity
+            else:
                 vpath.append(entity)
+
+        if instance_id is None and CONFIG.api.source_ip_lookup:
+            instance_id = network.INDEX.lookup(request.remote.ip)
+            if instance_id:
+                request.headers["X-Arestor-Instance-ID"] = instance_id
             else:
-                request = cherrypy.serving.request
-                request.headers.update({"X-Arestor-Instance-ID": entity})
+                # NOTE: The instance can not be chosen by the caller.
+                request.headers.pop("X-Arestor-Instance-ID", None)
 
         return super(MethodDispatcher, self).find_handler("/".join(vpath))
 
@@ -90,27 +106,41 @@ class Resource(object):
         self._parent = parent
         self._redis = arestor_util.RedisConnection()
 
+    def _key(self, namespace, name):
+        """Return the key of the required resource for the current client."""
+        return constant.KEY_FORMAT.format(user=self.client_uuid,
+                                          namespace=namespace,
+                                          name=name)
+
     def _set_data(self, namespace, name, field=None, value=None):
         """Set the required resource for the current client."""
-        connection = self._redis.rcon
-        key = constant.KEY_FORMAT.format(user=self.client_uuid,
-                                         namespace=namespace,
-                                         name=name)
-        return connection.hset(key, field, value)
+        blob.write(self._redis.rcon,
+                   [(self._key(namespace, name), {field: value})])
+
+    def _get_fields(self, namespace, fields):
+        """Retrieve multiple resources with a single round trip.
+
+        The resources missing for the current client are taken from its
+        profile (if it has one).
+
+        :param namespace: the namespace of the resources
+        :param fields: a list of (name, field) tuples
+        :returns: a list with the raw values (None for the missing ones)
+        """
+        return profile.get_fields(self._redis.rcon, namespace,
+                                  self.client_uuid, fields)
 
     def _get_data(self, namespace, name, field=None):
         """Retrieve the required resource for the current client."""
         connection = self._redis.rcon
-        key = constant.KEY_FORMAT.format(user=self.client_uuid,
-                                         namespace=namespace,
-                                         name=name)
+        key = self._key(namespace, name)
         if not connection.exists(key):
             raise exception.NotFound(object=key, container="database")
 
         if not connection.hexists(key, field):
             raise exception.NotFound(object=field, container=key)
 
-        return connection.hget(key, field)
+        return blob.resolve(connection, [connection.hget(key, field)])[0]
 
     @property
     def parent(self):
@@ -0,0 +1,40 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Arestor API endpoint for the Prometheus metrics."""
+
+import cherrypy
+
+from arestor.api import base as base_api
+from arestor import config as arestor_config
+from arestor.common import metrics as arestor_metrics
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+
+class MetricsEndpoint(base_api.Resource):
+
+    """The metrics of the current process, in the Prometheus format."""
+
+    exposed = True
+
+    def GET(self):
+        """Return the metrics collected until now."""
+        if not CONFIG.api.metrics:
+            raise cherrypy.NotFound()
+
+        cherrypy.response.headers['Content-Type'] = (
+            'text/plain; version=0.0.4; charset=utf-8')
+        return arestor_util.get_as_bytes(arestor_metrics.REGISTRY.render())
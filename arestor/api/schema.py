@@ -0,0 +1,524 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Declarative metadata providers.
+
+A metadata provider is described by the list of its endpoints. Every
+endpoint has a path, the stored fields required in order to render it and
+a render function. When the provider is compiled, the description is
+turned into a tree of exposed objects (the routes) and every endpoint gets
+a fetch plan which retrieves all the fields it needs with a single round
+trip to the database.
+
+::
+    class ExampleProvider(Provider):
+
+        namespace = "example"
+        endpoints = [
+            Endpoint("latest/hostname", fields=["hostname"]),
+            Endpoint("latest/keys/{key_id}",
+                     fields=[Field("public_keys", alias="keys")],
+                     render=lambda data, key_id: data["keys"][key_id]),
+        ]
+
+    ExampleEndpoint = ExampleProvider.compile()
+
+The trailing path segments written between braces are not part of the
+route, they are passed to the render function as keyword arguments.
+
+A provider can also declare :class:`Derived` resources. They are built
+from other resources of the same instance, every time one of them is
+written, and they are stored already serialized.
+"""
+
+import collections
+import json
+import re
+import string
+
+import cherrypy
+import six
+
+from arestor.api import base as base_api
+from arestor.common import blob
+from arestor.common import constant
+from arestor.common import timing as arestor_timing
+from arestor.common import tracing as arestor_tracing
+from arestor.common import util as arestor_util
+
+_PUNCTUATION = re.compile("[%s]" % re.escape(string.punctuation))
+_ARGUMENT = re.compile(r"^\{(\w+)\}$")
+
+OK_RESPONSE = {"meta": {"status": True, "verbose": "Ok"}, "content": None}
+
+_DERIVED = collections.defaultdict(collections.OrderedDict)
+"""The derived resources declared by the compiled providers, by namespace
+and name."""
+
+
+def attribute_name(segment):
+    """Return the attribute name used by the dispatcher for a path segment.
+
+    The CherryPy MethodDispatcher replaces the punctuation from every
+    path segment with `_` before looking for the handler.
+    """
+    return _PUNCTUATION.sub("_", segment)
+
+
+def load_json(value):
+    """Decode a JSON value retrieved from the database.
+
+    The raw value is returned if it is not a valid JSON document.
+    """
+    value = arestor_util.get_as_string(value)
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def store(parse):
+    """Return a handler which stores the values received in request body.
+
+    :param parse: a callable which receives the request body and returns
+                  a dictionary with the resources that should be stored,
+                  it should raise ValueError or TypeError for an invalid
+                  body
+    """
+    def _handler(resource, **_):
+        """Store the resources received in the request body."""
+        body = arestor_util.get_as_string(cherrypy.request.body.read())
+        try:
+            resources = parse(body) or {}
+        except (ValueError, TypeError) as exc:
+            raise cherrypy.HTTPError(400, "Invalid request body: %s" % exc)
+        for name, value in resources.items():
+            resource._set_data(resource.namespace, name, "data", value)
+        refresh_derived(resource._redis.rcon, resource.namespace,
+                        resource.client_uuid, resources)
+        return OK_RESPONSE
+    return _handler
+
+
+def split_key(key):
+    """Return the (namespace, client_id, name) tuple for a resource key."""
+    parts = arestor_util.get_as_string(key).split("/", 2)
+    if len(parts) != 3:
+        return None, None, None
+    return tuple(parts)
+
+
+def refresh_derived(connection, namespace, client_id, names):
+    """Rebuild the derived resources which depend on the received ones.
+
+    :param connection: the Redis connection
+    :param namespace: the namespace of the resources which were written
+    :param client_id: the instance which owns the resources
+    :param names: the names of the resources which were written
+    """
+    derived = derived_resources(namespace, names)
+    if not derived:
+        return
+
+    values = _read_sources(connection, namespace, client_id, derived)
+    pipeline = connection.pipeline(transaction=False)
+    write_derived(pipeline, namespace, client_id, derived, values)
+    pipeline.execute()
+
+
+def build_missing_derived(connection, namespace, client_id, derived):
+    """Build the derived resources which were never stored.
+
+    The instances stored before a derived resource was declared do not
+    have it, so it is built from their sources the first time it is read.
+    Nothing is stored for the instances without any of the sources.
+
+    :param derived: the derived resources which were read empty
+    :returns: whether any of the resources was built
+    """
+    pipeline = connection.pipeline(transaction=False)
+    for resource in derived:
+        pipeline.exists(constant.KEY_FORMAT.format(
+            namespace=namespace, user=client_id, name=resource.name))
+    derived = [resource for resource, exists
+               in zip(derived, pipeline.execute()) if not exists]
+    if not derived:
+        return False
+
+    values = _read_sources(connection, namespace, client_id, derived)
+    if all(value is None for value in values.values()):
+        return False
+
+    pipeline = connection.pipeline(transaction=False)
+    write_derived(pipeline, namespace, client_id, derived, values)
+    pipeline.execute()
+    return True
+
+
+def _read_sources(connection, namespace, client_id, derived):
+    """Return the (decoded) sources of the derived resources."""
+    sources = sorted(set().union(*[resource.sources
+                                   for resource in derived]))
+    pipeline = connection.pipeline(transaction=False)
+    for name in sources:
+        pipeline.hget(constant.KEY_FORMAT.format(
+            namespace=namespace, user=client_id, name=name), "data")
+    values = blob.resolve(connection, pipeline.execute())
+    return dict(zip(sources, [load_json(value) for value in values]))
+
+
+def derived_resources(namespace, names):
+    """Return the derived resources which depend on the received ones."""
+    names = set(names)
+    return [resource for resource in _DERIVED.get(namespace, {}).values()
+            if resource.sources & names]
+
+
+def write_derived(pipeline, namespace, client_id, derived, values):
+    """Add the writes of the derived resources to the pipeline.
+
+    :param pipeline: the pipeline which will store the resources
+    :param derived: the derived resources which should be built
+    :param values: a dictionary with the (decoded) sources, the missing
+                   sources are considered empty
+    """
+    for resource in derived:
+        key = constant.KEY_FORMAT.format(namespace=namespace,
+                                         user=client_id, name=resource.name)
+        value = resource.build(dict((name, values.get(name))
+                                    for name in resource.sources))
+        if isinstance(value, dict):
+            pipeline.delete(key)
+            for field, field_value in value.items():
+                pipeline.hset(key, field, field_value)
+        elif value is None:
+            pipeline.delete(key)
+        else:
+            pipeline.hset(key, "data", value)
+
+
+class Field(object):
+
+    """A value stored for an instance and required by an endpoint.
+
+    :param name: the name of the resource
+    :param field: the field of the resource, it can contain placeholders
+                  for the arguments of the endpoint (eg. `{key_id}`)
+    :param decode: whether the value is JSON encoded
+    :param alias: the name of the value in the data received by render
+    """
+
+    def __init__(self, name, field="data", decode=True, alias=None):
+        self.name = name
+        self.field = field
+        self.decode = decode
+        self.alias = alias or name
+        self.dynamic = "{" in field
+
+    def resolve(self, params):
+        """Return the name of the field for the received arguments."""
+        if self.dynamic:
+            return self.field.format(**params)
+        return self.field
+
+    def load(self, value):
+        """Return the value which will be used by the render function."""
+        if self.decode:
+            return load_json(value)
+        return arestor_util.get_as_string(value)
+
+
+class Endpoint(object):
+
+    """The description of a metadata endpoint.
+
+    :param path: the path of the endpoint, relative to the provider
+    :param fields: the stored values required by the endpoint (resource
+                   names or :class:`Field` objects)
+    :param render: a callable which receives the fetched data (and the
+                   arguments of the endpoint) and returns the
+                   representation of the endpoint; by default the value
+                   of the only field or all the data is returned
+    :param methods: a dictionary with the handlers for the other HTTP
+                    methods, every handler receives the resource and the
+                    arguments of the endpoint
+    :param content_type: the content type of the representation, when it
+                         is provided the representation is sent as it is
+    """
+
+    def __init__(self, path, fields=(), render=None, methods=None,
+                 content_type=None):
+        segments = path.strip("/").split("/")
+        args = []
+        while segments and _ARGUMENT.match(segments[-1]):
+            args.insert(0, _ARGUMENT.match(segments.pop()).group(1))
+
+        self.path = "/".join(segments)
+        self.args = tuple(args)
+        self.fields = [field if isinstance(field, Field) else Field(field)
+                       for field in fields]
+        self.render = render
+        self.methods = methods or {}
+        self.content_type = content_type
+
+    @property
+    def readable(self):
+        """Whether the endpoint can be retrieved with GET."""
+        return bool(self.fields or self.render)
+
+    def represent(self, data, params):
+        """Return the representation of the endpoint."""
+        if self.render is not None:
+            return self.render(data, **params)
+        if len(self.fields) == 1:
+            return data[self.fields[0].alias]
+        return data
+
+
+class Derived(object):
+
+    """A resource built from other resources of the same instance.
+
+    :param name: the name of the derived resource
+    :param sources: the names of the resources used in order to build it
+    :param build: a callable which receives a dictionary with the (decoded)
+                  sources and returns the serialized resource, a dictionary
+                  with the fields of the resource or None if the resource
+                  should be removed
+    """
+
+    def __init__(self, name, sources, build):
+        self.name = name
+        self.sources = frozenset(sources)
+        self.build = build
+
+
+class FetchPlan(object):
+
+    """Retrieve all the fields required by an endpoint in one round trip.
+
+    The list of (resource, field) pairs is computed when the provider is
+    compiled, unless it depends on the arguments of the request. The
+    derived resources which are read empty are built if they were never
+    stored (see :func:`build_missing_derived`).
+    """
+
+    def __init__(self, namespace, fields, derived=()):
+        self._namespace = namespace
+        self._fields = fields
+        names = set(field.name for field in fields)
+        self._derived = [resource for resource in derived
+                         if resource.name in names]
+        self._requests = None
+        if not any(field.dynamic for field in fields):
+            self._requests = [(field.name, field.field) for field in fields]
+
+    def fetch(self, resource, params):
+        """Return the data required by the endpoint."""
+        if not self._fields:
+            return {}
+
+        requests = self._requests
+        if requests is None:
+            try:
+                requests = [(field.name, field.resolve(params))
+                            for field in self._fields]
+            except (KeyError, IndexError):
+                raise cherrypy.NotFound()
+
+        values = resource._get_fields(self._namespace, requests)
+        if self._derived:
+            empty = set(field.name for field, value
+                        in zip(self._fields, values) if value is None)
+            missing = [derived for derived in self._derived
+                       if derived.name in empty]
+            if missing and build_missing_derived(
+                    resource._redis.rcon, self._namespace,
+                    resource.client_uuid, missing):
+                values = resource._get_fields(self._namespace, requests)
+
+        return dict((field.alias, field.load(value))
+                    for field, value in zip(self._fields, values))
+
+
+class ProviderNode(base_api.Resource):
+
+    """A node from the compiled tree of a metadata provider."""
+
+    exposed = True
+
+    namespace = None
+    """The namespace used in order to store the data of the provider."""
+
+    children = ()
+    """A list of (path segment, node class) tuples."""
+
+    listing = ""
+    """The representation of the node when it is used as a container."""
+
+    handlers = {}
+    """A dictionary which maps the HTTP methods to the endpoints of the
+    node, by the number of arguments received."""
+
+    provider = None
+    """The provider which contains the current node."""
+
+    def __init__(self, parent=None):
+        super(ProviderNode, self).__init__(parent)
+        for segment, node_class in self.children:
+            setattr(self, attribute_name(segment), node_class(self))
+
+    @staticmethod
+    @arestor_timing.timed("serialize")
+    @arestor_tracing.traced("render")
+    def _output(result, content_type=None):
+        """Prepare the result of a handler for the response body."""
+        if content_type and isinstance(result, (six.text_type,
+                                                six.binary_type)):
+            cherrypy.response.headers['Content-Type'] = content_type
+            return arestor_util.get_as_bytes(result)
+        if isinstance(result, (dict, list)):
+            cherrypy.response.headers['Content-Type'] = 'application/json'
+            return arestor_util.get_as_bytes(json.dumps(result))
+        if result is None:
+            return ""
+        if isinstance(result, (six.text_type, six.binary_type)):
+            return result
+        return str(result)
+
+    def _handle(self, method, args, kwargs):
+        """Process the request with the right endpoint."""
+        self.provider.check_request(self, method)
+        endpoint = self.handlers.get(method, {}).get(len(args))
+        if endpoint is None:
+            if method == "GET" and not args and self.children:
+                cherrypy.response.headers['Content-Type'] = 'text/plain'
+                return self.listing
+            raise cherrypy.NotFound()
+
+        endpoint, handler = endpoint
+        params = dict(zip(endpoint.args, args))
+        if method == "GET":
+            data = handler.fetch(self, params)
+            result = endpoint.represent(data, params)
+        else:
+            params.update(kwargs)
+            result = handler(self, **params)
+        return self._output(result, endpoint.content_type)
+
+
+def _make_handler(method):
+    """Create the handler for the received HTTP method."""
+    def _handler(self, *args, **kwargs):
+        """Process the request with the right endpoint."""
+        return self._handle(method, args, kwargs)
+    _handler.__name__ = method
+    return _handler
+
+
+class _Route(object):
+
+    """Intermediate representation of a node from the provider tree."""
+
+    def __init__(self):
+        self.children = collections.OrderedDict()
+        self.handlers = collections.defaultdict(dict)
+
+    @property
+    def is_directory(self):
+        """Whether the route contains other resources."""
+        return bool(self.children or any(
+            arity for handlers in self.handlers.values()
+            for arity in handlers))
+
+
+class Provider(object):
+
+    """Contract class for the declarative metadata providers."""
+
+    namespace = None
+    """The namespace used in order to store the data of the provider."""
+
+    endpoints = ()
+    """A list with all the endpoints exposed by the provider."""
+
+    derived = ()
+    """A list with the derived resources maintained for the provider."""
+
+    directory_suffix = ""
+    """The suffix added to the directories from the listings."""
+
+    @classmethod
+    def check_request(cls, resource, method):
+        """Check if the request can be processed by the provider.
+
+        The method should raise a :class:`cherrypy.HTTPError` in order to
+        reject the request.
+        """
+        pass
+
+    @classmethod
+    def _routes(cls):
+        """Build the route tree and the fetch plans of the endpoints."""
+        root = _Route()
+        for endpoint in cls.endpoints:
+            route = root
+            for segment in filter(None, endpoint.path.split("/")):
+                route = route.children.setdefault(segment, _Route())
+
+            arity = len(endpoint.args)
+            if endpoint.readable:
+                plan = FetchPlan(cls.namespace, endpoint.fields,
+                                 cls.derived)
+                route.handlers["GET"][arity] = (endpoint, plan)
+            for method, handler in endpoint.methods.items():
+                route.handlers[method.upper()][arity] = (endpoint, handler)
+        return root
+
+    @classmethod
+    def _build(cls, name, route):
+        """Create the node class for the received route."""
+        children = tuple(
+            (segment, cls._build("%s_%s" % (name, attribute_name(segment)),
+                                 child))
+            for segment, child in route.children.items())
+        listing = []
+        for segment, child in route.children.items():
+            if child.is_directory:
+                segment += cls.directory_suffix
+            listing.append(segment)
+
+        attributes = {
+            "provider": cls,
+            "namespace": cls.namespace,
+            "children": children,
+            "listing": "\n".join(listing),
+            "handlers": dict(route.handlers),
+        }
+        methods = set(route.handlers)
+        if route.children:
+            methods.add("GET")
+        for method in methods:
+            attributes[method] = _make_handler(method)
+
+        return type(str(name), (ProviderNode, ), attributes)
+
+    @classmethod
+    def compile(cls):
+        """Compile the provider into the tree of exposed objects."""
+        _DERIVED[cls.namespace].update(
+            (resource.name, resource) for resource in cls.derived)
+        return cls._build(cls.__name__, cls._routes())
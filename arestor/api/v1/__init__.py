@@ -16,6 +16,7 @@
 """Arestor API version 1."""
 
 from arestor.api import base as base_api
+from arestor.api.v1 import ec2
 from arestor.api.v1 import openstack
 from arestor.api.v1 import packet
 
@@ -26,7 +27,8 @@ class ArestorV1(base_api.BaseAPI):
 
     resources = [
         ("openstack", openstack.OpenStackEndpointNamespace),
-        ("packet", packet.PacketEndpoint)
+        ("packet", packet.PacketEndpoint),
+        ("ec2", ec2.EC2Endpoint),
     ]
     """A list that contains all the resources (endpoints) available for the
     current metadata service."""
@@ -0,0 +1,206 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Arestor API endpoint for EC2 Mocked Metadata."""
+
+import base64
+import collections
+import os
+import threading
+import time
+
+import cherrypy
+from oslo_log import log as logging
+
+from arestor.api import schema
+from arestor import config as arestor_config
+from arestor.common import template as arestor_template
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+TOKEN_HEADER = "X-aws-ec2-metadata-token"
+TOKEN_TTL_HEADER = "X-aws-ec2-metadata-token-ttl-seconds"
+MAX_TOKEN_TTL = 21600
+
+PUBLIC_KEYS_LISTING = "ec2_public_keys"
+"""The derived resource which contains the listing of the public keys."""
+
+
+class TokenTable(object):
+
+    """In-memory table with the IMDSv2 session tokens.
+
+    The tokens never reach the database, they are valid only in the
+    process which issued them. When the table is full the expired tokens
+    are removed, followed by the oldest ones.
+    """
+
+    def __init__(self, max_size):
+        self._max_size = max_size
+        self._tokens = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def _purge(self):
+        """Make room for a new token."""
+        now = time.time()
+        for token, (_, expires) in list(self._tokens.items()):
+            if expires <= now:
+                del self._tokens[token]
+
+        while len(self._tokens) >= self._max_size:
+            self._tokens.popitem(last=False)
+
+    def issue(self, client_id, ttl):
+        """Create a new token for the received instance."""
+        token = arestor_util.get_as_string(
+            base64.urlsafe_b64encode(os.urandom(30)))
+        with self._lock:
+            if len(self._tokens) >= self._max_size:
+                self._purge()
+            self._tokens[token] = (client_id, time.time() + ttl)
+        return token
+
+    def validate(self, client_id, token):
+        """Check if the token was issued for the instance and not expired."""
+        entry = self._tokens.get(token)
+        if entry is None:
+            return False
+
+        owner, expires = entry
+        if expires <= time.time():
+            with self._lock:
+                self._tokens.pop(token, None)
+            return False
+
+        return owner == client_id
+
+
+TOKENS = TokenTable(CONFIG.ec2.max_tokens)
+
+
+def _get_public_keys(public_keys):
+    """Return a list of (name, key) tuples with the public keys."""
+    if isinstance(public_keys, dict):
+        return sorted(public_keys.items())
+    return [("key-%d" % index, key)
+            for index, key in enumerate(public_keys or [])]
+
+
+def _build_public_keys_listing(data):
+    """Build the listing of the public keys for an instance."""
+    public_keys = _get_public_keys(data["public_keys"])
+    if not public_keys:
+        return None
+    return "\n".join("%d=%s" % (index, name)
+                     for index, (name, _) in enumerate(public_keys))
+
+
+def _render_public_key(data, index):
+    """The formats available for the required public key."""
+    _render_openssh_key(data, index, "openssh-key")
+    return "openssh-key"
+
+
+def _render_openssh_key(data, index, key_format):
+    """The required public key in the OpenSSH format."""
+    public_keys = _get_public_keys(data["public_keys"])
+    try:
+        if key_format != "openssh-key":
+            raise ValueError(key_format)
+        return public_keys[int(index)][1]
+    except (ValueError, IndexError):
+        raise cherrypy.NotFound()
+
+
+def _render_userdata(data):
+    """The representation of userdata resource."""
+    client_id = cherrypy.request.headers.get("X-Arestor-Instance-ID")
+    return arestor_template.user_data(client_id, data) or ""
+
+
+def _issue_token(resource):
+    """Create a new session token for the current instance."""
+    try:
+        ttl = int(cherrypy.request.headers.get(TOKEN_TTL_HEADER))
+    except (TypeError, ValueError):
+        ttl = 0
+
+    if not 0 < ttl <= MAX_TOKEN_TTL:
+        raise cherrypy.HTTPError(400, "Invalid token TTL.")
+
+    cherrypy.response.headers[TOKEN_TTL_HEADER] = str(ttl)
+    cherrypy.response.headers['Content-Type'] = 'text/plain'
+    return TOKENS.issue(resource.client_uuid, ttl)
+
+
+def _metadata(path, name):
+    """Return the endpoint for a simple meta-data item."""
+    return schema.Endpoint("latest/meta-data/" + path, fields=[name])
+
+
+class EC2Provider(schema.Provider):
+
+    """Arestor API endpoint for EC2 Mocked Metadata."""
+
+    namespace = "ec2"
+    directory_suffix = "/"
+    endpoints = [
+        _metadata("ami-id", "ami_id"),
+        _metadata("hostname", "hostname"),
+        _metadata("instance-id", "uuid"),
+        _metadata("instance-type", "instance_type"),
+        _metadata("local-hostname", "hostname"),
+        _metadata("local-ipv4", "local_ipv4"),
+        _metadata("public-hostname", "hostname"),
+        _metadata("public-ipv4", "public_ipv4"),
+        _metadata("placement/availability-zone", "availability_zone"),
+        schema.Endpoint("latest/meta-data/public-keys",
+                        fields=[schema.Field(PUBLIC_KEYS_LISTING,
+                                             decode=False)]),
+        schema.Endpoint("latest/meta-data/public-keys/{index}",
+                        fields=["public_keys"], render=_render_public_key),
+        schema.Endpoint("latest/meta-data/public-keys/{index}/{key_format}",
+                        fields=["public_keys"], render=_render_openssh_key),
+        schema.Endpoint("latest/user-data",
+                        fields=("user_data", ) + arestor_template.FIELDS,
+                        render=_render_userdata),
+        schema.Endpoint("latest/api/token", methods={"PUT": _issue_token}),
+    ]
+    derived = [
+        schema.Derived(PUBLIC_KEYS_LISTING, ["public_keys"],
+                       _build_public_keys_listing),
+    ]
+
+    @classmethod
+    def check_request(cls, resource, method):
+        """Validate the session token received with the request."""
+        if method == "PUT":
+            return
+
+        token = cherrypy.request.headers.get(TOKEN_HEADER)
+        if token is None:
+            if CONFIG.ec2.token_required:
+                raise cherrypy.HTTPError(401, "Session token required.")
+            return
+
+        if not TOKENS.validate(resource.client_uuid, token):
+            raise cherrypy.HTTPError(401, "Invalid session token.")
+
+
+EC2Endpoint = EC2Provider.compile()
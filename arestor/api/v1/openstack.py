@@ -13,182 +13,240 @@
 #    under the License.
 
 """Arestor API endpoint for OpenStack Mocked Metadata."""
-import json
+
 import base64
-import cherrypy
+import json
 
+import cherrypy
 from oslo_log import log as logging
 
-from arestor.api import base as base_api
-from arestor.common import exception
+from arestor.api import schema
+from arestor.common import constant
+from arestor.common import profile as arestor_profile
+from arestor.common import template as arestor_template
 from arestor.common import util as arestor_util
 
 
 LOG = logging.getLogger(__name__)
 
-
-class _OpenStackResource(base_api.Resource):
-    """Base class for OpenStack resources."""
-
-    exposed = True
-
-    def _get_openstack_data(self, name, field=None):
-        """Retrieve the required resource from the Openstack namespace."""
-        data = None
-        try:
-            data = self._get_data(namespace="openstack",
-                                  name=name, field=field)
-
-            if field == "data":
-                data = json.loads(arestor_util.get_as_string(data))
-        except (exception.NotFound, ValueError):
-            pass
-        return data
-
-    def _set_openstack_data(self, name, field=None, value=None):
-        """Set the required resource from the Openstack namespace."""
-        data = None
-        try:
-            data = self._set_data(namespace="openstack",
-                                  name=name, field=field, value=value)
-        except (ValueError, TypeError):
-            pass
-        return data
-
-
-class _Content(_OpenStackResource):
-    """Content resource for the OpenStack Endpoint."""
-
-    def GET(self):
-        """The representation of the content resource."""
-        pass
-
-
-class _MetadataResource(_OpenStackResource):
-    """Metadata resource for OpenStack Endpoint."""
-
-    @cherrypy.tools.json_out()
-    def GET(self):
-        """The representation of the metadata resource."""
-        meta_data = {
-            "random_seed": self._get_openstack_data("random_seed", "data"),
-            "uuid": self._get_openstack_data("uuid", "data"),
-            "availability_zone": self._get_openstack_data("availability_zone",
-                                                          "data"),
-            "hostname": self._get_openstack_data("hostname", "data"),
-            "launch_index": self._get_openstack_data("launch_index", "data"),
-            "project_id": self._get_openstack_data("project_id", "data"),
-            "name": self._get_openstack_data("name", "data"),
-
-            "keys": self._get_openstack_data("keys", "data"),
-            "public_keys": self._get_openstack_data("public_keys", "data"),
+_METADATA_FIELDS = ("random_seed", "uuid", "availability_zone", "hostname",
+                    "launch_index", "project_id", "name", "keys",
+                    "public_keys")
+
+# The derived resources with the (serialized) OpenStack documents.
+NETWORK_DATA = "network_data_json"
+VENDOR_DATA = "vendor_data_json"
+CONTENT = "content"
+FILES = "files_json"
+
+_EMPTY_NETWORK_DATA = json.dumps({"links": [], "networks": [],
+                                  "services": []})
+_EMPTY_VENDOR_DATA = json.dumps({})
+_CONTENT_ID = "%04d"
+
+
+def _render_userdata(data):
+    """The representation of userdata resource."""
+    client_id = cherrypy.request.headers.get("X-Arestor-Instance-ID")
+    return arestor_template.user_data(client_id, data) or ""
+
+
+def _render_content(data):
+    """The identifiers of the files available in the content resource."""
+    return "\n".join(entry["content_path"].rsplit("/", 1)[-1]
+                     for entry in data[FILES] or [])
+
+
+def _render_content_file(data, content_id):
+    """The content of the required file."""
+    # pylint: disable=unused-argument
+    if data[CONTENT] is None:
+        raise cherrypy.NotFound()
+    return base64.b64decode(data[CONTENT])
+
+
+def _render_metadata(data):
+    """The representation of the metadata resource."""
+    meta_data = dict((name, data[name]) for name in _METADATA_FIELDS)
+    if data[FILES]:
+        meta_data["files"] = data[FILES]
+    return meta_data
+
+
+def _build_route(nic):
+    """Return the default route for the received network interface."""
+    default = "::" if ":" in nic["gateway"] else "0.0.0.0"
+    return {"network": default, "netmask": default,
+            "gateway": nic["gateway"]}
+
+
+def _build_network_data(data):
+    """Build the network_data.json document from the network interfaces.
+
+    Every network interface is described by a dictionary which can
+    contain the `mac_address`, `mtu`, `ip_address`, `netmask`, `gateway`,
+    `dns_nameservers` and `network_id` keys. The interfaces without an
+    `ip_address` are configured using DHCP.
+    """
+    nics = data["nics"]
+    if not nics:
+        return None
+
+    links, networks, services = [], [], []
+    for index, nic in enumerate(nics):
+        link_id = "interface%d" % index
+        links.append({
+            "id": link_id,
+            "type": "phy",
+            "ethernet_mac_address": nic.get("mac_address"),
+            "mtu": nic.get("mtu"),
+        })
+
+        network = {
+            "id": "network%d" % index,
+            "link": link_id,
+            "network_id": nic.get("network_id", link_id),
         }
+        ip_address = nic.get("ip_address")
+        if ip_address:
+            network.update({
+                "type": "ipv6" if ":" in ip_address else "ipv4",
+                "ip_address": ip_address,
+                "netmask": nic.get("netmask"),
+                "routes": [_build_route(nic)] if nic.get("gateway") else [],
+            })
+        else:
+            network["type"] = "ipv4_dhcp"
+        networks.append(network)
+
+        for address in nic.get("dns_nameservers") or ():
+            service = {"type": "dns", "address": address}
+            if service not in services:
+                services.append(service)
+
+    return json.dumps({"links": links, "networks": networks,
+                       "services": services})
+
+
+def _build_vendor_data(data):
+    """Build the vendor_data.json document."""
+    if data["vendor_data"] is None:
+        return None
+    return json.dumps(data["vendor_data"])
+
+
+def _build_content(data):
+    """Build the content entries from the injected files.
+
+    The files are received as a dictionary which maps the path of every
+    file to its base64 encoded content.
+    """
+    files = sorted((data["files"] or {}).items())
+    return dict((_CONTENT_ID % index, content)
+                for index, (_, content) in enumerate(files))
+
+
+def _build_files(data):
+    """Build the list of injected files, as exposed by meta_data.json."""
+    files = sorted((data["files"] or {}).items())
+    if not files:
+        return None
+    return json.dumps([
+        {"path": path, "content_path": "/content/" + _CONTENT_ID % index}
+        for index, (path, _) in enumerate(files)])
+
+
+def config_drive_files(connection, client_id):
+    """Return the files of the config drive for the received instance.
+
+    The resources missing for the instance are taken from its profile.
+    The result is a dictionary which maps the path of every file to its
+    content.
+    """
+    def _key(owner, name):
+        """Return the key for the received resource."""
+        return constant.KEY_FORMAT.format(namespace="openstack",
+                                          user=owner, name=name)
+
+    names = _METADATA_FIELDS + (FILES, "user_data",
+                                arestor_template.USER_DATA_TEMPLATE,
+                                arestor_profile.PROFILE)
+    raw_names = (NETWORK_DATA, VENDOR_DATA)
+    values = arestor_profile.get_fields(
+        connection, "openstack", client_id,
+        [(name, "data") for name in names + raw_names])
+
+    data = dict((name, schema.load_json(value))
+                for name, value in zip(names, values))
+    raw_data = dict((name, arestor_util.get_as_string(value))
+                    for name, value in zip(raw_names, values[len(names):]))
+    meta_data = arestor_util.get_as_bytes(json.dumps(_render_metadata(data)))
+
+    files = {
+        "openstack/2013-04-04/meta_data.json": meta_data,
+        "openstack/latest/meta_data.json": meta_data,
+        "openstack/latest/network_data.json": arestor_util.get_as_bytes(
+            raw_data[NETWORK_DATA] or _EMPTY_NETWORK_DATA),
+        "openstack/latest/vendor_data.json": arestor_util.get_as_bytes(
+            raw_data[VENDOR_DATA] or _EMPTY_VENDOR_DATA),
+    }
+    user_data = arestor_template.user_data(client_id, data, connection)
+    if user_data:
+        files["openstack/latest/user_data"] = user_data
+    contents = connection.hgetall(_key(client_id, CONTENT))
+    if not contents and data[arestor_profile.PROFILE]:
+        contents = connection.hgetall(_key(arestor_util.profile_id(
+            data[arestor_profile.PROFILE]), CONTENT))
+    for content_id, content in contents.items():
+        path = "openstack/content/" + arestor_util.get_as_string(content_id)
+        files[path] = base64.b64decode(content)
+    return files
+
+
+class OpenStackProvider(schema.Provider):
 
-        return meta_data
-
-
-class _UserdataResource(_OpenStackResource):
-    """Userdata resource for OpenStack Endpoint."""
-
-    def GET(self):
-        """The representation of userdata resource."""
-        userdata = self._get_openstack_data("user_data", "data")
-        if userdata:
-            return base64.b64decode(userdata)
-        return ""
-
-
-class _PasswordResource(_OpenStackResource):
-
-    exposed = True
-
-    """Password resource for OpenStack Endpoint."""
-    def GET(self):
-        return self._get_openstack_data("password", "data")
-
-    def POST(self):
-        """Create a new resource."""
-        self._set_openstack_data("password", "data",
-                                 str(cherrypy.request.body.read()))
-        return {"meta": {"status": True, "verbose": "Ok"}, "content": None}
-
-
-class _LatestVersion(base_api.BaseAPI):
-
-    """Container for all the resources from the latest version of the API."""
-
-    exposed = True
-    resources = [
-        ("user_data", _UserdataResource),
-        ("meta_data_json", _MetadataResource),
-    ]
-
-
-class _LegacyVersion(base_api.BaseAPI):
-
-    """Container for all the resources from the legacy version of the API."""
+    """Arestor API endpoint for OpenStack Mocked Metadata."""
 
-    exposed = True
-    resources = [
-        ("password", _PasswordResource),
+    namespace = "openstack"
+    endpoints = [
+        schema.Endpoint(
+            "openstack/2013-04-04/password", fields=["password"],
+            methods={"POST": schema.store(lambda body: {"password": body})}),
         # NOTE(mmicu): Cloudbase-Init will check if this endpoint is
         # available by requesting the `/meta_data.json` file,
         # this could be empty
-        ("meta_data_json", _MetadataResource),
-    ]
-
-
-class _OpenStackEndpoint(base_api.BaseAPI):
-
-    """Arestor API endpoint for OpenStack Mocked Metadata."""
-
-    resources = [
-        ("2013-04-04", _LegacyVersion),
-        ("latest", _LatestVersion),
-        ("content", _Content),
+        schema.Endpoint("openstack/2013-04-04/meta_data.json",
+                        fields=_METADATA_FIELDS),
+        schema.Endpoint("openstack/latest/user_data",
+                        fields=("user_data", ) + arestor_template.FIELDS,
+                        render=_render_userdata),
+        schema.Endpoint("openstack/latest/meta_data.json",
+                        fields=_METADATA_FIELDS + (FILES, ),
+                        render=_render_metadata),
+        schema.Endpoint(
+            "openstack/latest/network_data.json",
+            fields=[schema.Field(NETWORK_DATA, decode=False)],
+            render=lambda data: data[NETWORK_DATA] or _EMPTY_NETWORK_DATA,
+            content_type="application/json"),
+        schema.Endpoint(
+            "openstack/latest/vendor_data.json",
+            fields=[schema.Field(VENDOR_DATA, decode=False)],
+            render=lambda data: data[VENDOR_DATA] or _EMPTY_VENDOR_DATA,
+            content_type="application/json"),
+        schema.Endpoint("openstack/content", fields=(FILES, ),
+                        render=_render_content),
+        schema.Endpoint(
+            "openstack/content/{content_id}",
+            fields=[schema.Field(CONTENT, field="{content_id}",
+                                 decode=False)],
+            render=_render_content_file),
     ]
-    """A list that contains all the resources (endpoints) available for the
-    current metadata service."""
-
-    exposed = True
-    """Whether this application should be available for clients."""
-
-    def __getattr__(self, name):
-        """Handle for invalid resource name or alias."""
-
-        # Note(alexcoman): The cherrypy MethodDispatcher will replace the
-        # `-` from the resource / endpoint name with `_`. In order to avoid
-        # any problems we will try to avoid this scenario.
-        if "_" in name:
-            return self.__dict__.get(name.replace("_", "-"))
-
-        raise AttributeError("%r object has no attribute %r" %
-                             (self.__class__.__name__, name))
-
-
-class OpenStackEndpointNamespace(base_api.BaseAPI):
-
-    """The API Namespace for openstack."""
-    resources = [
-        ("openstack", _OpenStackEndpoint)
+    derived = [
+        schema.Derived(NETWORK_DATA, ["nics"], _build_network_data),
+        schema.Derived(VENDOR_DATA, ["vendor_data"], _build_vendor_data),
+        schema.Derived(CONTENT, ["files"], _build_content),
+        schema.Derived(FILES, ["files"], _build_files),
     ]
 
-    """A list that contains all the resources (endpoints) available for the
-    current metadata service."""
-
-    exposed = True
-    """Whether this application should be available for clients."""
-
-    def __getattr__(self, name):
-        """Handle for invalid resource name or alias."""
-
-        # NOTE(mmicu): Add this method in base
-
-        # Note(mmicu): The cherrypy MethodDispatcher will replace the
-        # `-` from the resource / endpoint name with `_`. In order to avoid
-        # any problems we will try to avoid this scenario.
-        if "_" in name:
-            return self.__dict__.get(name.replace("_", "-"))
 
-        raise AttributeError("%r object has no attribute %r" %
-                             (self.__class__.__name__, name))
+OpenStackEndpointNamespace = OpenStackProvider.compile()
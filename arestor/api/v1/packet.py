@@ -15,189 +15,146 @@
 """Arestor API endpoint for Packet Mocked Metadata."""
 
 import json
-import base64
-import cherrypy
 
+import cherrypy
 from oslo_log import log as logging
 
-from arestor.api import base as base_api
-from arestor.common import exception
-from arestor.common import util as arestor_util
+from arestor.api import schema
+from arestor.common import template as arestor_template
 
 
 LOG = logging.getLogger(__name__)
 
 FAKE_PHONE_HOME_URL = "fake_phone_home_url"
 
+SSH_KEYS = "packet_ssh_keys"
+"""The derived resource which contains the indexed public keys."""
 
-class _PacketResource(base_api.Resource):
-    """Base class for Packet resources."""
-
-    exposed = True
-
-    def _get_packet_data(self, name, field=None):
-        """Retrieve the required resource from the Packet namespace"""
-        data = None
-        try:
-            data = self._get_data(namespace="packet",
-                                  name=name, field=field)
-            if field == "data":
-                data = json.loads(arestor_util.get_as_string(data))
-        except (exception.NotFound, ValueError):
-            pass
-        return data
-
-    def _set_packet_data(self, name, field=None, value=None):
-        """Set the required resource from the Packet namespace."""
-        data = None
-        try:
-            data = self._set_data(namespace="packet",
-                                  name=name, field=field, value=value)
-        except (ValueError, TypeError):
-            pass
-        return data
-
-
-class _InstanceIdResource(_PacketResource):
-
-    def GET(self):
-        return self._get_packet_data("uuid", "data")
+SSH_KEYS_COUNT = "count"
+SSH_KEY_FIELD = "key-{key_id}"
 
 
-class _HostnameResource(_PacketResource):
+def get_base_url():
+    """Return the url of the Packet endpoint for the current instance."""
+    request = cherrypy.request
+    instance_id = request.headers.get("X-Arestor-Instance-ID")
+    segments = request.path_info.split("/")
+    if instance_id and instance_id in segments:
+        segments = segments[:segments.index(instance_id) + 1]
+    elif PacketProvider.namespace in segments:
+        # NOTE: The instance was resolved from the source address of the
+        # request, it is not part of the url.
+        segments = segments[:segments.index(PacketProvider.namespace) + 1]
+    return cherrypy.url("/".join(segments))
 
-    def GET(self):
-        return self._get_packet_data("hostname", "data")
 
+def _get_public_keys(data):
+    """Return the list of public keys for the current instance."""
+    public_keys = data["public_keys"] or []
+    if isinstance(public_keys, dict):
+        return list(public_keys.values())
+    return list(public_keys)
 
-class _SSHKeysResource(_PacketResource):
 
-    # pylint: disable=invalid-name, redefined-builtin
-    @cherrypy.popargs('id')
-    def GET(self, id=None):
-        keys = self._get_packet_data("public_keys", "data")
-        if id is None:
-            if keys:
-                return str(len(keys))
-            return "0"
-        else:
-            return keys[int(id)]
+def _render_metadata(data):
+    """The representation of the metadata resource."""
+    return {
+        "id": data["uuid"],
+        "hostname": data["hostname"],
+        "ssh_keys": data["public_keys"],
+        "phone_home_url": '/'.join([get_base_url(), FAKE_PHONE_HOME_URL]),
+    }
 
 
-class _PhoneHomeUrlKey(_PacketResource):
-
-    def GET(self):
-        public_keys = self._get_packet_data("public_keys", "data").values()
-        if public_keys:
-            return public_keys[0]
-        return None
+def _build_ssh_keys(data):
+    """Store every public key in its own field, next to their count."""
+    public_keys = _get_public_keys(data)
+    ssh_keys = dict((SSH_KEY_FIELD.format(key_id=index), key)
+                    for index, key in enumerate(public_keys))
+    ssh_keys[SSH_KEYS_COUNT] = str(len(public_keys))
+    return ssh_keys
 
 
-class _PhoneHomeUrlPassword(_PacketResource):
+def _ssh_key_field(key_id, alias=None):
+    """Return the field which contains the required public key."""
+    return schema.Field(SSH_KEYS, field=SSH_KEY_FIELD.format(key_id=key_id),
+                        decode=False, alias=alias)
 
-    def GET(self):
-        return self._get_packet_data("password_home_phone", "data")
 
+def _render_ssh_keys(data):
+    """The number of public keys available for the current instance."""
+    return data[SSH_KEYS] or "0"
 
-class _UserdataResource(_PacketResource):
 
-    def GET(self):
-        """The representation of userdata resource."""
-        userdata = self._get_packet_data("user_data", "data")
-        if userdata:
-            return base64.b64decode(userdata)
-        return ""
+def _render_ssh_key(data, **_):
+    """The public key with the required index."""
+    if data[SSH_KEYS] is None:
+        raise cherrypy.NotFound()
+    return data[SSH_KEYS]
 
 
-class _PhoneHomeUrlResource(base_api.BaseAPI, _PacketResource):
+def _render_phone_home(data):
+    """The representation of the phone home resource."""
+    return {
+        "key": data[SSH_KEYS],
+        "password": data["password_home_phone"],
+    }
 
-    resources = [
-        ("key", _PhoneHomeUrlKey),
-        ("password", _PhoneHomeUrlPassword)
-    ]
 
-    # pylint: disable=bad-super-call
-    def __init__(self, *args):
-        super(_PhoneHomeUrlResource, self).__init__()
-        super(_PacketResource, self).__init__(*args)
-
-    @cherrypy.tools.json_out()
-    def GET(self):
-        public_keys = self._get_packet_data("public_keys", "data").values()
-        try:
-            key = public_keys[0]
-        except IndexError:
-            key = None
-        return {
-            "key": key,
-            "password": self._get_packet_data("password_home_phone", "data")
-        }
-
-    def POST(self):
-        password = str(cherrypy.request.body.read())
-        if password:
-            self._set_packet_data("password_home_phone", "data",
-                                  json.loads(password).get('password'))
-        return {"meta": {"status": True, "verbose": "Ok"}, "content": None}
-
-
-class _Metadata(base_api.BaseAPI, _PacketResource):
-
-    exposed = True
-    resources = [
-        ("id", _InstanceIdResource),
-        ("hostname", _HostnameResource),
-        ("ssh_keys", _SSHKeysResource),
-        ("phone_home_url", _PhoneHomeUrlResource),
+def _parse_phone_home(body):
+    """Get the password from the phone home request."""
+    if not body:
+        return None
+    request = json.loads(body)
+    if not isinstance(request, dict):
+        raise ValueError("The phone home request should be an object.")
+    return {"password_home_phone": request.get('password')}
+
+
+def _render_userdata(data):
+    """The representation of userdata resource."""
+    client_id = cherrypy.request.headers.get("X-Arestor-Instance-ID")
+    return arestor_template.user_data(client_id, data) or ""
+
+
+def _phone_home_endpoints(path):
+    """Return the endpoints required by the phone home resource."""
+    return [
+        schema.Endpoint(path, fields=[_ssh_key_field(0),
+                                      "password_home_phone"],
+                        render=_render_phone_home,
+                        methods={"POST": schema.store(_parse_phone_home)}),
+        schema.Endpoint(path + "/key", fields=[_ssh_key_field(0)]),
+        schema.Endpoint(path + "/password", fields=["password_home_phone"]),
     ]
 
-    # pylint: disable=bad-super-call
-    def __init__(self, *args):
-        super(_Metadata, self).__init__()
-        super(_PacketResource, self).__init__(*args)
 
-    @cherrypy.tools.json_out()
-    def GET(self):
-        meta_data = {
-            "id": self._get_packet_data("uuid", "data"),
-            "hostname": self._get_packet_data("hostname", "data"),
-            "ssh_keys": self._get_packet_data("public_keys", "data"),
-            "phone_home_url": '/'.join([PacketEndpoint.get_base_url(),
-                                        FAKE_PHONE_HOME_URL]),
-        }
-        return meta_data
-
-
-class PacketEndpoint(base_api.BaseAPI):
+class PacketProvider(schema.Provider):
 
     """Arestor API endpoint for Packet Mocked Metadata."""
 
-    resources = [
-        ("metadata", _Metadata),
-        ("userdata", _UserdataResource),
-        (FAKE_PHONE_HOME_URL, _PhoneHomeUrlResource)
+    namespace = "packet"
+    endpoints = [
+        schema.Endpoint("metadata",
+                        fields=["uuid", "hostname", "public_keys"],
+                        render=_render_metadata),
+        schema.Endpoint("metadata/id", fields=["uuid"]),
+        schema.Endpoint("metadata/hostname", fields=["hostname"]),
+        schema.Endpoint("metadata/ssh_keys",
+                        fields=[schema.Field(SSH_KEYS, field=SSH_KEYS_COUNT,
+                                             decode=False)],
+                        render=_render_ssh_keys),
+        schema.Endpoint("metadata/ssh_keys/{key_id}",
+                        fields=[_ssh_key_field("{key_id}")],
+                        render=_render_ssh_key),
+    ] + _phone_home_endpoints("metadata/phone_home_url") + [
+        schema.Endpoint("userdata",
+                        fields=("user_data", ) + arestor_template.FIELDS,
+                        render=_render_userdata),
+    ] + _phone_home_endpoints(FAKE_PHONE_HOME_URL)
+    derived = [
+        schema.Derived(SSH_KEYS, ["public_keys"], _build_ssh_keys),
     ]
-    """A list that contains all the resources (endpoints) available for the
-    current metadata service."""
-
-    exposed = True
-    """Whether this application should be available for clients."""
-
-    def __getattr__(self, name):
-        """Handle for invalid resource name or alias."""
-
-        # Note(alexcoman): The cherrypy MethodDispatcher will replace the
-        # `-` from the resource / endpoint name with `_`. In order to avoid
-        # any problems we will try to avoid this scenario.
-        if "_" in name:
-            return self.__dict__.get(name.replace("_", "-"))
-
-        raise AttributeError("%r object has no attribute %r" %
-                             (self.__class__.__name__, name))
-
-    @classmethod
-    def get_base_url(cls):
-        url = cherrypy.url()
-        while not url.split('/')[-1].startswith("instance-"):
-            url = '/'.join(url.split('/')[:-1])
-        return url
+
+
+PacketEndpoint = PacketProvider.compile()
@@ -318,7 +318,9 @@ class Application(Group, Task):
 
     def _on_task_done(self, result):
         """What to execute after successfully finished processing a task."""
-        self.on_task_done(self, result)
+        # NOTE: The status of the command which was run is kept.
+        if self._status == constant.TASK_RUNNING:
+            self.on_task_done(self, result)
 
     def _on_task_fail(self, exc):
         """What to do when the program fails processing a task."""
@@ -12,8 +12,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from arestor.cli.commands import bench
 from arestor.cli.commands import server
 from arestor.cli.commands import user
 
+Bench = bench.Bench
 Server = server.Server
 User = user.User
@@ -0,0 +1,255 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from __future__ import print_function
+
+import json
+
+from oslo_log import log as logging
+import prettytable
+
+from arestor.cli import base as cli_base
+from arestor.common import bench as arestor_bench
+from arestor.common import exception
+from arestor.common import microbench
+from arestor import config as arestor_config
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+
+def _milliseconds(value):
+    """Format a latency from the results."""
+    if value is None:
+        return "-"
+    return "%.2f" % (value * 1000)
+
+
+class _BootStorm(cli_base.Command):
+
+    """Simulate the boot of many instances at the same time."""
+
+    def _on_task_done(self, result):
+        """What to execute after successfully finished processing a task."""
+        if not result:
+            return
+
+        if self.args.output:
+            if self.args.output == "-":
+                print(json.dumps(result, indent=4, sort_keys=True))
+                return
+            with open(self.args.output, "w") as file_handle:
+                json.dump(result, file_handle, indent=4, sort_keys=True)
+
+        labels = [arestor_bench.percentile_label(point)
+                  for point in arestor_bench.PERCENTILES]
+        table = prettytable.PrettyTable(
+            ["Step", "Count", "Errors", "Req/s"] +
+            ["%s (ms)" % label for label in labels])
+        for step, summary in sorted(result["steps"].items()):
+            table.add_row(
+                [step, summary["count"], result["errors"].get(step, 0),
+                 "%.1f" % summary.get("throughput", 0)] +
+                [_milliseconds(summary[label]) for label in labels])
+        print(table)
+        print("%(requests)d requests in %(duration).3f seconds "
+              "(%(throughput).1f requests/second)." % result)
+
+    def setup(self):
+        """Extend the parser configuration in order to expose this command."""
+        parser = self._parser.add_parser(
+            "boot-storm",
+            help="Simulate the boot of many instances at the same time.")
+        parser.add_argument(
+            "--url", dest="url",
+            default="http://%s:%d/" % (CONFIG.api.host, CONFIG.api.port),
+            help="The url of the Arestor API.")
+        parser.add_argument(
+            "--api-key", dest="api_key", required=True,
+            help="The API key used in order to seed the instances.")
+        parser.add_argument(
+            "--secret", dest="secret", required=True,
+            help="The secret of the API key.")
+        parser.add_argument(
+            "--namespace", dest="namespace", default="openstack",
+            choices=["openstack", "packet"],
+            help="The metadata provider used by the instances.")
+        parser.add_argument(
+            "--instances", dest="instances", type=int, default=100,
+            help="The number of synthetic instances.")
+        parser.add_argument(
+            "--boots", dest="boots", type=int, default=None,
+            help="The number of simulated boots (defaults to the number "
+                 "of instances).")
+        parser.add_argument(
+            "--concurrency", dest="concurrency", type=int, default=10,
+            help="The number of virtual clients.")
+        parser.add_argument(
+            "--user-data-size", dest="user_data_size", type=int,
+            default=1024, help="The size of the user_data in bytes.")
+        parser.add_argument(
+            "--skip-seed", dest="skip_seed", action="store_true",
+            help="Reuse the instances seeded by a previous run.")
+        parser.add_argument(
+            "--output", dest="output", default=None,
+            help="Write the results as JSON to the given file "
+                 "(`-` for stdout).")
+        parser.set_defaults(work=self.run)
+
+    def _work(self):
+        """Seed the instances and simulate their boot."""
+        storm = arestor_bench.BootStorm(
+            self.args.url, self.args.api_key, self.args.secret,
+            arestor_bench.storm_options(
+                namespace=self.args.namespace,
+                instances=self.args.instances, boots=self.args.boots,
+                concurrency=self.args.concurrency,
+                user_data_size=self.args.user_data_size))
+        if not self.args.skip_seed:
+            storm.seed()
+        return storm.run()
+
+
+def _load_results(path):
+    """Load the results of a micro-benchmark run."""
+    try:
+        with open(path, "r") as file_handle:
+            return json.load(file_handle)
+    except (IOError, ValueError) as exc:
+        raise exception.Invalid("Failed to load %(path)s: %(reason)s",
+                                path=path, reason=exc)
+
+
+class _MicroBenchmarks(cli_base.Command):
+
+    """Run the micro-benchmarks for the hot paths of the API."""
+
+    def _on_task_done(self, result):
+        """What to execute after successfully finished processing a task."""
+        if self.args.output:
+            with open(self.args.output, "w") as file_handle:
+                json.dump(result, file_handle, indent=4, sort_keys=True)
+
+        table = prettytable.PrettyTable(
+            ["Benchmark", "Loops", "Best (us)", "Median (us)"])
+        for name, timings in result["benchmarks"].items():
+            if "error" in timings or "skipped" in timings:
+                table.add_row([name, "-", "-", timings.get("error") or
+                               "skipped: %s" % timings["skipped"]])
+                continue
+            table.add_row([name, timings["number"],
+                           "%.2f" % (timings["best"] * 10 ** 6),
+                           "%.2f" % (timings["median"] * 10 ** 6)])
+        print(table)
+
+    def setup(self):
+        """Extend the parser configuration in order to expose this command."""
+        parser = self._parser.add_parser(
+            "micro", help="Run the micro-benchmarks for the hot paths.")
+        parser.add_argument(
+            "--filter", dest="filter", action="append", default=None,
+            help="Run only the benchmarks which contain the given text "
+                 "in their name (can be used multiple times).")
+        parser.add_argument(
+            "--repeat", dest="repeat", type=int, default=5,
+            help="The number of timed loops for every benchmark.")
+        parser.add_argument(
+            "--min-time", dest="min_time", type=float, default=0.2,
+            help="The minimum duration of a timed loop in seconds.")
+        parser.add_argument(
+            "--output", dest="output", default=None,
+            help="Save the results as a JSON baseline.")
+        parser.set_defaults(work=self.run)
+
+    def _work(self):
+        """Run the micro-benchmarks."""
+        return microbench.run(self.args.filter, self.args.repeat,
+                              self.args.min_time)
+
+
+class _CompareBenchmarks(cli_base.Command):
+
+    """Compare the micro-benchmarks with a baseline."""
+
+    def _on_task_done(self, result):
+        """What to execute after successfully finished processing a task."""
+        print(result)
+
+    def setup(self):
+        """Extend the parser configuration in order to expose this command."""
+        parser = self._parser.add_parser(
+            "compare", help="Compare the micro-benchmarks with a baseline "
+                            "and fail if a hot path slowed down.")
+        parser.add_argument(
+            "--baseline", dest="baseline", required=True,
+            help="The JSON baseline saved by `arestor bench micro`.")
+        parser.add_argument(
+            "--current", dest="current", default=None,
+            help="The JSON results compared with the baseline (the "
+                 "micro-benchmarks are run when it is missing).")
+        parser.add_argument(
+            "--tolerance", dest="tolerance", type=float, default=0.1,
+            help="The accepted slow down (0.1 means 10%%).")
+        parser.set_defaults(work=self.run)
+
+    def _work(self):
+        """Compare the results and fail if a benchmark slowed down."""
+        baseline = _load_results(self.args.baseline)
+        if self.args.current:
+            current = _load_results(self.args.current)
+        else:
+            current = microbench.run(list(baseline["benchmarks"]))
+
+        table = prettytable.PrettyTable(
+            ["Benchmark", "Baseline (us)", "Current (us)", "Change",
+             "Status"])
+        regressions = []
+        for name, reference, value, ratio, regressed in microbench.compare(
+                baseline, current, self.args.tolerance):
+            if regressed:
+                regressions.append(name)
+            table.add_row([
+                name, "%.2f" % (reference * 10 ** 6),
+                "-" if value is None else "%.2f" % (value * 10 ** 6),
+                "-" if ratio is None else "%+.1f%%" % ((ratio - 1) * 100),
+                "SLOWER" if regressed else "ok"])
+
+        if regressions:
+            print(table)
+            raise exception.CliError(
+                "%(count)d benchmarks slowed down more than %(tolerance)s: "
+                "%(names)s", count=len(regressions),
+                tolerance=self.args.tolerance,
+                names=", ".join(regressions))
+        return table
+
+
+class Bench(cli_base.Group):
+
+    """Group for all the available benchmarks."""
+
+    commands = [
+        (_BootStorm, "actions"),
+        (_MicroBenchmarks, "actions"),
+        (_CompareBenchmarks, "actions"),
+    ]
+
+    def setup(self):
+        """Extend the parser configuration in order to expose this command."""
+        parser = self._parser.add_parser(
+            "bench", help="Load generators used in order to size the "
+                          "Arestor API.")
+
+        actions = parser.add_subparsers()
+        self._register_parser("actions", actions)
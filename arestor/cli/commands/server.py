@@ -19,11 +19,14 @@ import cherrypy
 from oslo_log import log as logging
 
 from arestor import api as arestor_api
+from arestor import config as arestor_config
 from arestor.cli import base as cli_base
+from arestor.common import asynclog
 from arestor.common import constant
 from arestor.common import exception
 
 
+CONFIG = arestor_config.CONFIG
 LOG = logging.getLogger(__name__)
 
 
@@ -42,6 +45,9 @@ class Start(cli_base.Command):
         pid = os.getpid()
         with open(constant.PID_TMP_FILE, "w") as file_handle:
             file_handle.write(str(pid))
+        if CONFIG.async_log.enabled:
+            asynclog.install()
+            cherrypy.engine.subscribe("exit", asynclog.uninstall)
         cherrypy.quickstart(arestor_api.Root(), "/", arestor_api.Root.config())
 
 
@@ -11,13 +11,22 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import base64
+import collections
+from concurrent import futures
+import contextlib
 import json
 import posixpath
+import threading
 
 from requests import compat as url_parse
 
 from arestor.client import resource as base_client
 from arestor.common import constant
+from arestor.common import util as arestor_util
+
+profile_id = arestor_util.profile_id
+"""Return the client id used in order to store the required profile."""
 
 
 def _append_forward_slash(base):
@@ -27,7 +36,7 @@ def _append_forward_slash(base):
     return base
 
 
-def _url_join(base, *args):
+def url_join(base, *args):
     """Join the url fragments."""
     base = _append_forward_slash(base)
     # NOTE(mmicu): pylint is not aware about the fact
@@ -37,11 +46,45 @@ def _url_join(base, *args):
         url_parse.urljoin(base, posixpath.join(*args)))
 
 
+def resource_key(base_info, resource_name):
+    """Return the key of the resource in the mocked meta-data."""
+    return constant.KEY_FORMAT.format(namespace=base_info["namespace"],
+                                      user=base_info["client_id"],
+                                      name=resource_name)
+
+
+def resource_content(base_info, resource_name, resource_data):
+    """Return the content required in order to create a new resource."""
+    data = {
+        "resource": resource_name,
+        "data": json.dumps(resource_data)
+    }
+    data.update(base_info)
+    return data
+
+
+def load_data(resource):
+    """Return the data stored in the received resource."""
+    data = resource.get("data", {})
+    try:
+        data = json.loads(data)
+    except ValueError:
+        pass
+    return data
+
+
 class ArestorClient(base_client.ResourceClient):
-    """Arestor client."""
+    """Arestor client.
 
-    def __init__(self, base_url, api_key, secret, client_id, namespace=""):
-        super(ArestorClient, self).__init__(base_url, api_key, secret)
+    The extra keyword arguments (`pool_size`, `timeout` and `keep_alive`)
+    are used in order to configure the connection pool of the client,
+    `cache` enables the client-side cache for the resources.
+    """
+
+    def __init__(self, base_url, api_key, secret, client_id, namespace="",
+                 **kwargs):
+        super(ArestorClient, self).__init__(base_url, api_key, secret,
+                                            **kwargs)
         self._client_id = client_id
         self._namespace = namespace
 
@@ -49,30 +92,27 @@ class ArestorClient(base_client.ResourceClient):
             "client_id": self._client_id,
             "namespace": self._namespace,
         }
+        self._batch = threading.local()
 
     @property
     def client_id(self):
         """Return the client id."""
-        url = _url_join(self._base_url, self._client_id, self._namespace)
+        url = url_join(self._base_url, self._client_id, self._namespace)
         return url
 
     def _get_resource(self, resource_name):
         """Get resource in the mocked meta-data."""
-        key = constant.KEY_FORMAT.format(
-            namespace=self._base_info["namespace"],
-            user=self._base_info["client_id"],
-            name=resource_name)
-
-        data = self.resource(key).get("data", {})
-        try:
-            data = json.loads(data)
-        except ValueError:
-            pass
-        return data
+        key = resource_key(self._base_info, resource_name)
+        entry = self._resource_entry(key)
+        if entry.data is None:
+            # NOTE: The decoded data is kept in the cache entry, an
+            # unchanged resource is not decoded again.
+            entry.data = load_data(entry.content)
+        return entry.data
 
     def get_url(self):
         """Return the url for this client."""
-        url = _url_join(self._base_url, 'v1', self._namespace, self._client_id)
+        url = url_join(self._base_url, 'v1', self._namespace, self._client_id)
         return url
 
     def set_namespace(self, namespace):
@@ -85,14 +125,47 @@ class ArestorClient(base_client.ResourceClient):
             "namespace": self._namespace,
         }
 
+    @contextlib.contextmanager
+    def batch(self):
+        """Defer all the writes until the end of the context.
+
+        All the resources set inside the context are sent to the Arestor
+        API with a single request when the (outermost) context is left.
+        Repeated writes to the same resource are merged, only the last
+        value is sent. The pending writes are discarded if the context
+        is left because of an exception.
+
+        The pending writes are tracked per thread, so the client can still
+        be shared between threads.
+        """
+        if not getattr(self._batch, "depth", 0):
+            self._batch.pending = collections.OrderedDict()
+        self._batch.depth = getattr(self._batch, "depth", 0) + 1
+
+        pending = None
+        try:
+            yield self
+        finally:
+            self._batch.depth -= 1
+            if not self._batch.depth:
+                pending, self._batch.pending = self._batch.pending, None
+
+        # NOTE: Reached only when the context is left normally.
+        if pending:
+            self.create_resources(list(pending.values()))
+
     def _create_resource(self, resource_name, resource_data):
         """Create a new resource in the mocked meta-data."""
-        data = {
-            "resource": resource_name,
-            "data": json.dumps(resource_data)
-        }
-        data.update(self._base_info)
-        self.create_resource(data)
+        content = resource_content(self._base_info, resource_name,
+                                   resource_data)
+        pending = getattr(self._batch, "pending", None)
+        if pending is not None:
+            key = resource_key(self._base_info, resource_name)
+            pending.pop(key, None)
+            pending[key] = content
+            return
+
+        self.create_resource(content)
 
     def set_hostname(self, hostname):
         """Set the hostname in the mocked meta-data."""
@@ -135,6 +208,53 @@ class ArestorClient(base_client.ResourceClient):
     def set_user_data(self, userdata):
         self._create_resource("user_data", userdata)
 
+    def set_profile(self, name):
+        """Use the resources of the profile which are not set explicitly.
+
+        Only the resources which differ from the profile (eg. the uuid and
+        the hostname) have to be set for the instance.
+        """
+        self._create_resource("profile", name)
+
+    def set_network(self, network_id):
+        """Identify the instance by the addresses from the network."""
+        self.create_network(network_id, self._client_id)
+
+    def set_user_data_template(self, name, **variables):
+        """Render the user_data from a template stored on the server.
+
+        The placeholders from the template are replaced with the data of
+        the instance (`hostname`, `uuid`, `name`, `launch_index`,
+        `availability_zone` and `project_id`) and with the received
+        variables.
+        """
+        self._create_resource("user_data_template",
+                              {"name": name, "variables": variables})
+
+    def set_nics(self, nics):
+        """Set the network interfaces used for network_data.json.
+
+        :param nics: a list of dictionaries with the `mac_address`, `mtu`,
+                     `ip_address`, `netmask`, `gateway`, `dns_nameservers`
+                     and `network_id` of every network interface
+        """
+        self._create_resource("nics", nics)
+
+    def set_vendor_data(self, vendor_data):
+        """Set the content of vendor_data.json."""
+        self._create_resource("vendor_data", vendor_data)
+
+    def set_files(self, files):
+        """Set the files injected in the instance.
+
+        :param files: a dictionary which maps the path of every file to
+                      its content
+        """
+        files = dict((path, arestor_util.get_as_string(
+            base64.b64encode(arestor_util.get_as_bytes(content))))
+            for path, content in files.items())
+        self._create_resource("files", files)
+
     def get_password(self):
         return self._get_resource("password")
 
@@ -142,7 +262,59 @@ class ArestorClient(base_client.ResourceClient):
         ssh_keys = self._get_resource("public_keys")
         return ssh_keys
 
-    def delete_all_data(self):
-        """Delete all meta_data for the current client_id."""
-        for resource_id in self.resources(client_id=self._client_id):
-            self.delete_resource(resource_id)
+    def get_timeline(self):
+        """Return the metadata requests recorded for the current client_id.
+
+        The requests are returned from the oldest one, with their route,
+        status, latency and timestamp.
+        """
+        return self.timeline(self._client_id)
+
+    def delete_all_data(self, concurrency=None, callback=None):
+        """Delete all meta_data for the current client_id.
+
+        :param concurrency:
+            The maximum number of delete requests sent at the same time.
+            When it is not provided the resources are deleted one by one
+            and the first failure is raised.
+        :param callback:
+            A callable which is called after each resource was processed
+            with the resource id, the error (or None), the number of
+            processed resources and the total number of resources.
+
+        Return a dictionary with the `deleted` resources and the `failed`
+        ones (mapped to the error message).
+        """
+        resource_ids = self.resources(client_id=self._client_id)
+        summary = {"deleted": [], "failed": {}}
+
+        def _on_done(resource_id, error):
+            """Update the summary and report the progress."""
+            if error is None:
+                summary["deleted"].append(resource_id)
+            else:
+                summary["failed"][resource_id] = str(error)
+            if callback:
+                callback(resource_id, error,
+                         len(summary["deleted"]) + len(summary["failed"]),
+                         len(resource_ids))
+
+        if not concurrency:
+            for resource_id in resource_ids:
+                self.delete_resource(resource_id)
+                _on_done(resource_id, None)
+            return summary
+
+        # NOTE: The requests share the connection pool of the client, it
+        # does not make sense to use more workers than connections.
+        workers = max(1, min(concurrency, self._pool_size))
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = dict(
+                (executor.submit(self.delete_resource, resource_id),
+                 resource_id)
+                for resource_id in resource_ids)
+            for future in futures.as_completed(pending):
+                error = future.exception()
+                _on_done(pending[future], error)
+
+        return summary
@@ -0,0 +1,365 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Asyncio based clients for the Arestor API.
+
+The clients from this module require Python 3.5+ and `aiohttp`
+(`pip install arestor[async]`), the module can not be imported by the
+older interpreters.
+"""
+
+import asyncio
+import base64
+
+import requests
+
+from arestor.client import arestor_client
+from arestor.client import base as base_client
+from arestor.client import resource as resource_client
+from arestor.common import exception
+from arestor.common import tracing as arestor_tracing
+from arestor.common import util as arestor_util
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+DEFAULT_CONCURRENCY = 100
+"""The maximum number of requests sent at the same time by a client."""
+
+
+class AsyncClient(base_client.Client):
+
+    """Basic asynchronous Arestor API client.
+
+    The requests are signed exactly like the ones sent by the blocking
+    client and they are sent over a pooled `aiohttp` session. At most
+    `concurrency` requests are in flight at the same time, the other ones
+    are waiting for a free slot.
+
+    :param concurrency: the maximum number of requests in flight
+    """
+
+    def __init__(self, base_url, api_key, secret,
+                 concurrency=DEFAULT_CONCURRENCY, **kwargs):
+        if aiohttp is None:
+            raise exception.NotSupported(feature="The asynchronous client",
+                                         context="the current environment "
+                                                 "(aiohttp is missing)")
+
+        super(AsyncClient, self).__init__(base_url, api_key, secret,
+                                          **kwargs)
+        self._concurrency = concurrency
+        self._semaphore = None
+        self._async_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    @property
+    def async_session(self):
+        """Return the pooled HTTP session used by the current client."""
+        if self._async_session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size, force_close=not self._keep_alive)
+            self._async_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout))
+        return self._async_session
+
+    @property
+    def semaphore(self):
+        """Return the semaphore which limits the requests in flight."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        return self._semaphore
+
+    async def aclose(self):
+        """Close all the connections from the pool."""
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+    async def _request(self, method, resource, data=None, params=None,
+                       headers=None):
+        """Send a request to the Arestor API and return the response body."""
+        url = requests.compat.urljoin(self._base_url, resource)
+        async with self.semaphore:
+            # NOTE: The request is signed only when it can be sent, the
+            # signature is valid only for a short period of time.
+            content, auth_params = self._sign(data, params)
+            auth_params = dict((key, arestor_util.get_as_string(value))
+                               for key, value in auth_params.items())
+            # NOTE: The active span belongs to the thread, it is not
+            # changed while the coroutines are interleaved.
+            path = requests.compat.urlparse(url).path
+            span = arestor_tracing.start_span(
+                "%s %s" % (method, path), kind=arestor_tracing.KIND_CLIENT,
+                parent=arestor_tracing.current())
+            if span is not None:
+                span.tag("http.method", method)
+                span.tag("http.path", path)
+                headers = dict(headers or {})
+                headers[arestor_tracing.TRACEPARENT] = span.traceparent
+            try:
+                async with self.async_session.request(
+                        method, url, params=auth_params, data=content,
+                        headers=headers) as response:
+                    if span is not None:
+                        span.tag("http.status_code", response.status)
+                    body = await response.text()
+                    response.raise_for_status()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                if span is not None:
+                    span.tag("error", exc)
+                raise exception.ClientError(msg=exc)
+            finally:
+                if span is not None:
+                    span.finish()
+
+        return body
+
+    async def get(self, resource):
+        """Get the required resource."""
+        return await self._request("GET", resource)
+
+    async def post(self, resource, data):
+        """Create a new resource."""
+        return await self._request("POST", resource, data)
+
+    async def put(self, resource, data):
+        """Update an existing resource."""
+        return await self._request("PUT", resource, data)
+
+    async def delete(self, resource):
+        """Delete the required resource."""
+        return await self._request("DELETE", resource)
+
+
+class AsyncResourceClient(AsyncClient):
+
+    """Asynchronous client for resource management."""
+
+    async def _send(self, method, url, data=None):
+        """Send the request and return the content of the response."""
+        body = await self._request(method, url, data)
+        return resource_client.get_content(body)
+
+    async def resources(self, namespace=None, client_id=None, resource=None):
+        """Get all the available resources.
+
+        The list can be filtered by `namespace`, `client_id` and `resource`.
+        """
+        filters = resource_client.resource_filters(namespace, client_id,
+                                                   resource)
+        return await self._send("GET",
+                                resource_client.resource_url(**filters))
+
+    async def resource(self, resource_id):
+        """Get the required resource."""
+        return await self._send("GET", resource_client.resource_url(
+            resource_id=resource_id))
+
+    async def create_resource(self, content):
+        """Create a new resource."""
+        return await self._send("POST", resource_client.resource_url(),
+                                data=content)
+
+    async def update_resource(self, resource_id, content):
+        """Update the content of the given resource."""
+        return await self._send("PUT", resource_client.resource_url(
+            resource_id=resource_id), data=content)
+
+    async def delete_resource(self, resource_id):
+        """Delete the given resource."""
+        return await self._send("DELETE", resource_client.resource_url(
+            resource_id=resource_id))
+
+    async def create_network(self, network_id, client_id):
+        """Map the network (in CIDR notation) to the instance."""
+        return await self._send("POST", resource_client.NETWORK_URL,
+                                data={"network_id": network_id,
+                                      "client_id": client_id})
+
+    async def create_template(self, name, template):
+        """Create or update a user_data template."""
+        content = await self._send("POST", resource_client.TEMPLATE_URL,
+                                   data={"name": name, "template": template})
+        return content["version"]
+
+
+class AsyncArestorClient(AsyncResourceClient):
+
+    """Asynchronous counterpart of :class:`ArestorClient`."""
+
+    def __init__(self, base_url, api_key, secret, client_id, namespace="",
+                 **kwargs):
+        super(AsyncArestorClient, self).__init__(base_url, api_key, secret,
+                                                 **kwargs)
+        self._client_id = client_id
+        self._namespace = namespace
+
+        self._base_info = {
+            "client_id": self._client_id,
+            "namespace": self._namespace,
+        }
+
+    @property
+    def client_id(self):
+        """Return the client id."""
+        return arestor_client.url_join(self._base_url, self._client_id,
+                                       self._namespace)
+
+    def get_url(self):
+        """Return the url for this client."""
+        return arestor_client.url_join(self._base_url, 'v1',
+                                       self._namespace, self._client_id)
+
+    def set_namespace(self, namespace):
+        """Set a specific namespace."""
+        self._namespace = namespace
+        self._base_info = {
+            "client_id": self._client_id,
+            "namespace": self._namespace,
+        }
+
+    async def _get_resource(self, resource_name):
+        """Get resource in the mocked meta-data."""
+        key = arestor_client.resource_key(self._base_info, resource_name)
+        return arestor_client.load_data(await self.resource(key))
+
+    async def _create_resource(self, resource_name, resource_data):
+        """Create a new resource in the mocked meta-data."""
+        await self.create_resource(arestor_client.resource_content(
+            self._base_info, resource_name, resource_data))
+
+    async def set_hostname(self, hostname):
+        """Set the hostname in the mocked meta-data."""
+        await self._create_resource("hostname", hostname)
+
+    async def set_uuid(self, uuid):
+        """Set the uuid in the mocked meta-data."""
+        await self._create_resource("uuid", uuid)
+
+    async def set_random_seed(self, random_seed):
+        """Set the random_seed in the mocked meta-data."""
+        await self._create_resource("random_seed", random_seed)
+
+    async def set_availability_zone(self, availability_zone):
+        """Set the availability_zone in the mocked meta-data."""
+        await self._create_resource("availability_zone", availability_zone)
+
+    async def set_launch_index(self, launch_index):
+        """Set the launch_index in the mocked meta-data."""
+        await self._create_resource("launch_index", launch_index)
+
+    async def set_project_id(self, project_id):
+        """Set the project_id in the mocked meta-data."""
+        await self._create_resource("project_id", project_id)
+
+    async def set_name(self, name):
+        """Set the name in the mocked meta-data."""
+        await asyncio.gather(self._create_resource("name", name),
+                             self._create_resource("hostname", name))
+
+    async def set_ssh_pubkeys(self, ssh_keys):
+        await self._create_resource("public_keys", ssh_keys)
+
+    async def set_keys(self, cert_keys):
+        await self._create_resource("keys", cert_keys)
+
+    async def set_metadata(self, metadata):
+        await self._create_resource("metadata", metadata)
+
+    async def set_user_data(self, userdata):
+        await self._create_resource("user_data", userdata)
+
+    async def set_profile(self, name):
+        """Use the resources of the profile which are not set explicitly."""
+        await self._create_resource("profile", name)
+
+    async def set_network(self, network_id):
+        """Identify the instance by the addresses from the network."""
+        await self.create_network(network_id, self._client_id)
+
+    async def set_user_data_template(self, name, **variables):
+        """Render the user_data from a template stored on the server."""
+        await self._create_resource("user_data_template",
+                                    {"name": name, "variables": variables})
+
+    async def set_nics(self, nics):
+        """Set the network interfaces used for network_data.json.
+
+        :param nics: a list of dictionaries with the `mac_address`, `mtu`,
+                     `ip_address`, `netmask`, `gateway`, `dns_nameservers`
+                     and `network_id` of every network interface
+        """
+        await self._create_resource("nics", nics)
+
+    async def set_vendor_data(self, vendor_data):
+        """Set the content of vendor_data.json."""
+        await self._create_resource("vendor_data", vendor_data)
+
+    async def set_files(self, files):
+        """Set the files injected in the instance.
+
+        :param files: a dictionary which maps the path of every file to
+                      its content
+        """
+        files = dict((path, arestor_util.get_as_string(
+            base64.b64encode(arestor_util.get_as_bytes(content))))
+            for path, content in files.items())
+        await self._create_resource("files", files)
+
+    async def get_password(self):
+        return await self._get_resource("password")
+
+    async def get_ssh_pubkeys(self):
+        return await self._get_resource("public_keys")
+
+    async def delete_all_data(self, callback=None):
+        """Delete all meta_data for the current client_id.
+
+        The resources are deleted concurrently (up to the concurrency
+        limit of the client). The `callback` and the returned summary
+        have the same meaning as for :meth:`ArestorClient.delete_all_data`.
+        """
+        resource_ids = await self.resources(client_id=self._client_id)
+        summary = {"deleted": [], "failed": {}}
+
+        async def _delete(resource_id):
+            """Delete the resource and report the progress."""
+            # NOTE: The name bound by `except ... as` is removed at the end
+            # of the except clause, the failure is kept apart.
+            failure = None
+            try:
+                await self.delete_resource(resource_id)
+            except exception.ClientError as error:
+                failure = error
+                summary["failed"][resource_id] = str(error)
+            else:
+                summary["deleted"].append(resource_id)
+
+            if callback:
+                callback(resource_id, failure,
+                         len(summary["deleted"]) + len(summary["failed"]),
+                         len(resource_ids))
+
+        await asyncio.gather(*[_delete(resource_id)
+                               for resource_id in resource_ids])
+        return summary
@@ -13,28 +13,107 @@
 #    under the License.
 
 import json
+import threading
 import time
 
 import requests
+from requests import adapters
 
 from arestor.common import exception
+from arestor.common import tracing as arestor_tracing
 from arestor.common import util as arestor_util
 
+DEFAULT_POOL_SIZE = 10
+"""The maximum number of connections kept open to the Arestor API."""
+
+DEFAULT_TIMEOUT = 30
+"""The number of seconds to wait for the Arestor API to answer."""
+
 
 class BaseClient(object):
 
-    def __init__(self, base_url):
-        self._base_url = base_url
+    """Basic HTTP client for the Arestor API.
 
-    def _request(self, method, resource, data=None):
-        """Send a request to the Arestor API."""
-        url = requests.compat.urljoin(self._base_url, resource)
-        try:
-            response = requests.request(method=method, url=url,
-                                        data=data)
-        except requests.RequestException as exc:
-            raise exception.ClientError(exc)
+    All the requests are sent through a pooled :class:`requests.Session`,
+    the connections are kept alive and reused between calls. The client
+    can be shared between threads and it can be used as a context manager
+    in order to release the connections when it is no longer needed.
+
+    :param base_url: the url of the Arestor API
+    :param pool_size: the maximum number of connections kept in the pool
+    :param timeout: the number of seconds to wait for the server to answer
+    :param keep_alive: whether the connections should be reused
+    """
 
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE,
+                 timeout=DEFAULT_TIMEOUT, keep_alive=True):
+        self._base_url = base_url
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._keep_alive = keep_alive
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def session(self):
+        """Return the pooled HTTP session used by the current client."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        """Create a new HTTP session with a connection pool."""
+        session = requests.Session()
+        adapter = adapters.HTTPAdapter(pool_maxsize=self._pool_size,
+                                       pool_block=True)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if not self._keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def close(self):
+        """Close all the connections from the pool."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _request(self, method, resource, data=None, params=None,
+                 headers=None, stream=False):
+        """Send a request to the Arestor API.
+
+        When `stream` is set the body of the response is not retrieved
+        until it is consumed.
+        """
+        url = requests.compat.urljoin(self._base_url, resource)
+        path = requests.compat.urlparse(url).path
+        with arestor_tracing.span("%s %s" % (method, path),
+                                  kind=arestor_tracing.KIND_CLIENT,
+                                  tags={"http.method": method,
+                                        "http.path": path}) as span:
+            if span is not None:
+                headers = dict(headers or {})
+                headers[arestor_tracing.TRACEPARENT] = span.traceparent
+            try:
+                response = self.session.request(method=method, url=url,
+                                                params=params, data=data,
+                                                headers=headers,
+                                                timeout=self._timeout,
+                                                stream=stream)
+            except requests.RequestException as exc:
+                raise exception.ClientError(msg=exc)
+
+            if span is not None:
+                span.tag("http.status_code", response.status_code)
         return response
 
     def get(self, resource):
@@ -58,8 +137,8 @@ class Client(BaseClient):
 
     """Basic Arestor API client."""
 
-    def __init__(self, base_url, api_key, secret):
-        super(Client, self).__init__(base_url)
+    def __init__(self, base_url, api_key, secret, **kwargs):
+        super(Client, self).__init__(base_url, **kwargs)
         self._key = api_key
         self._cipher = arestor_util.AESCipher(secret)
 
@@ -70,10 +149,17 @@ class Client(BaseClient):
         params["signature"] = signature
         return params
 
-    def _request(self, method, resource, data=None):
-        """Send a request to the Arestor API."""
-        url = requests.compat.urljoin(self._base_url, resource)
+    def _sign(self, data=None, params=None):
+        """Prepare the content and the query parameters for a request."""
         content = data or self._cipher.encrypt(json.dumps(data))
-        return requests.request(method=method, url=url,
-                                params=self._get_auth_params(),
-                                data=content)
+        auth_params = self._get_auth_params()
+        auth_params.update(params or {})
+        return content, auth_params
+
+    def _request(self, method, resource, data=None, params=None,
+                 headers=None, stream=False):
+        """Send a request to the Arestor API."""
+        content, auth_params = self._sign(data, params)
+        return super(Client, self)._request(method, resource, data=content,
+                                            params=auth_params,
+                                            headers=headers, stream=stream)
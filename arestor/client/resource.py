@@ -11,16 +11,166 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import contextlib
 import json
+import threading
+
 import requests
 
 from arestor.client import base as base_client
 from arestor.common import exception
 
+RESOURCE_URL = "/admin/resource"
+BATCH_URL = "/admin/batch"
+TEMPLATE_URL = "/admin/template"
+NETWORK_URL = "/admin/network"
+FLEET_URL = "/admin/fleet"
+PROFILER_URL = "/admin/profiler"
+MEMORY_URL = "/admin/memory"
+TIMELINE_URL = "/admin/timeline"
+
+
+def resource_url(**params):
+    """Return the url for the resource management endpoint."""
+    if not params:
+        return RESOURCE_URL
+    return "{}?{}".format(RESOURCE_URL, requests.compat.urlencode(params))
+
+
+def _timeline_url(instance_id=None):
+    """Return the url of the boot timeline of the instance."""
+    if not instance_id:
+        return TIMELINE_URL
+    return "{}?{}".format(TIMELINE_URL, requests.compat.urlencode(
+        {"instance_id": instance_id}))
+
+
+def _template_url(name):
+    """Return the url of the required template."""
+    return "{}?{}".format(TEMPLATE_URL,
+                          requests.compat.urlencode({"name": name}))
+
+
+def resource_filters(namespace=None, client_id=None, resource=None):
+    """Return the filters that should be used in order to list resources."""
+    filters = {
+        "namespace": namespace,
+        "client_id": client_id,
+        "resource": resource,
+    }
+    # NOTE(mmicu):  filter out keys with value None
+    return dict((key, value) for key, value in filters.items() if value)
+
+
+def get_content(raw_response):
+    """Return the content from a response of the resource endpoint."""
+    try:
+        response = json.loads(raw_response)
+    except ValueError:
+        raise exception.ClientError(msg="Malformed response.")
+
+    if not response["meta"]["status"]:
+        raise exception.ClientError(msg=response["meta"]["verbose"])
+
+    return response["content"]
+
+
+class CacheEntry(object):
+
+    """A resource stored in the client-side cache."""
+
+    def __init__(self, etag, content):
+        self.etag = etag
+        self.content = content
+        self.data = None
+        """The decoded data of the resource (filled in by the consumer)."""
+
+
+class ResourceCache(object):
+
+    """Thread safe client-side cache for resources.
+
+    The entries are keyed by the resource id and they keep the validator
+    (ETag) returned by the Arestor API.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, resource_id):
+        """Return the entry for the given resource or None."""
+        return self._entries.get(resource_id)
+
+    def hit(self):
+        """Account a request answered from the cache."""
+        with self._lock:
+            self._hits += 1
+
+    def store(self, resource_id, etag, content):
+        """Store the received resource and return the new entry."""
+        entry = CacheEntry(etag, content)
+        with self._lock:
+            self._misses += 1
+            if etag:
+                self._entries[resource_id] = entry
+        return entry
+
+    def invalidate(self, resource_id):
+        """Remove the resource from the cache."""
+        with self._lock:
+            self._entries.pop(resource_id, None)
+
+    def clear(self):
+        """Remove all the entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        """Return the hit and miss statistics for the current cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "ratio": float(self._hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
+
 
 class ResourceClient(base_client.Client):
 
-    """Client for resource management."""
+    """Client for resource management.
+
+    :param cache:
+        Whether the resources should be cached on the client side. The
+        cached resources are revalidated with a conditional request, an
+        unchanged resource is returned without transferring its body.
+    """
+
+    def __init__(self, base_url, api_key, secret, cache=False, **kwargs):
+        super(ResourceClient, self).__init__(base_url, api_key, secret,
+                                             **kwargs)
+        self._cache = ResourceCache() if cache else None
+
+    @property
+    def cache_stats(self):
+        """Return the statistics of the client-side cache (if enabled)."""
+        if self._cache is None:
+            return None
+        return self._cache.stats
+
+    def _send(self, method, url, data=None):
+        """Send the request and return the content of the response."""
+        try:
+            response = self._request(method, url, data)
+            response.raise_for_status()
+        except requests.HTTPError as ex:
+            raise exception.ClientError(msg=ex)
+        return get_content(response.text)
 
     def resources(self, namespace=None, client_id=None, resource=None):
         """Get all the available resources.
@@ -33,98 +183,226 @@ class ResourceClient(base_client.Client):
         :param resource:
             Return all the resources with a given name.
         """
-        filters = {
-            "namespace": namespace,
-            "client_id": client_id,
-            "resource": resource,
-        }
+        filters = resource_filters(namespace, client_id, resource)
+        return self._send("GET", resource_url(**filters))
 
-        # NOTE(mmicu):  filter out keys with value None
-        filters = dict((key, value) for key, value in filters.items() if value)
+    def _resource_entry(self, resource_id):
+        """Get the required resource wrapped in a cache entry."""
+        url = resource_url(resource_id=resource_id)
+        if self._cache is None:
+            return CacheEntry(None, self._send("GET", url))
 
-        url = "/admin/resource?{}".format(
-            requests.compat.urlencode(filters))
+        entry = self._cache.get(resource_id)
+        headers = {"If-None-Match": entry.etag} if entry else None
         try:
-            response = self.get(url)
+            response = self._request("GET", url, headers=headers)
             response.raise_for_status()
-            resources = json.loads(response.text)
         except requests.HTTPError as ex:
-            raise exception.ClientError(messag=ex)
-        except ValueError:
-            raise exception.ClientError(msg="Malformed response.")
+            raise exception.ClientError(msg=ex)
 
-        if not resources["meta"]["status"]:
-            raise exception.ClientError(msg=resources["meta"]["verbose"])
+        if entry and response.status_code == 304:
+            self._cache.hit()
+            return entry
 
-        return resources["content"]
+        return self._cache.store(resource_id, response.headers.get("ETag"),
+                                 get_content(response.text))
 
     def resource(self, resource_id):
         """Get the required resource."""
-        url = "/admin/resource?{}".format(
-            requests.compat.urlencode({"resource_id": resource_id}))
-        try:
-            response = self.get(url)
-            response.raise_for_status()
-            resource = json.loads(response.text)
-        except requests.HTTPError as ex:
-            raise exception.ClientError(msg=ex)
-        except ValueError:
-            raise exception.ClientError(msg="Malformed response.")
-
-        if not resource["meta"]["status"]:
-            raise exception.ClientError(msg=resource["meta"]["verbose"])
-
-        return resource["content"]
+        return self._resource_entry(resource_id).content
 
     def create_resource(self, content):
         """Create a new resource."""
-        try:
-            response = self.post("/admin/resource", data=content)
-            response.raise_for_status()
-            data = json.loads(response.text)
+        return self._send("POST", resource_url(), data=content)
 
-        except requests.HTTPError as ex:
-            raise exception.ClientError(msg=ex)
-        except ValueError:
-            raise exception.ClientError(msg="Malformed response.")
+    def create_resources(self, resources):
+        """Create all the received resources with a single request.
 
-        if not data["meta"]["status"]:
-            raise exception.ClientError(msg=data["meta"]["verbose"])
+        :param resources:
+            A list of resource descriptions, each of them having the same
+            format as the content received by :meth:`create_resource`.
+        """
+        return self._send("POST", BATCH_URL,
+                          data={"resources": json.dumps(resources)})
 
-        return data["content"]
+    def templates(self):
+        """Get the names of all the user_data templates."""
+        return self._send("GET", TEMPLATE_URL)
+
+    def template(self, name):
+        """Get the required user_data template."""
+        return self._send("GET", _template_url(name))
+
+    def create_template(self, name, template):
+        """Create or update a user_data template.
+
+        The template is stored only once and it can be used by any number
+        of instances (see :meth:`ArestorClient.set_user_data_template`).
+        Return the new version of the template.
+        """
+        content = self._send("POST", TEMPLATE_URL,
+                             data={"name": name, "template": template})
+        return content["version"]
+
+    def delete_template(self, name):
+        """Delete the required user_data template."""
+        return self._send("DELETE", _template_url(name))
+
+    def create_fleet(self, namespace, resources, count=None, ids=None,
+                     prefix=None, generators=None, callback=None):
+        """Create a fleet of instances with a single request.
+
+        :param namespace: the namespace of the instances
+        :param resources: the resources shared by all the instances
+        :param count: the number of instances (used with `prefix`)
+        :param ids: the ids of the instances (instead of `count`)
+        :param generators: a dictionary with the resources generated for
+                           every instance, eg. ``{"uuid": {"type": "uuid"},
+                           "hostname": {"type": "format",
+                           "format": "web-{index}"}, "launch_index":
+                           {"type": "index"}}``
+        :param callback: a callable which receives the ids of every chunk
+                         of instances as soon as they are created
+
+        Return the ids of all the created instances.
+        """
+        fleet = {"namespace": namespace, "resources": resources,
+                 "generators": generators or {}}
+        if ids is not None:
+            fleet["ids"] = list(ids)
+        else:
+            fleet["count"] = count
+        if prefix:
+            fleet["prefix"] = prefix
 
-    def update_resource(self, resource_id, content):
-        """Update the content of the given resource."""
-        url = "/admin/resource?{}".format(
-            requests.compat.urlencode({"resource_id": resource_id}))
         try:
-            response = self.put(url, data=content)
+            response = self._request("POST", FLEET_URL,
+                                     data={"fleet": json.dumps(fleet)},
+                                     stream=True)
             response.raise_for_status()
-            resource = json.loads(response.text)
         except requests.HTTPError as ex:
             raise exception.ClientError(msg=ex)
-        except ValueError:
-            raise exception.ClientError(msg="Malformed response.")
 
-        if not resource["meta"]["status"]:
-            raise exception.ClientError(msg=resource["meta"]["verbose"])
+        created = []
+        with contextlib.closing(response):
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise exception.ClientError(msg=chunk["error"])
+                created.extend(chunk["created"])
+                if callback:
+                    callback(chunk["created"])
+        return created
 
-        return resource["content"]
+    def networks(self):
+        """Get the mappings between networks and instances."""
+        return self._send("GET", NETWORK_URL)
+
+    def create_network(self, network_id, client_id):
+        """Map the network (in CIDR notation) to the instance.
+
+        The instance is identified by the source address of its requests
+        when the Arestor API has the `source_ip_lookup` option set.
+        """
+        return self._send("POST", NETWORK_URL,
+                          data={"network_id": network_id,
+                                "client_id": client_id})
+
+    def delete_network(self, network_id):
+        """Remove the mapping of the network."""
+        return self._send("DELETE", "{}?{}".format(
+            NETWORK_URL, requests.compat.urlencode(
+                {"network_id": network_id})))
+
+    def start_profiler(self, mode="sample", duration=10, interval=None):
+        """Profile the Arestor API for the given number of seconds.
+
+        :param mode: `sample` (sampling of the stacks of all the threads)
+                     or `cprofile` (cProfile for every request)
+        """
+        data = {"mode": mode, "duration": duration}
+        if interval:
+            data["interval"] = interval
+        return self._send("POST", PROFILER_URL, data=data)
+
+    def profiler_results(self, format="json", limit=50):
+        """Return the results of the last profiling session.
+
+        The `collapsed` format (sample mode) and the `text` format
+        (cprofile mode) are returned as text.
+        """
+        # pylint: disable=redefined-builtin
+        url = "{}?{}".format(PROFILER_URL, requests.compat.urlencode(
+            {"format": format, "limit": limit}))
+        if format == "json":
+            return self._send("GET", url)
 
-    def delete_resource(self, resource_id):
-        """Delete the given resource."""
-        url = "/admin/resource?{}".format(
-            requests.compat.urlencode({"resource_id": resource_id}))
         try:
-            response = self.delete(url)
+            response = self._request("GET", url)
             response.raise_for_status()
-            resource = json.loads(response.text)
         except requests.HTTPError as ex:
             raise exception.ClientError(msg=ex)
-        except ValueError:
-            raise exception.ClientError(msg="Malformed response.")
+        return response.text
+
+    def stop_profiler(self):
+        """Stop the active profiling session."""
+        return self._send("DELETE", PROFILER_URL)
+
+    def memory_usage(self):
+        """Get the memory usage of the Arestor API."""
+        return self._send("GET", MEMORY_URL)
+
+    def start_memory_tracing(self, duration=300, frames=1):
+        """Trace the allocations of the Arestor API for a while."""
+        return self._send("POST", MEMORY_URL,
+                          data={"action": "start", "duration": duration,
+                                "frames": frames})
+
+    def memory_snapshot(self):
+        """Take a snapshot of the traced allocations and return its id."""
+        return self._send("POST", MEMORY_URL,
+                          data={"action": "snapshot"})["id"]
+
+    def memory_allocations(self, snapshot, compare=None, limit=20,
+                           group_by="lineno"):
+        """Get the top allocation sites from a snapshot.
 
-        if not resource["meta"]["status"]:
-            raise exception.ClientError(msg=resource["meta"]["verbose"])
+        When `compare` is provided the difference from that snapshot is
+        returned instead.
+        """
+        params = {"snapshot": snapshot, "limit": limit, "group_by": group_by}
+        if compare:
+            params["compare"] = compare
+        return self._send("GET", "{}?{}".format(
+            MEMORY_URL, requests.compat.urlencode(params)))
+
+    def stop_memory_tracing(self):
+        """Stop tracing the allocations and drop the snapshots."""
+        return self._send("DELETE", MEMORY_URL)
+
+    def timeline(self, instance_id=None):
+        """Get the boot timeline of the instance.
+
+        When the instance is not provided the number of recorded requests
+        of every instance is returned instead.
+        """
+        return self._send("GET", _timeline_url(instance_id))
+
+    def clear_timeline(self, instance_id=None):
+        """Drop the boot timeline of the instance (or all of them)."""
+        return self._send("DELETE", _timeline_url(instance_id))
 
-        return resource["content"]
+    def update_resource(self, resource_id, content):
+        """Update the content of the given resource."""
+        if self._cache is not None:
+            self._cache.invalidate(resource_id)
+        return self._send("PUT", resource_url(resource_id=resource_id),
+                          data=content)
+
+    def delete_resource(self, resource_id):
+        """Delete the given resource."""
+        if self._cache is not None:
+            self._cache.invalidate(resource_id)
+        return self._send("DELETE", resource_url(resource_id=resource_id))
@@ -0,0 +1,305 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Asynchronous logging for the threads which serve the requests.
+
+The handlers configured by oslo.log are moved behind a bounded queue: the
+threads which log only format the message and enqueue the record, while
+a background thread writes the records in batches. When the queue is
+full the records are dropped (the new ones or the oldest queued ones)
+and counted. The queued records are written when the process exits.
+"""
+
+import atexit
+import collections
+import logging
+from logging import handlers as logging_handlers
+import sys
+import threading
+
+from six.moves import queue
+
+from arestor import config as arestor_config
+from arestor.common import metrics
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+DROP_NEWEST = "newest"
+DROP_OLDEST = "oldest"
+
+_STOP = object()
+
+
+_BATCHED_EMIT = [logging.StreamHandler.emit, logging.FileHandler.emit]
+if hasattr(logging_handlers.WatchedFileHandler, "reopenIfNeeded"):
+    # NOTE: Before Python 3.6 the file is checked only by `emit`.
+    _BATCHED_EMIT.append(logging_handlers.WatchedFileHandler.emit)
+
+
+def _batched(target):
+    """Whether the handler can write a batch of records at once.
+
+    The stream handlers (eg. the colored one used by oslo.log) can, as
+    long as they do not change how a record is emitted.
+    """
+    return (isinstance(target, logging.StreamHandler) and
+            type(target).emit in _BATCHED_EMIT)
+
+
+def _write_batch(target, records):
+    """Write the records with a single write and flush."""
+    text = "".join(target.format(record) + getattr(target, "terminator",
+                                                   "\n")
+                   for record in records)
+    target.acquire()
+    try:
+        if isinstance(target, logging_handlers.WatchedFileHandler):
+            # NOTE: The file could have been moved by logrotate.
+            target.reopenIfNeeded()
+        if target.stream is None:
+            # NOTE: The file handlers can open the file on demand.
+            target.stream = target._open()
+        target.stream.write(text)
+        target.flush()
+    finally:
+        target.release()
+
+
+class AsyncHandler(logging.Handler):
+
+    """Queue the records and write them with the target handlers.
+
+    :param targets: the handlers which write the records
+    :param queue_size: the maximum number of queued records
+    :param batch_size: the maximum number of records written at once
+    :param drop_policy: `newest` or `oldest`
+    """
+
+    def __init__(self, targets, queue_size=10000, batch_size=256,
+                 drop_policy=DROP_NEWEST):
+        super(AsyncHandler, self).__init__()
+        self.targets = list(targets)
+        self._queue = queue.Queue(queue_size)
+        self._batch_size = batch_size
+        self._drop_policy = drop_policy
+        self._dropped = collections.Counter()
+        self._written = 0
+        self._worker = None
+
+    @property
+    def dropped(self):
+        """The number of dropped records, by level."""
+        with self.lock:
+            return dict(self._dropped)
+
+    def _drop(self, record):
+        """Account a dropped record."""
+        # NOTE: The lock of the handler is reentrant and it is already
+        # held while the record is emitted.
+        with self.lock:
+            self._dropped[record.levelname] += 1
+
+    @property
+    def queued(self):
+        """The number of records waiting to be written."""
+        return self._queue.qsize()
+
+    @property
+    def written(self):
+        """The number of records written until now."""
+        return self._written
+
+    def start(self):
+        """Start the thread which writes the records."""
+        self._worker = threading.Thread(target=self._run,
+                                        name="arestor-async-log")
+        self._worker.daemon = True
+        self._worker.start()
+
+    def prepare(self, record):
+        """Format the message while the arguments are still valid."""
+        message = record.getMessage()
+        if record.exc_info:
+            # NOTE: The traceback can not be formatted later.
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        record.msg, record.args = message, None
+        return record
+
+    def emit(self, record):
+        """Queue the record without blocking."""
+        try:
+            record = self.prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            if self._drop_policy == DROP_NEWEST:
+                self._drop(record)
+                return
+
+        try:
+            oldest = self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self._queue.task_done()
+            if oldest is _STOP:
+                # NOTE: The handler is closing, the record is dropped.
+                self._queue.put_nowait(oldest)
+                self._drop(record)
+                return
+            self._drop(oldest)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._drop(record)
+
+    def _next_batch(self):
+        """Wait for records and return all of them (up to a batch)."""
+        batch = [self._queue.get()]
+        while len(batch) < self._batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, records):
+        """Write the records with all the target handlers."""
+        for target in self.targets:
+            accepted = [record for record in records
+                        if record.levelno >= target.level and
+                        target.filter(record)]
+            if not accepted:
+                continue
+            try:
+                if _batched(target):
+                    _write_batch(target, accepted)
+                else:
+                    for record in accepted:
+                        target.handle(record)
+            except Exception:
+                target.handleError(accepted[0])
+        self._written += len(records)
+
+    def _run(self):
+        """Write the queued records until the handler is stopped."""
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            records = batch[:-1] if stop else batch
+            try:
+                if records:
+                    self._write(records)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Wait until all the queued records are written."""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Write the queued records and stop the background thread."""
+        worker, self._worker = self._worker, None
+        if worker is not None and worker.is_alive():
+            # NOTE: The worker makes room for the stop marker.
+            self._queue.put(_STOP)
+            worker.join()
+        for target in self.targets:
+            target.flush()
+        super(AsyncHandler, self).close()
+
+
+_HANDLER = []
+
+
+def handler():
+    """Return the installed asynchronous handler (or None)."""
+    return _HANDLER[0] if _HANDLER else None
+
+
+def install(logger=None):
+    """Move the handlers of the logger behind an asynchronous handler.
+
+    The root logger (used by oslo.log) is used by default.
+    """
+    if handler() is not None:
+        return handler()
+
+    logger = logger or logging.getLogger()
+    async_handler = AsyncHandler(
+        logger.handlers, queue_size=CONFIG.async_log.queue_size,
+        batch_size=CONFIG.async_log.batch_size,
+        drop_policy=CONFIG.async_log.drop_policy)
+    for target in async_handler.targets:
+        logger.removeHandler(target)
+    async_handler.start()
+    logger.addHandler(async_handler)
+    _HANDLER.append(async_handler)
+    atexit.register(uninstall, logger)
+    return async_handler
+
+
+def uninstall(logger=None):
+    """Write the queued records and restore the original handlers."""
+    if not _HANDLER:
+        return
+
+    logger = logger or logging.getLogger()
+    async_handler = _HANDLER.pop()
+    logger.removeHandler(async_handler)
+    async_handler.close()
+    for target in async_handler.targets:
+        logger.addHandler(target)
+
+    dropped = sum(async_handler.dropped.values())
+    if dropped:
+        sys.stderr.write("%d log records were dropped.\n" % dropped)
+
+
+def _dropped_records():
+    """Collect the number of dropped log records."""
+    async_handler = handler()
+    if async_handler is None:
+        return []
+    return [((("level", level), ), count)
+            for level, count in sorted(async_handler.dropped.items())]
+
+
+def _queued_records():
+    """Collect the number of log records waiting to be written."""
+    async_handler = handler()
+    if async_handler is None:
+        return []
+    return [((), async_handler.queued)]
+
+
+metrics.REGISTRY.collector(
+    "arestor_log_records_dropped_total",
+    "The number of log records dropped because the queue was full.",
+    _dropped_records, kind=metrics.COUNTER)
+metrics.REGISTRY.collector(
+    "arestor_log_records_queued",
+    "The number of log records waiting to be written.", _queued_records)
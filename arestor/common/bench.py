@@ -0,0 +1,245 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Boot storm load generator for the Arestor API.
+
+Synthetic instances are seeded with a single fleet request, then every
+virtual client replays the requests made by cloudbase-init while the
+instance boots. The latency of every request is recorded and summarized
+when all the boots are done.
+"""
+
+import collections
+import json
+import random
+import string
+import threading
+import timeit
+
+from concurrent import futures
+from oslo_log import log as logging
+import requests
+
+from arestor.client import base as base_client
+from arestor.client import resource as resource_client
+from arestor.common import exception
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = "instance-bench-"
+PERCENTILES = (50, 95, 99, 99.9)
+
+timer = timeit.default_timer
+
+_BOOTS = {
+    "openstack": (
+        ("meta_data", "GET", "openstack/latest/meta_data.json", None),
+        ("user_data", "GET", "openstack/latest/user_data", None),
+        ("password", "POST", "openstack/2013-04-04/password", "password"),
+    ),
+    "packet": (
+        ("metadata", "GET", "metadata", None),
+        ("user_data", "GET", "userdata", None),
+        ("phone_home", "POST", "metadata/phone_home_url",
+         "phone_home"),
+    ),
+}
+"""The requests made by cloudbase-init for every metadata provider:
+(step, method, path, body)."""
+
+
+StormOptions = collections.namedtuple(
+    "StormOptions", ["namespace", "instances", "boots", "concurrency",
+                     "user_data_size", "prefix"])
+"""The shape of a boot storm, see :func:`storm_options`."""
+
+
+def storm_options(namespace="openstack", instances=100, boots=None,
+                  concurrency=10, user_data_size=1024, prefix=DEFAULT_PREFIX):
+    """Return the options of a boot storm.
+
+    :param namespace: the metadata provider used by the instances
+    :param instances: the number of seeded instances
+    :param boots: the number of simulated boots (the instances are reused
+                  when there are more boots than instances)
+    :param concurrency: the number of virtual clients
+    :param user_data_size: the size of the user_data of the instances
+    :param prefix: the prefix of the ids of the seeded instances
+    """
+    if namespace not in _BOOTS:
+        raise exception.Invalid("Invalid namespace %(namespace)s",
+                                namespace=namespace)
+    return StormOptions(namespace, instances, boots or instances,
+                        concurrency, user_data_size, prefix)
+
+
+def percentile_label(point):
+    """Return the label of a percentile (99.9 -> p999)."""
+    return "p" + ("%g" % point).replace(".", "")
+
+
+def percentiles(samples, points=PERCENTILES):
+    """Return the required percentiles of the samples.
+
+    The samples are sorted once and all the percentiles are picked from
+    the sorted list (nearest rank).
+
+    :returns: a dictionary which maps `p50`, `p95`, ... to the values
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return dict((percentile_label(point), None) for point in points)
+
+    last = len(ordered) - 1
+    return dict((percentile_label(point),
+                 ordered[min(last, int(round(point / 100.0 * last)))])
+                for point in points)
+
+
+def summarize(samples, duration=None):
+    """Return the statistics of the latency samples (in seconds)."""
+    summary = {
+        "count": len(samples),
+        "min": min(samples) if samples else None,
+        "max": max(samples) if samples else None,
+        "mean": sum(samples) / len(samples) if samples else None,
+    }
+    summary.update(percentiles(samples))
+    if duration:
+        summary["throughput"] = len(samples) / duration
+    return summary
+
+
+def _random_text(size):
+    """Return a random printable string."""
+    return "".join(random.choice(string.ascii_letters) for _ in range(size))
+
+
+class BootStorm(object):
+
+    """Simulate the boot of many instances at the same time.
+
+    :param base_url: the url of the Arestor API
+    :param api_key: the API key used in order to seed the instances
+    :param secret: the secret of the API key
+    :param options: the :class:`StormOptions` of the storm (the default
+                    ones when they are missing)
+    """
+
+    def __init__(self, base_url, api_key, secret, options=None):
+        self._base_url = base_url
+        self._api_key = api_key
+        self._secret = secret
+        self._options = options or storm_options()
+
+        self._samples = collections.defaultdict(list)
+        self._errors = collections.Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def client_ids(self):
+        """The ids of the seeded instances."""
+        return ["%s%d" % (self._options.prefix, index)
+                for index in range(self._options.instances)]
+
+    def seed(self):
+        """Create the synthetic instances with a single fleet request."""
+        namespace = self._options.namespace
+        resources = {"user_data": _random_text(self._options.user_data_size)}
+        generators = {
+            "uuid": {"type": "uuid"},
+            "hostname": {"type": "format", "format": "bench-{index}"},
+        }
+        if namespace == "openstack":
+            resources.update({"availability_zone": "nova",
+                              "project_id": "bench", "keys": []})
+            generators.update({"name": {"type": "format",
+                                        "format": "bench-{index}"},
+                               "launch_index": {"type": "index"}})
+        else:
+            resources["public_keys"] = ["ssh-rsa AAAA bench@arestor"]
+
+        client = resource_client.ResourceClient(self._base_url, self._api_key,
+                                                self._secret)
+        with client:
+            started = timer()
+            client.create_fleet(namespace, resources,
+                                ids=self.client_ids, generators=generators)
+            LOG.info("Seeded %d instances in %.3f seconds.",
+                     self._options.instances, timer() - started)
+
+    def _body(self, kind):
+        """Return the body sent by the instance for the required step."""
+        password = _random_text(16)
+        if kind == "phone_home":
+            return json.dumps({"password": password})
+        return password
+
+    def _boot(self, client, client_id):
+        """Replay the requests made by an instance while it boots."""
+        base = "/v1/%s/%s/" % (self._options.namespace, client_id)
+        samples = []
+        errors = []
+        boot_started = timer()
+        for step, method, path, body in _BOOTS[self._options.namespace]:
+            started = timer()
+            try:
+                if method == "POST":
+                    response = client.post(base + path, self._body(body))
+                else:
+                    response = client.get(base + path)
+                _ = response.content    # Consume the whole response.
+                failed = response.status_code >= 400
+            except (exception.ClientError, requests.RequestException):
+                failed = True
+            samples.append((step, timer() - started))
+            if failed:
+                errors.append(step)
+        samples.append(("boot", timer() - boot_started))
+
+        with self._lock:
+            for step, latency in samples:
+                self._samples[step].append(latency)
+            self._errors.update(errors)
+
+    def run(self):
+        """Run all the boots and return the results."""
+        client_ids, options = self.client_ids, self._options
+        client = base_client.BaseClient(self._base_url,
+                                        pool_size=options.concurrency)
+        with client:
+            started = timer()
+            with futures.ThreadPoolExecutor(options.concurrency) as executor:
+                boots = [executor.submit(self._boot, client,
+                                         client_ids[index % len(client_ids)])
+                         for index in range(options.boots)]
+                for boot in futures.as_completed(boots):
+                    boot.result()
+            duration = timer() - started
+
+        steps = dict((step, summarize(samples, duration))
+                     for step, samples in self._samples.items())
+        requests_count = sum(len(samples) for step, samples
+                             in self._samples.items() if step != "boot")
+        return {
+            "namespace": options.namespace,
+            "instances": options.instances,
+            "boots": options.boots,
+            "concurrency": options.concurrency,
+            "duration": duration,
+            "requests": requests_count,
+            "throughput": requests_count / duration if duration else None,
+            "errors": dict(self._errors),
+            "steps": steps,
+        }
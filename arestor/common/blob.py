@@ -0,0 +1,213 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Content-addressed store for the large values of the instances.
+
+A large value is stored only once, under the SHA-256 digest of its
+content, and the resources which contain it keep only a reference to the
+blob. The blobs are reference counted, a blob is removed when the last
+resource which points to it is overwritten or deleted.
+
+The blobs never change, so they are kept in a cache shared by all the
+requests served by the current process.
+"""
+
+import collections
+import hashlib
+
+from oslo_log import log as logging
+import redis
+import six
+
+from arestor import config as arestor_config
+from arestor.common import cache as arestor_cache
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+BLOB_KEY = "blobs/{digest}"
+REFERENCE_PREFIX = "blob:sha256:"
+
+_DATA = "data"
+_REFS = "refs"
+
+CACHE = arestor_cache.LRUCache("blobs", CONFIG.blob.cache_size)
+
+
+def digest(value):
+    """Return the SHA-256 digest of the received value."""
+    return hashlib.sha256(arestor_util.get_as_bytes(value)).hexdigest()
+
+
+def parse_reference(value):
+    """Return the digest of the blob if the value is a reference."""
+    if not isinstance(value, (six.text_type, six.binary_type)):
+        return None
+    value = arestor_util.get_as_string(value)
+    if value and value.startswith(REFERENCE_PREFIX):
+        return value[len(REFERENCE_PREFIX):]
+    return None
+
+
+def _is_large(value):
+    """Whether the value should be moved in the blob store."""
+    if not CONFIG.blob.enabled:
+        return False
+    if not isinstance(value, (six.text_type, six.binary_type)):
+        return False
+    return len(arestor_util.get_as_bytes(value)) >= CONFIG.blob.min_size
+
+
+def _blob_key(blob_id):
+    """Return the key of the required blob."""
+    return BLOB_KEY.format(digest=blob_id)
+
+
+def _collect(connection, blob_id):
+    """Remove the blob unless it was referenced again in the meantime."""
+    key = _blob_key(blob_id)
+    with connection.pipeline() as pipeline:
+        try:
+            pipeline.watch(key)
+            if int(pipeline.hget(key, _REFS) or 0) > 0:
+                return
+            pipeline.multi()
+            pipeline.delete(key)
+            pipeline.execute()
+        except redis.WatchError:
+            # NOTE: A new reference was added before the blob was removed.
+            return
+
+    CACHE.pop(blob_id)
+    LOG.debug("Blob %s was removed.", blob_id)
+
+
+def _release(connection, counters):
+    """Remove the blobs whose reference counter dropped to zero.
+
+    :param counters: a list of (blob id, reference counter) tuples
+    """
+    for blob_id, refs in counters:
+        if int(refs) <= 0:
+            _collect(connection, blob_id)
+
+
+def write(connection, resources):
+    """Write the fields of the received resources.
+
+    The large values are moved in the blob store. The references to the
+    blobs which are overwritten are dropped.
+
+    :param connection: the Redis connection
+    :param resources: a list of (key, fields) tuples, where fields is a
+                      dictionary with the values of the resource
+    """
+    merged = collections.OrderedDict()
+    for key, fields in resources:
+        merged.setdefault(key, {}).update(fields)
+    merged = [(key, fields) for key, fields in merged.items() if fields]
+    if not merged:
+        return
+
+    pipeline = connection.pipeline(transaction=False)
+    for key, fields in merged:
+        pipeline.hmget(key, list(fields))
+    previous = pipeline.execute()
+
+    pipeline = connection.pipeline(transaction=False)
+    released = []
+    for (key, fields), old_values in zip(merged, previous):
+        for name, value in fields.items():
+            if _is_large(value):
+                blob_id = digest(value)
+                pipeline.hsetnx(_blob_key(blob_id), _DATA, value)
+                pipeline.hincrby(_blob_key(blob_id), _REFS, 1)
+                value = REFERENCE_PREFIX + blob_id
+            pipeline.hset(key, name, value)
+
+        released.extend(blob_id for blob_id in map(parse_reference,
+                                                   old_values) if blob_id)
+
+    # NOTE: The references are dropped after all the writes, so the
+    # counters of the released blobs are the last results of the pipeline.
+    for blob_id in released:
+        pipeline.hincrby(_blob_key(blob_id), _REFS, -1)
+    results = pipeline.execute()
+    if released:
+        _release(connection, zip(released, results[-len(released):]))
+
+
+def delete(connection, keys):
+    """Delete the received resources and drop their blob references."""
+    pipeline = connection.pipeline(transaction=False)
+    for key in keys:
+        pipeline.hvals(key)
+    released = [parse_reference(value)
+                for values in pipeline.execute() for value in values]
+    released = [blob_id for blob_id in released if blob_id]
+
+    pipeline = connection.pipeline(transaction=False)
+    for key in keys:
+        pipeline.delete(key)
+    for blob_id in released:
+        pipeline.hincrby(_blob_key(blob_id), _REFS, -1)
+    results = pipeline.execute()
+    if released:
+        _release(connection, zip(released, results[-len(released):]))
+
+
+def resolve(connection, values):
+    """Replace the blob references from the list with their content.
+
+    The blobs missing from the cache are retrieved with a single round
+    trip. A reference to a missing blob is replaced with None.
+    """
+    positions = collections.defaultdict(list)
+    for index, value in enumerate(values):
+        blob_id = parse_reference(value)
+        if blob_id:
+            positions[blob_id].append(index)
+    if not positions:
+        return values
+
+    values = list(values)
+    missing = []
+    for blob_id, indexes in positions.items():
+        content = CACHE.get(blob_id)
+        if content is None:
+            missing.append(blob_id)
+        for index in indexes:
+            values[index] = content
+
+    if missing:
+        pipeline = connection.pipeline(transaction=False)
+        for blob_id in missing:
+            pipeline.hget(_blob_key(blob_id), _DATA)
+        for blob_id, content in zip(missing, pipeline.execute()):
+            if content is None:
+                LOG.warning("The blob %s is missing.", blob_id)
+                continue
+            CACHE.set(blob_id, content)
+            for index in positions[blob_id]:
+                values[index] = content
+
+    return values
+
+
+def resolve_fields(connection, fields):
+    """Replace the blob references from the fields of a resource."""
+    names = list(fields)
+    return dict(zip(names, resolve(connection,
+                                   [fields[name] for name in names])))
@@ -0,0 +1,115 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process caches shared by the API handlers.
+
+Every cache is registered when it is created, so the statistics of all
+the caches from the current process can be reported from a single place.
+"""
+
+import collections
+import threading
+
+_CACHES = collections.OrderedDict()
+_REGISTRY_LOCK = threading.Lock()
+
+
+class LRUCache(object):
+
+    """Thread safe cache which drops the least recently used entries.
+
+    :param name: the name used in order to report the cache
+    :param max_size: the maximum number of entries (0 disables the cache)
+    """
+
+    def __init__(self, name, max_size):
+        self._name = name
+        self._max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        with _REGISTRY_LOCK:
+            _CACHES[name] = self
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def name(self):
+        """The name of the current cache."""
+        return self._name
+
+    def get(self, key, default=None):
+        """Return the value stored for the key and mark it as recently used.
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self._misses += 1
+                return default
+
+            self._entries[key] = value
+            self._hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store the value and drop the least recently used entries."""
+        if not self._max_size:
+            return
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def pop(self, key):
+        """Remove the key from the cache."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all the entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def stats(self):
+        """Return the hit and miss statistics for the current cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "ratio": float(self._hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "max_size": self._max_size,
+            }
+
+
+def caches():
+    """Return all the caches created by the current process."""
+    with _REGISTRY_LOCK:
+        return list(_CACHES.values())
+
+
+def stats():
+    """Return the statistics of all the caches, by name."""
+    return dict((cache.name, cache.stats) for cache in caches())
@@ -0,0 +1,156 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config drive images built from the metadata of the instances."""
+
+from concurrent import futures
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+
+from oslo_log import log as logging
+
+from arestor import config as arestor_config
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+VOLUME_LABEL = "config-2"
+
+
+def path_segments(name):
+    """Return the segments of a path from the config drive.
+
+    :raises ValueError: if the path is not relative to the root of the
+                        config drive
+    """
+    segments = [segment for segment in name.split("/") if segment]
+    if not segments or name.startswith("/"):
+        raise ValueError("Invalid config drive path %r." % name)
+    for segment in segments:
+        if (segment in (".", "..") or os.sep in segment or
+                (os.altsep and os.altsep in segment)):
+            raise ValueError("Invalid config drive path %r." % name)
+    return segments
+
+
+def content_hash(files):
+    """Return the hash of the received file tree.
+
+    :param files: a dictionary which maps the path of every file to its
+                  content
+    """
+    digest = hashlib.sha256()
+    for path, content in sorted(files.items()):
+        digest.update(arestor_util.get_as_bytes(path))
+        digest.update(b"\0")
+        digest.update(hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+class ConfigDriveBuilder(object):
+
+    """Build ISO9660 config drive images and cache them on disk.
+
+    The images are named after the hash of their content, so all the
+    instances with identical data share the same image. The images are
+    built by a dedicated pool of workers, concurrent requests for the
+    same image wait for the same build.
+    """
+
+    def __init__(self, cache_dir, command, workers):
+        self._cache_dir = cache_dir
+        self._command = command
+        self._workers = workers
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def image_path(self, image_id):
+        """Return the path of the image with the received id."""
+        return os.path.join(self._cache_dir, "%s.iso" % image_id)
+
+    def _build(self, files, path):
+        """Write the file tree on disk and build the image."""
+        workdir = tempfile.mkdtemp(prefix="arestor-configdrive-")
+        temp_path = "%s.%s.tmp" % (path, uuid.uuid4().hex)
+        try:
+            for name, content in files.items():
+                file_path = os.path.join(workdir, *path_segments(name))
+                if not os.path.isdir(os.path.dirname(file_path)):
+                    os.makedirs(os.path.dirname(file_path))
+                with open(file_path, "wb") as file_handle:
+                    file_handle.write(content)
+
+            if not os.path.isdir(self._cache_dir):
+                os.makedirs(self._cache_dir)
+
+            # NOTE: The image is moved in the cache only when it is
+            # complete, a partial image is never served.
+            subprocess.check_call([
+                self._command, "-o", temp_path, "-ldots", "-allow-lowercase",
+                "-allow-multidot", "-l", "-publisher", "Arestor", "-quiet",
+                "-J", "-r", "-V", VOLUME_LABEL, workdir])
+            os.rename(temp_path, path)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        LOG.debug("Config drive image %s created.", path)
+        return path
+
+    def _on_done(self, image_id):
+        """Remove the build from the pending ones."""
+        with self._lock:
+            self._pending.pop(image_id, None)
+
+    def build(self, files):
+        """Return a future with the path of the image for the file tree.
+
+        :raises ValueError: if a path from the file tree is not valid
+        """
+        for name in files:
+            path_segments(name)
+        image_id = content_hash(files)
+        path = self.image_path(image_id)
+
+        with self._lock:
+            future = self._pending.get(image_id)
+            if future is not None:
+                return future
+
+            if os.path.isfile(path):
+                future = futures.Future()
+                future.set_result(path)
+                return future
+
+            if self._executor is None:
+                self._executor = futures.ThreadPoolExecutor(
+                    max_workers=self._workers)
+            future = self._executor.submit(self._build, files, path)
+            self._pending[image_id] = future
+
+        future.add_done_callback(lambda _: self._on_done(image_id))
+        return future
+
+
+BUILDER = ConfigDriveBuilder(CONFIG.configdrive.cache_dir,
+                             CONFIG.configdrive.mkisofs_cmd,
+                             CONFIG.configdrive.workers)
@@ -27,3 +27,5 @@ AC_ALLOW_METHODS = 'Access-Control-Allow-Methods'
 PID_TMP_FILE = os.path.join(gettempdir(), "arestor.pid")
 
 KEY_FORMAT = "{namespace}/{user}/{name}"
+
+PROFILE_PREFIX = "profile-"
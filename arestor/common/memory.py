@@ -0,0 +1,241 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Memory usage introspection for the running API process.
+
+The allocations are traced with :mod:`tracemalloc` (Python 3.4+) only
+while a diagnostic session is active. The session stops on its own after
+the required number of seconds, the snapshots taken during the session
+are kept until a new session is started or they are dropped.
+"""
+
+import collections
+import gc
+import os
+import sys
+import threading
+import time
+
+import cherrypy
+from oslo_log import log as logging
+
+from arestor import config as arestor_config
+from arestor.common import cache as arestor_cache
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+_IGNORED = ("<frozen importlib._bootstrap>", "<unknown>")
+
+
+def rss():
+    """Return the resident set size of the process in bytes (or None)."""
+    try:
+        with open("/proc/self/statm", "r") as file_handle:
+            pages = int(file_handle.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Return the highest resident set size of the process (or None)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: The value is in kilobytes, except on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _thread_pool():
+    """Return the state of the thread pool which serves the requests."""
+    server = getattr(cherrypy.server, "httpserver", None)
+    pool = getattr(server, "requests", None)
+    if pool is None:
+        return None
+    return {
+        "threads": len(getattr(pool, "_threads", ())),
+        "idle": getattr(pool, "idle", 0),
+        "queued": getattr(pool, "qsize", 0),
+    }
+
+
+def usage():
+    """Return the memory usage of the current process."""
+    return {
+        "rss": rss(),
+        "peak_rss": peak_rss(),
+        "caches": arestor_cache.stats(),
+        "thread_pool": _thread_pool(),
+        "threads": threading.active_count(),
+        "gc": {"objects": len(gc.get_objects()),
+               "counts": gc.get_count()},
+    }
+
+
+def _site(statistic, group_by):
+    """Return the representation of an allocation site."""
+    frames = statistic.traceback
+    if group_by == "traceback":
+        return ["%s:%d" % (frame.filename, frame.lineno) for frame in frames]
+    if group_by == "filename":
+        return frames[0].filename
+    return "%s:%d" % (frames[0].filename, frames[0].lineno)
+
+
+class Tracer(object):
+
+    """Trace the allocations only during a diagnostic session.
+
+    :param max_snapshots: the maximum number of snapshots kept in memory
+    """
+
+    def __init__(self, max_snapshots=10):
+        self._max_snapshots = max_snapshots
+        self._snapshots = collections.OrderedDict()
+        self._counter = 0
+        self._timer = None
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.expires_at = None
+
+    @staticmethod
+    def available():
+        """Whether the allocations can be traced by this interpreter."""
+        return tracemalloc is not None
+
+    @property
+    def active(self):
+        """Whether the allocations are traced right now."""
+        return self.available() and tracemalloc.is_tracing()
+
+    def start(self, duration, frames=1):
+        """Start a new diagnostic session.
+
+        The snapshots of the previous session are dropped.
+
+        :raises ValueError: if tracing is not available or it is active
+        """
+        if not self.available():
+            raise ValueError("Tracing the allocations requires Python 3.4 "
+                             "or newer.")
+
+        with self._lock:
+            if self.active:
+                raise ValueError("A diagnostic session is already active.")
+            self._snapshots.clear()
+            tracemalloc.start(frames)
+            self.started_at = time.time()
+            self.expires_at = self.started_at + duration
+            self._timer = threading.Timer(duration, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+        LOG.info("Started tracing the allocations for %s seconds.", duration)
+
+    def stop(self, drop=False):
+        """Stop tracing the allocations.
+
+        :param drop: whether the snapshots should be dropped as well
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self.active:
+                tracemalloc.stop()
+                LOG.info("Stopped tracing the allocations.")
+            if drop:
+                self._snapshots.clear()
+            self.expires_at = None
+
+    def snapshot(self):
+        """Take a snapshot of the traced allocations and return its id.
+
+        :raises ValueError: if no diagnostic session is active
+        """
+        with self._lock:
+            # NOTE: The session can expire at any time, the lock keeps
+            # `stop` from ending it between the check and the snapshot.
+            if not self.active:
+                raise ValueError("No active diagnostic session.")
+
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, tracemalloc.__file__)] +
+                [tracemalloc.Filter(False, pattern) for pattern in _IGNORED])
+            size = sum(stat.size for stat in snapshot.statistics("filename"))
+            self._counter += 1
+            self._snapshots[self._counter] = (time.time(), size, snapshot)
+            while len(self._snapshots) > self._max_snapshots:
+                self._snapshots.popitem(last=False)
+            return self._counter
+
+    def _get(self, snapshot_id):
+        """Return the required snapshot."""
+        with self._lock:
+            try:
+                return self._snapshots[int(snapshot_id)][2]
+            except (KeyError, ValueError, TypeError):
+                raise ValueError("Snapshot %r not found." % snapshot_id)
+
+    def status(self):
+        """Return the state of the diagnostic session."""
+        status = {
+            "available": self.available(),
+            "active": self.active,
+            "started_at": self.started_at,
+            "expires_at": self.expires_at,
+        }
+        if self.active:
+            status["traced"], status["traced_peak"] = (
+                tracemalloc.get_traced_memory())
+        with self._lock:
+            status["snapshots"] = [
+                {"id": snapshot_id, "taken_at": taken_at, "size": size}
+                for snapshot_id, (taken_at, size, _)
+                in self._snapshots.items()]
+        return status
+
+    def top(self, snapshot_id, limit=20, group_by="lineno"):
+        """Return the allocation sites which hold the most memory."""
+        statistics = self._get(snapshot_id).statistics(group_by)
+        return [{"site": _site(statistic, group_by), "size": statistic.size,
+                 "count": statistic.count}
+                for statistic in statistics[:limit]]
+
+    def compare(self, snapshot_id, base_id, limit=20, group_by="lineno"):
+        """Return the allocation sites which grew the most between two
+        snapshots.
+        """
+        differences = self._get(snapshot_id).compare_to(self._get(base_id),
+                                                        group_by)
+        return [{"site": _site(difference, group_by),
+                 "size": difference.size, "size_diff": difference.size_diff,
+                 "count": difference.count,
+                 "count_diff": difference.count_diff}
+                for difference in differences[:limit]]
+
+
+TRACER = Tracer(CONFIG.api.memory_max_snapshots)
@@ -0,0 +1,422 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Metrics exposed in the Prometheus text format.
+
+Every thread updates its own counters and histograms, without any lock,
+and the values of all the threads are merged only when the metrics are
+scraped. The values which are already available somewhere else (the
+state of the thread pool, the statistics of the caches) are collected
+when the metrics are scraped.
+"""
+
+import bisect
+import collections
+import json
+import threading
+import timeit
+
+import cherrypy
+from oslo_log import log as logging
+
+from arestor.common import timing as arestor_timing
+
+LOG = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+timer = timeit.default_timer
+
+
+class _Metric(object):
+
+    """The description of a metric."""
+
+    def __init__(self, name, description, kind, buckets=None, collect=None):
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self.buckets = buckets
+        self.collect = collect
+
+
+def _escape(value):
+    """Escape a label value."""
+    return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _format_labels(labels, extra=()):
+    """Return the representation of the labels of a sample."""
+    labels = tuple(labels) + tuple(extra)
+    if not labels:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value))
+                             for name, value in labels)
+
+
+def _format_value(value):
+    """Return the representation of the value of a sample."""
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+class Registry(object):
+
+    """The metrics of the current process."""
+
+    def __init__(self):
+        self._metrics = collections.OrderedDict()
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        """Add a new metric to the registry."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, description):
+        """Register a counter updated with :meth:`inc`."""
+        return self._register(_Metric(name, description, COUNTER))
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS):
+        """Register a histogram updated with :meth:`observe`."""
+        return self._register(_Metric(name, description, HISTOGRAM,
+                                      buckets=tuple(buckets)))
+
+    def collector(self, name, description, collect, kind=GAUGE):
+        """Register a metric whose samples are collected on scrape.
+
+        :param collect: a callable which returns a list of (labels, value)
+                        tuples, where labels is a tuple of (name, value)
+                        pairs
+        """
+        return self._register(_Metric(name, description, kind,
+                                      collect=collect))
+
+    def _shard(self):
+        """Return the values updated by the current thread."""
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        """Increase the value of a counter."""
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        """Add a new observation to a histogram."""
+        shard = self._shard()
+        key = (name, labels)
+        state = shard.get(key)
+        if state is None:
+            buckets = self._metrics[name].buckets
+            # The buckets are followed by the sum of the observations.
+            state = shard[key] = [0] * (len(buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self._metrics[name].buckets, value)] += 1
+        state[-1] += value
+
+    def _merge(self):
+        """Merge the values of all the threads."""
+        with self._lock:
+            shards = list(self._shards)
+
+        merged = {}
+        for shard in shards:
+            for key, value in list(shard.items()):
+                if isinstance(value, list):
+                    current = merged.setdefault(key, [0] * len(value))
+                    for index, item in enumerate(value):
+                        current[index] += item
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def _render_histogram(self, metric, labels, state):
+        """Return the samples of a histogram."""
+        lines = []
+        total = 0
+        for bound, count in zip(metric.buckets + (float("inf"), ), state):
+            total += count
+            lines.append("%s_bucket%s %d" % (
+                metric.name, _format_labels(labels, [("le", _format_value(
+                    float(bound)))]), total))
+        lines.append("%s_sum%s %s" % (metric.name, _format_labels(labels),
+                                      _format_value(float(state[-1]))))
+        lines.append("%s_count%s %d" % (metric.name, _format_labels(labels),
+                                        total))
+        return lines
+
+    def render(self):
+        """Return all the metrics in the Prometheus text format."""
+        merged = collections.defaultdict(list)
+        for (name, labels), value in sorted(self._merge().items()):
+            merged[name].append((labels, value))
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            if metric.collect is not None:
+                try:
+                    samples = metric.collect()
+                except Exception:
+                    samples = []
+            else:
+                samples = merged.get(metric.name, [])
+
+            lines.append("# HELP %s %s" % (metric.name, metric.description))
+            lines.append("# TYPE %s %s" % (metric.name, metric.kind))
+            for labels, value in samples:
+                if metric.kind == HISTOGRAM:
+                    lines.extend(self._render_histogram(metric, labels,
+                                                        value))
+                else:
+                    lines.append("%s%s %s" % (metric.name,
+                                              _format_labels(labels),
+                                              _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REGISTRY.counter("arestor_requests_total",
+                 "The number of requests served.")
+REGISTRY.histogram("arestor_request_duration_seconds",
+                   "The time spent serving the requests.")
+REGISTRY.histogram("arestor_response_size_bytes",
+                   "The size of the responses.", buckets=SIZE_BUCKETS)
+REGISTRY.counter("arestor_storage_round_trips_total",
+                 "The number of round trips to the database.")
+REGISTRY.counter("arestor_storage_commands_total",
+                 "The number of commands sent to the database.")
+REGISTRY.histogram("arestor_storage_duration_seconds",
+                   "The time spent waiting for the database.")
+
+
+class StorageAccount(object):
+
+    """The storage calls made while serving a request."""
+
+    def __init__(self):
+        self.round_trips = 0
+        self.commands = 0
+        self.duration = 0.0
+        self.sent = 0
+        self.received = 0
+
+    def as_dict(self):
+        """Return the representation of the account."""
+        return {
+            "round_trips": self.round_trips,
+            "commands": self.commands,
+            "duration": round(self.duration, 6),
+            "bytes_sent": self.sent,
+            "bytes_received": self.received,
+        }
+
+
+_ACCOUNT = threading.local()
+
+
+def storage_account():
+    """Return the storage account of the current request.
+
+    None is returned when the storage calls are not accounted.
+    """
+    return getattr(_ACCOUNT, "current", None)
+
+
+def record_storage(kind, commands, duration, sent=0, received=0):
+    """Account a round trip to the database.
+
+    :param kind: `command` or `pipeline`
+    :param commands: the number of commands sent with the round trip
+    :param duration: the number of seconds the round trip took
+    :param sent: the size of the commands (only for accounted requests)
+    :param received: the size of the replies (only for accounted requests)
+    """
+    labels = (("kind", kind), )
+    REGISTRY.inc("arestor_storage_round_trips_total", labels)
+    REGISTRY.inc("arestor_storage_commands_total", labels, commands)
+    REGISTRY.observe("arestor_storage_duration_seconds", duration, labels)
+    arestor_timing.add_storage(duration)
+
+    account = storage_account()
+    if account is not None:
+        account.round_trips += 1
+        account.commands += commands
+        account.duration += duration
+        account.sent += sent
+        account.received += received
+
+
+def _thread_pool():
+    """Collect the state of the thread pool which serves the requests."""
+    server = getattr(cherrypy.server, "httpserver", None)
+    pool = getattr(server, "requests", None)
+    if pool is None:
+        return []
+
+    threads = len(getattr(pool, "_threads", ()))
+    idle = getattr(pool, "idle", 0)
+    return [
+        ((("state", "busy"), ), threads - idle),
+        ((("state", "idle"), ), idle),
+        ((("state", "queued"), ), getattr(pool, "qsize", 0)),
+    ]
+
+
+REGISTRY.collector("arestor_thread_pool_threads",
+                   "The state of the threads which serve the requests.",
+                   _thread_pool)
+
+
+def _cache_stat(field):
+    """Return a collector for a field from the statistics of the caches."""
+    def _collect():
+        """Collect the field from the statistics of all the caches."""
+        # NOTE: The caches are registered when their modules are loaded.
+        from arestor.common import cache as arestor_cache
+        return [((("cache", name), ), stats[field])
+                for name, stats in sorted(arestor_cache.stats().items())]
+    return _collect
+
+
+REGISTRY.collector("arestor_cache_hits_total", "The number of cache hits.",
+                   _cache_stat("hits"), kind=COUNTER)
+REGISTRY.collector("arestor_cache_misses_total",
+                   "The number of cache misses.",
+                   _cache_stat("misses"), kind=COUNTER)
+REGISTRY.collector("arestor_cache_evictions_total",
+                   "The number of entries dropped from the caches.",
+                   _cache_stat("evictions"), kind=COUNTER)
+REGISTRY.collector("arestor_cache_entries",
+                   "The number of entries from the caches.",
+                   _cache_stat("size"))
+REGISTRY.collector("arestor_cache_hit_ratio",
+                   "The ratio of the lookups answered by the caches.",
+                   _cache_stat("ratio"))
+
+
+class RequestMetrics(cherrypy.Tool):
+
+    """Account the number, the duration and the size of the requests."""
+
+    def __init__(self):
+        super(RequestMetrics, self).__init__("on_start_resource",
+                                             self._start)
+
+    def _setup(self):
+        """Hook the tool into the current request."""
+        super(RequestMetrics, self)._setup()
+        cherrypy.request.hooks.attach("on_end_request", self._end)
+
+    @staticmethod
+    def _start():
+        """Remember when the request was started and its handler."""
+        request = cherrypy.request
+        request.arestor_started = timer()
+        request.arestor_provider, request.arestor_route = (
+            arestor_timing.route(request))
+
+    @staticmethod
+    def _end():
+        """Account the request which was served."""
+        request, response = cherrypy.request, cherrypy.response
+        started = getattr(request, "arestor_started", None)
+        if started is None:
+            return
+
+        duration = timer() - started
+        status = str(response.status or 200).split(" ", 1)[0]
+        labels = (("provider", request.arestor_provider),
+                  ("route", request.arestor_route),
+                  ("method", request.method))
+        REGISTRY.inc("arestor_requests_total", labels + (("code", status), ))
+        REGISTRY.observe("arestor_request_duration_seconds", duration,
+                         labels)
+        size = response.headers.get("Content-Length")
+        if size is not None:
+            REGISTRY.observe("arestor_response_size_bytes", int(size),
+                             labels)
+
+
+class StorageDebug(cherrypy.Tool):
+
+    """Report the storage calls made by every request.
+
+    The number of commands, round trips and bytes and the time spent
+    waiting for the database are returned in the `X-Arestor-Storage-Calls`
+    and `X-Arestor-Storage-Time` headers and they are logged.
+    """
+
+    def __init__(self):
+        super(StorageDebug, self).__init__("on_start_resource", self._start)
+
+    def _setup(self):
+        """Hook the tool into the current request."""
+        super(StorageDebug, self)._setup()
+        cherrypy.request.hooks.attach("before_finalize", self._report)
+        cherrypy.request.hooks.attach("on_end_request", self._end)
+
+    @staticmethod
+    def _start():
+        """Start accounting the storage calls of the request."""
+        _ACCOUNT.current = StorageAccount()
+
+    @staticmethod
+    def _report():
+        """Add the storage calls made until now to the response."""
+        account = storage_account()
+        if account is None:
+            return
+
+        headers = cherrypy.response.headers
+        headers["X-Arestor-Storage-Calls"] = (
+            "round_trips=%(round_trips)d, commands=%(commands)d, "
+            "bytes_sent=%(bytes_sent)d, bytes_received=%(bytes_received)d"
+            % account.as_dict())
+        headers["X-Arestor-Storage-Time"] = "%.6f" % account.duration
+
+    @staticmethod
+    def _end():
+        """Log the storage calls and stop accounting them."""
+        account = storage_account()
+        _ACCOUNT.current = None
+        if account is None:
+            return
+
+        request = cherrypy.request
+        entry = account.as_dict()
+        entry.update({"method": request.method, "path": request.path_info,
+                      "status": str(cherrypy.response.status)})
+        LOG.info("Storage calls: %s", json.dumps(entry, sort_keys=True))
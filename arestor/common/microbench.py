@@ -0,0 +1,278 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Micro-benchmarks for the hot paths of the Arestor API.
+
+Every benchmark is a context manager which prepares its fixtures, yields
+the callable which is timed and cleans up afterwards. The benchmarks
+which require the database use the configured Redis server: the keys they
+create are unique to every run, a benchmark is skipped instead of
+overwriting keys which already exist and the keys are removed when it is
+done.
+
+The results can be saved as JSON baselines and compared with later runs,
+the comparison reports the benchmarks which slowed down more than the
+accepted tolerance.
+"""
+
+import collections
+import contextlib
+import json
+import platform
+import time
+import timeit
+import uuid
+
+import cherrypy
+from cherrypy.lib import httputil
+from oslo_log import log as logging
+
+from arestor import api as arestor_api
+from arestor.api import base as base_api
+from arestor.api.v1 import openstack
+from arestor.client import base as base_client
+from arestor.common import blob
+from arestor.common import constant
+from arestor.common import tools as arestor_tools
+from arestor.common import util as arestor_util
+
+LOG = logging.getLogger(__name__)
+
+BENCHMARKS = collections.OrderedDict()
+"""The available benchmarks, by name."""
+
+_RUN_ID = uuid.uuid4().hex
+
+CLIENT_ID = "instance-microbench-%s" % _RUN_ID
+API_KEY = "microbench-%s" % _RUN_ID
+SECRET = "microbench-secret"
+
+_INSTANCE_DATA = {
+    "uuid": "0c6f9a5a-5b8a-4a3c-9c4e-4f2a1d0e7b11",
+    "hostname": "microbench",
+    "name": "microbench",
+    "availability_zone": "nova",
+    "launch_index": 0,
+    "project_id": "microbench",
+    "keys": [],
+    "user_data": "#cloud-config\n" + "x" * 4096,
+}
+
+
+class SkipBenchmark(Exception):
+
+    """The benchmark can not run without changing the existing data."""
+
+
+def benchmark(name):
+    """Register a benchmark.
+
+    The decorated generator prepares the fixtures, yields the callable
+    which is timed and cleans up afterwards.
+    """
+    def _register(function):
+        BENCHMARKS[name] = contextlib.contextmanager(function)
+        return function
+    return _register
+
+
+def _application():
+    """Return the Arestor API application."""
+    config = dict((path, options)
+                  for path, options in arestor_api.Root.config().items()
+                  if path != "global")
+    return cherrypy.Application(arestor_api.Root(), "", config)
+
+
+def _serve(path, method="GET", headers=None, params=None):
+    """Prepare the current thread to serve a request for the path."""
+    request = cherrypy._cprequest.Request(
+        httputil.Host("127.0.0.1", 80), httputil.Host("127.0.0.1", 1024))
+    request.app = _application()
+    request.method = method
+    request.path_info = path
+    request.headers = httputil.HeaderMap(headers or {})
+    request.params = dict(params or {})
+    request.config = dict(request.app.config.get("/", {}))
+    cherrypy.serving.load(request, cherrypy._cprequest.Response())
+    return request
+
+
+@contextlib.contextmanager
+def _instance():
+    """Store the data of the synthetic instance."""
+    connection = arestor_util.RedisConnection().rcon
+    keys = []
+    writes = []
+    for name, value in _INSTANCE_DATA.items():
+        keys.append(constant.KEY_FORMAT.format(
+            namespace=openstack.OpenStackProvider.namespace,
+            user=CLIENT_ID, name=name))
+        writes.append((keys[-1], {"data": json.dumps(value)}))
+    if connection.exists(*keys):
+        raise SkipBenchmark("The instance %s already exists." % CLIENT_ID)
+    blob.write(connection, writes)
+    try:
+        yield connection
+    finally:
+        blob.delete(connection, keys)
+
+
+@benchmark("dispatch.find_handler")
+def _find_handler():
+    """Resolve the handler of the meta_data.json endpoint."""
+    path = "/v1/openstack/%s/openstack/latest/meta_data.json" % CLIENT_ID
+    request = _serve(path)
+    dispatcher = request.config["request.dispatch"]
+    yield lambda: dispatcher.find_handler(path)
+
+
+@benchmark("resource.get_data")
+def _get_data():
+    """Retrieve a single resource from the database."""
+    with _instance():
+        _serve("/", headers={"X-Arestor-Instance-ID": CLIENT_ID})
+        resource = base_api.Resource(None)
+        yield lambda: resource._get_data("openstack", "user_data", "data")
+
+
+@benchmark("openstack.meta_data.GET")
+def _meta_data():
+    """Render the OpenStack meta_data.json for an instance."""
+    with _instance():
+        _serve("/", headers={"X-Arestor-Instance-ID": CLIENT_ID})
+        node = openstack.OpenStackEndpointNamespace()
+        for segment in ("openstack", "latest", "meta_data_json"):
+            node = getattr(node, segment)
+        yield node.GET
+
+
+@benchmark("cipher.encrypt")
+def _encrypt():
+    """Encrypt an authentication payload."""
+    cipher = arestor_util.AESCipher(SECRET)
+    message = json.dumps({"api_key": API_KEY, "timestamp": "0"})
+    yield lambda: cipher.encrypt(message)
+
+
+@benchmark("cipher.decrypt")
+def _decrypt():
+    """Decrypt an authentication payload."""
+    cipher = arestor_util.AESCipher(SECRET)
+    message = cipher.encrypt(json.dumps({"api_key": API_KEY,
+                                         "timestamp": "0"}))
+    yield lambda: cipher.decrypt(message)
+
+
+@benchmark("tools.UserManager.load")
+def _user_manager():
+    """Check the signature of an authenticated request."""
+    connection = arestor_util.RedisConnection().rcon
+    if not connection.hsetnx("user.secret", API_KEY, SECRET):
+        raise SkipBenchmark("The user %s already exists." % API_KEY)
+    try:
+        manager = arestor_tools.UserManager()
+        client = base_client.Client("http://127.0.0.1/", API_KEY, SECRET)
+        request = _serve("/admin/resource")
+
+        def _load():
+            """Authenticate a freshly signed request."""
+            request.params = client._get_auth_params()
+            manager.load()
+
+        yield _load
+    finally:
+        arestor_tools.Users().remove_user(API_KEY)
+
+
+@benchmark("client.sign")
+def _client_sign():
+    """Sign a request from the client."""
+    client = base_client.Client("http://127.0.0.1/", API_KEY, SECRET)
+    yield client._get_auth_params
+
+
+def measure(function, repeat=5, min_time=0.2):
+    """Time the callable and return the seconds per call.
+
+    The number of calls in a loop grows until the loop takes at least
+    `min_time` seconds, then the loop is timed `repeat` times.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+
+    timings = sorted(elapsed / number
+                     for elapsed in timer.repeat(repeat, number))
+    return {
+        "number": number,
+        "repeat": repeat,
+        "best": timings[0],
+        "median": timings[len(timings) // 2],
+    }
+
+
+def run(names=None, repeat=5, min_time=0.2):
+    """Run the required benchmarks (all of them by default).
+
+    The benchmarks which fail are reported with their error and the
+    skipped ones with the reason instead of their timings.
+    """
+    results = collections.OrderedDict()
+    for name, factory in BENCHMARKS.items():
+        if names and not any(part in name for part in names):
+            continue
+        try:
+            with factory() as function:
+                results[name] = measure(function, repeat, min_time)
+        except SkipBenchmark as exc:
+            LOG.warning("The %s benchmark was skipped: %s", name, exc)
+            results[name] = {"skipped": str(exc)}
+        except Exception as exc:
+            LOG.error("The %s benchmark failed: %s", name, exc)
+            results[name] = {"error": str(exc)}
+        finally:
+            cherrypy.serving.clear()
+
+    return {
+        "created_at": time.time(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "benchmarks": results,
+    }
+
+
+def compare(baseline, current, tolerance=0.1):
+    """Compare the results of two runs.
+
+    :param tolerance: the accepted slow down (0.1 means 10%)
+    :returns: a list of (name, baseline, current, ratio, regressed)
+              tuples, the timings are the medians in seconds
+    """
+    rows = []
+    for name, result in current["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if not reference or "median" not in reference or "skipped" in result:
+            continue
+        if "median" not in result:
+            rows.append((name, reference["median"], None, None, True))
+            continue
+
+        ratio = result["median"] / reference["median"]
+        rows.append((name, reference["median"], result["median"], ratio,
+                     ratio > 1 + tolerance))
+    return rows
@@ -0,0 +1,295 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Map the source address of the requests to instances.
+
+The mappings (network in CIDR notation -> client_id) are kept in the
+database and every API process loads them in an in-memory radix tree,
+which is updated incrementally when the mappings are changed. The
+lookup returns the instance of the longest matching network.
+"""
+
+import binascii
+import socket
+import threading
+
+from oslo_log import log as logging
+
+from arestor.common import util as arestor_util
+
+LOG = logging.getLogger(__name__)
+
+NETWORKS_KEY = "networks/mappings"
+"""The hash which maps every network to its instance."""
+
+_FAMILIES = {
+    socket.AF_INET: 32,
+    socket.AF_INET6: 128,
+}
+
+
+def parse_address(address):
+    """Return the (family, address as integer) tuple for an IP address.
+
+    :raises ValueError: if the address is not valid
+    """
+    address = arestor_util.get_as_string(address) or ""
+    # NOTE: IPv4-mapped IPv6 addresses are treated as IPv4 addresses.
+    if address.lower().startswith("::ffff:") and "." in address:
+        address = address[len("::ffff:"):]
+
+    for family in _FAMILIES:
+        try:
+            packed = socket.inet_pton(family, address)
+        except (socket.error, ValueError):
+            continue
+        return family, int(binascii.hexlify(packed), 16)
+
+    raise ValueError("Invalid IP address %r." % address)
+
+
+def parse_network(network):
+    """Return the (family, network, prefix length) tuple for a network.
+
+    The host bits of the network are cleared.
+
+    :raises ValueError: if the network is not valid
+    """
+    network = arestor_util.get_as_string(network) or ""
+    address, _, length = network.partition("/")
+    family, value = parse_address(address)
+    width = _FAMILIES[family]
+    length = int(length) if length else width
+    if not 0 <= length <= width:
+        raise ValueError("Invalid prefix length for %r." % network)
+
+    value &= ((1 << width) - 1) ^ ((1 << (width - length)) - 1)
+    return family, value, length
+
+
+def format_network(family, value, length):
+    """Return the CIDR notation for the received network."""
+    width = _FAMILIES[family]
+    packed = binascii.unhexlify("%0*x" % (width // 4, value))
+    return "%s/%d" % (socket.inet_ntop(family, packed), length)
+
+
+class _Node(object):
+
+    """A node from the radix tree."""
+
+    __slots__ = ("prefix", "length", "value", "children")
+
+    def __init__(self, prefix, length, value=None):
+        self.prefix = prefix
+        self.length = length
+        self.value = value
+        self.children = [None, None]
+
+
+class RadixTree(object):
+
+    """Path compressed binary radix tree for longest prefix matching.
+
+    Every node keeps the network it stands for, so the chains of nodes
+    with a single child are collapsed. A lookup visits at most one node
+    for every bit of the address.
+
+    :param width: the number of bits of the addresses
+    """
+
+    def __init__(self, width):
+        self._width = width
+        self._root = _Node(0, 0)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _bit(self, value, position):
+        """Return the bit from the received position (0 is the first)."""
+        return (value >> (self._width - 1 - position)) & 1
+
+    def _common(self, first, second, limit):
+        """Return the length of the common prefix of two values."""
+        difference = first ^ second
+        common = self._width - difference.bit_length()
+        return min(common, limit)
+
+    def _matches(self, node, value):
+        """Whether the value is part of the network of the node."""
+        shift = self._width - node.length
+        return (value >> shift) == (node.prefix >> shift)
+
+    def insert(self, prefix, length, value):
+        """Add (or update) the value for the received network."""
+        node = self._root
+        while node.length != length:
+            bit = self._bit(prefix, node.length)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(prefix, length, value)
+                self._size += 1
+                return
+
+            common = self._common(prefix, child.prefix,
+                                  min(length, child.length))
+            if common == child.length:
+                node = child
+                continue
+
+            # NOTE: The new subtree is fully built before it is attached,
+            # the lookups running at the same time are not affected.
+            if common == length:
+                new_node = _Node(prefix, length, value)
+                new_node.children[self._bit(child.prefix, length)] = child
+            else:
+                mask = ((1 << self._width) - 1) ^ (
+                    (1 << (self._width - common)) - 1)
+                new_node = _Node(prefix & mask, common)
+                new_node.children[self._bit(child.prefix, common)] = child
+                new_node.children[self._bit(prefix, common)] = _Node(
+                    prefix, length, value)
+            node.children[bit] = new_node
+            self._size += 1
+            return
+
+        if node.value is None:
+            self._size += 1
+        node.value = value
+
+    def remove(self, prefix, length):
+        """Remove the value of the received network."""
+        path = []
+        node = self._root
+        while node is not None and node.length < length:
+            bit = self._bit(prefix, node.length)
+            path.append((node, bit))
+            node = node.children[bit]
+
+        if (node is None or node.length != length or
+                node.prefix != prefix or node.value is None):
+            return False
+
+        node.value = None
+        self._size -= 1
+        if not path:
+            return True
+
+        # Collapse the nodes which are no longer required.
+        parent, bit = path[-1]
+        children = [child for child in node.children if child is not None]
+        if len(children) < 2:
+            parent.children[bit] = children[0] if children else None
+        if (not children and parent is not self._root and
+                parent.value is None):
+            grandparent, parent_bit = path[-2]
+            sibling = parent.children[1 - bit]
+            grandparent.children[parent_bit] = sibling
+        return True
+
+    def lookup(self, value):
+        """Return the value of the longest network which contains value."""
+        result = None
+        node = self._root
+        while node is not None and self._matches(node, value):
+            if node.value is not None:
+                result = node.value
+            if node.length == self._width:
+                break
+            node = node.children[self._bit(value, node.length)]
+        return result
+
+
+class NetworkIndex(object):
+
+    """Map the IP addresses to instances.
+
+    The index is loaded from the database when it is first used and it is
+    kept up to date by :meth:`add` and :meth:`remove`.
+    """
+
+    def __init__(self):
+        self._trees = None
+        self._lock = threading.Lock()
+
+    def _load(self, connection):
+        """Build the radix trees from the stored mappings."""
+        trees = dict((family, RadixTree(width))
+                     for family, width in _FAMILIES.items())
+        for network, client_id in connection.hgetall(NETWORKS_KEY).items():
+            try:
+                family, prefix, length = parse_network(network)
+            except ValueError:
+                LOG.warning("Invalid network mapping %r ignored.", network)
+                continue
+            trees[family].insert(prefix, length,
+                                 arestor_util.get_as_string(client_id))
+        LOG.info("Loaded %d network mappings.",
+                 sum(len(tree) for tree in trees.values()))
+        return trees
+
+    def _get_trees(self, connection=None):
+        """Return the radix trees, loading them if it is required."""
+        if self._trees is None:
+            with self._lock:
+                if self._trees is None:
+                    connection = (connection or
+                                  arestor_util.RedisConnection().rcon)
+                    self._trees = self._load(connection)
+        return self._trees
+
+    def lookup(self, address, connection=None):
+        """Return the client_id for the received address (or None).
+
+        The database is used only if the index was not loaded yet.
+        """
+        try:
+            family, value = parse_address(address)
+        except ValueError:
+            return None
+        return self._get_trees(connection)[family].lookup(value)
+
+    def add(self, connection, network, client_id):
+        """Map the network to the instance and return its CIDR notation."""
+        family, prefix, length = parse_network(network)
+        network = format_network(family, prefix, length)
+        connection.hset(NETWORKS_KEY, network, client_id)
+        trees = self._get_trees(connection)
+        with self._lock:
+            trees[family].insert(prefix, length, client_id)
+        return network
+
+    def remove(self, connection, network):
+        """Remove the mapping for the received network."""
+        family, prefix, length = parse_network(network)
+        connection.hdel(NETWORKS_KEY, format_network(family, prefix, length))
+        trees = self._get_trees(connection)
+        with self._lock:
+            trees[family].remove(prefix, length)
+
+    def mappings(self, connection):
+        """Return all the stored mappings."""
+        return dict((arestor_util.get_as_string(network),
+                     arestor_util.get_as_string(client_id))
+                    for network, client_id
+                    in connection.hgetall(NETWORKS_KEY).items())
+
+    def reload(self):
+        """Drop the in-memory index, it will be loaded again when used."""
+        with self._lock:
+            self._trees = None
+
+
+INDEX = NetworkIndex()
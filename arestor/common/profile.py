@@ -0,0 +1,162 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Profiles shared by multiple instances.
+
+A profile holds the resources shared by a group of instances. It is
+stored like the data of an instance, under the `profile-<name>` client
+id, and an instance uses it by storing the name of the profile in its
+`profile` resource. The resources of the instance override the ones of
+its profile (copy-on-write): a resource is taken from the profile only
+if the instance does not have it.
+
+The profiles are cached by every API process; the entries expire after
+`cache_ttl` seconds and they are dropped right away when the profile is
+updated through the current process.
+"""
+
+import json
+import threading
+import time
+
+import six
+
+from arestor import config as arestor_config
+from arestor.common import blob
+from arestor.common import cache as arestor_cache
+from arestor.common import constant
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+PROFILE = "profile"
+"""The resource which contains the name of the profile of an instance."""
+
+CACHE = arestor_cache.LRUCache("profiles", CONFIG.profile.cache_size)
+
+
+def is_profile(client_id):
+    """Whether the client id belongs to a profile."""
+    return bool(client_id) and client_id.startswith(constant.PROFILE_PREFIX)
+
+
+def _key(namespace, client_id, name):
+    """Return the key of the required resource."""
+    return constant.KEY_FORMAT.format(namespace=namespace, user=client_id,
+                                      name=name)
+
+
+def _profile_name(value):
+    """Return the name of the profile from the raw `profile` resource."""
+    value = arestor_util.get_as_string(value)
+    if not value:
+        return None
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    if not isinstance(value, six.string_types):
+        return None
+    return value or None
+
+
+class _ProfileEntry(object):
+
+    """The resources of a profile which were retrieved until now."""
+
+    def __init__(self):
+        self.created_at = time.time()
+        self.values = {}
+        self.lock = threading.Lock()
+
+    @property
+    def expired(self):
+        """Whether the entry should be retrieved again."""
+        return time.time() - self.created_at > CONFIG.profile.cache_ttl
+
+
+def _profile_values(connection, namespace, name, fields):
+    """Return the raw values of the fields from the required profile.
+
+    :param fields: a list of (resource, field) tuples
+    """
+    entry = CACHE.get((namespace, name))
+    if entry is None or entry.expired:
+        entry = _ProfileEntry()
+        CACHE.set((namespace, name), entry)
+
+    missing = [item for item in set(fields) if item not in entry.values]
+    if missing:
+        client_id = arestor_util.profile_id(name)
+        pipeline = connection.pipeline(transaction=False)
+        for resource, field in missing:
+            pipeline.hget(_key(namespace, client_id, resource), field)
+        results = pipeline.execute()
+        with entry.lock:
+            entry.values.update(zip(missing, results))
+
+    return [entry.values[item] for item in fields]
+
+
+def _instance_values(connection, namespace, client_id, fields):
+    """Retrieve the fields of the instance with a single round trip.
+
+    :returns: the name of the profile of the instance, a dictionary with
+              the resources which exist for the instance and the raw
+              values of the fields
+    """
+    names = sorted(set(resource for resource, _ in fields))
+    pipeline = connection.pipeline(transaction=False)
+    pipeline.hget(_key(namespace, client_id, PROFILE), "data")
+    for name in names:
+        pipeline.exists(_key(namespace, client_id, name))
+    for resource, field in fields:
+        pipeline.hget(_key(namespace, client_id, resource), field)
+    results = pipeline.execute()
+
+    return (_profile_name(results[0]),
+            dict(zip(names, results[1:len(names) + 1])),
+            results[len(names) + 1:])
+
+
+def get_fields(connection, namespace, client_id, fields):
+    """Retrieve resources of an instance, falling back to its profile.
+
+    The resources of the instance, its profile and whether the resources
+    exist for the instance are retrieved with a single round trip. The
+    profile is used only for the resources missing from the instance and
+    it is served from the cache when possible.
+
+    :param fields: a list of (resource, field) tuples
+    :returns: a list with the values (None for the missing ones)
+    """
+    name, exists, values = _instance_values(connection, namespace,
+                                            client_id, fields)
+    if name and not is_profile(client_id):
+        inherited = [index for index, (resource, _) in enumerate(fields)
+                     if not exists[resource]]
+        if inherited:
+            profile_values = _profile_values(
+                connection, namespace, name,
+                [fields[index] for index in inherited])
+            for index, value in zip(inherited, profile_values):
+                values[index] = value
+
+    return blob.resolve(connection, values)
+
+
+def invalidate(namespace, client_id):
+    """Drop the cached profile if the client id belongs to a profile."""
+    if is_profile(client_id):
+        CACHE.pop((namespace, client_id[len(constant.PROFILE_PREFIX):]))
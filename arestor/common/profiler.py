@@ -0,0 +1,314 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""On-demand profiling of the running API process.
+
+A profiling session is time-bounded and it runs in one of two modes:
+
+* `sample`: a background thread walks the stacks of all the other
+  threads at a fixed interval. The result is available as aggregated
+  statistics or as collapsed stacks (the input of `flamegraph.pl`).
+* `cprofile`: every request served while the session is active is
+  profiled with :mod:`cProfile` in its worker thread and the statistics
+  of all the requests are merged.
+
+Nothing is installed while no session is active: the sampler thread is
+not running and the request tool does not attach its hooks.
+"""
+
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+import cherrypy
+from oslo_log import log as logging
+import six
+
+LOG = logging.getLogger(__name__)
+
+MODE_SAMPLE = "sample"
+MODE_CPROFILE = "cprofile"
+MODES = (MODE_SAMPLE, MODE_CPROFILE)
+
+
+def _frame_label(code):
+    """Return the label of a frame from the collapsed stacks."""
+    return "%s (%s:%d)" % (code.co_name, os.path.basename(code.co_filename),
+                           code.co_firstlineno)
+
+
+class _Collected(object):
+
+    """The data collected by a profiling session."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = collections.Counter()
+        self.sample_count = 0
+        self.requests = 0
+        self.stats = None
+
+
+class Session(object):
+
+    """A time-bounded profiling session.
+
+    :param mode: the profiling mode (`sample` or `cprofile`)
+    :param duration: the number of seconds the session is active
+    :param interval: the number of seconds between two samples
+    """
+
+    def __init__(self, mode, duration, interval):
+        self.mode = mode
+        self.duration = duration
+        self.interval = interval
+        self.started_at = time.time()
+        self.finished_at = None
+
+        self._finished = threading.Event()
+        self._collected = _Collected()
+
+    @property
+    def active(self):
+        """Whether the session is still collecting data."""
+        return not self._finished.is_set()
+
+    def finish(self):
+        """Stop collecting data."""
+        if self.active:
+            self.finished_at = time.time()
+            self._finished.set()
+
+    def wait(self, timeout):
+        """Wait for the session to finish, return whether it finished."""
+        return self._finished.wait(timeout)
+
+    def sample(self, ignore):
+        """Take a sample of the stacks of all the threads.
+
+        :param ignore: the ids of the threads which are not sampled
+        """
+        # pylint: disable=protected-access
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in ignore:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stacks.append(";".join(reversed(stack)))
+
+        collected = self._collected
+        with collected.lock:
+            collected.samples.update(stacks)
+            collected.sample_count += 1
+
+    def add_profile(self, profile):
+        """Merge the statistics of a profiled request."""
+        collected = self._collected
+        with collected.lock:
+            if collected.stats is None:
+                collected.stats = pstats.Stats(profile)
+            else:
+                collected.stats.add(profile)
+            collected.requests += 1
+
+    def collapsed(self):
+        """Return the samples as collapsed stacks."""
+        with self._collected.lock:
+            samples = sorted(self._collected.samples.items())
+        return "".join("%s %d\n" % (stack, count)
+                       for stack, count in samples)
+
+    def _sample_summary(self, limit):
+        """Aggregate the samples by function."""
+        own = collections.Counter()
+        total = collections.Counter()
+        collected = self._collected
+        with collected.lock:
+            samples = list(collected.samples.items())
+            summary = {"samples": collected.sample_count}
+
+        for stack, count in samples:
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+
+        summary["functions"] = [
+            {"function": label, "self": own[label], "total": count}
+            for label, count in total.most_common(limit)]
+        return summary
+
+    def _cprofile_summary(self, limit):
+        """Return the functions with the highest cumulative time."""
+        collected = self._collected
+        with collected.lock:
+            stats = dict(collected.stats.stats) if collected.stats else {}
+            summary = {"requests": collected.requests}
+
+        functions = sorted(stats.items(), key=lambda item: item[1][3],
+                           reverse=True)[:limit]
+        summary["functions"] = [
+            {"function": "%s (%s:%d)" % (name, os.path.basename(path), line),
+             "calls": calls, "primitive_calls": primitive_calls,
+             "total_time": total_time, "cumulative_time": cumulative_time}
+            for (path, line, name), (primitive_calls, calls, total_time,
+                                     cumulative_time, _) in functions]
+        return summary
+
+    def summary(self, limit=50):
+        """Return the aggregated statistics of the session."""
+        if self.mode == MODE_SAMPLE:
+            summary = self._sample_summary(limit)
+        else:
+            summary = self._cprofile_summary(limit)
+
+        summary.update({
+            "mode": self.mode,
+            "active": self.active,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": self.duration,
+        })
+        return summary
+
+    def stats(self):
+        """Return the statistics of the profiled requests as text."""
+        output = six.StringIO()
+        collected = self._collected
+        with collected.lock:
+            if collected.stats is not None:
+                collected.stats.stream = output
+                collected.stats.sort_stats("cumulative").print_stats()
+        return output.getvalue()
+
+
+class Profiler(object):
+
+    """Run a single profiling session at a time."""
+
+    def __init__(self):
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The last profiling session (None if no session was started)."""
+        return self._session
+
+    def active_session(self, mode=None):
+        """Return the active session (of the given mode) or None."""
+        session = self._session
+        if session is None or not session.active:
+            return None
+        if mode and session.mode != mode:
+            return None
+        return session
+
+    def start(self, mode, duration, interval):
+        """Start a new profiling session.
+
+        :raises ValueError: if the mode is not valid or a session is
+                            already active
+        """
+        if mode not in MODES:
+            raise ValueError("Invalid profiling mode %r." % mode)
+
+        with self._lock:
+            if self.active_session():
+                raise ValueError("A profiling session is already active.")
+            session = self._session = Session(mode, duration, interval)
+
+        worker = threading.Thread(target=self._run, args=(session, ),
+                                  name="arestor-profiler")
+        worker.daemon = True
+        worker.start()
+        LOG.info("Started a %s profiling session for %s seconds.",
+                 mode, duration)
+        return session
+
+    @staticmethod
+    def _run(session):
+        """Keep the session active until its time is up."""
+        deadline = time.time() + session.duration
+        if session.mode == MODE_SAMPLE:
+            ignore = (threading.current_thread().ident, )
+            while not session.wait(session.interval):
+                if time.time() >= deadline:
+                    break
+                session.sample(ignore)
+        else:
+            session.wait(session.duration)
+
+        session.finish()
+        LOG.info("The %s profiling session finished.", session.mode)
+
+    def stop(self):
+        """Stop the active session (if any)."""
+        session = self.active_session()
+        if session:
+            session.finish()
+        return session
+
+
+PROFILER = Profiler()
+
+
+class RequestProfiler(cherrypy.Tool):
+
+    """Profile the requests served while a `cprofile` session is active.
+
+    The hooks are attached only while the session is active, the tool
+    has no overhead otherwise.
+    """
+
+    def __init__(self):
+        super(RequestProfiler, self).__init__("on_start_resource",
+                                              self._start, priority=10)
+
+    def _setup(self):
+        """Hook the tool into the current request."""
+        if PROFILER.active_session(MODE_CPROFILE) is None:
+            return
+
+        super(RequestProfiler, self)._setup()
+        cherrypy.request.hooks.attach("on_end_request", self._end)
+
+    @staticmethod
+    def _start():
+        """Start profiling the current request."""
+        request = cherrypy.request
+        request.arestor_session = PROFILER.active_session(MODE_CPROFILE)
+        if request.arestor_session is None:
+            return
+
+        request.arestor_profile = cProfile.Profile()
+        request.arestor_profile.enable()
+
+    @staticmethod
+    def _end():
+        """Stop profiling the current request and keep its statistics."""
+        request = cherrypy.request
+        profile = getattr(request, "arestor_profile", None)
+        if profile is None:
+            return
+
+        profile.disable()
+        request.arestor_session.add_profile(profile)
@@ -0,0 +1,192 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""user_data templates rendered by the Arestor API.
+
+A template is stored once and it is shared by all the instances which
+use it. The placeholders from the template (`$hostname`, `${uuid}` and so
+on) are replaced with the data of the instance when its user_data is
+retrieved; the unknown placeholders are left unchanged.
+
+Every template has a version which is increased when the template is
+updated (and which is not reset when the template is deleted). The
+compiled templates are cached by the digest of their content and the
+rendered user_data is cached for every instance, so a template is
+rendered again only if the template or the data of the instance changed.
+The template used by the instances is checked again only after
+`cache_ttl` seconds, most of the user_data requests do not need an extra
+round trip to the database.
+"""
+
+import base64
+import collections
+import json
+import string
+import timeit
+
+import six
+
+from arestor import config as arestor_config
+from arestor.common import blob
+from arestor.common import cache as arestor_cache
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+TEMPLATE_KEY = "templates/{name}"
+
+VERSIONS_KEY = "template_versions"
+"""The hash with the last version of every template, it is kept when the
+templates are deleted."""
+
+USER_DATA_TEMPLATE = "user_data_template"
+"""The resource which contains the template used by an instance and the
+extra variables of the instance."""
+
+VARIABLES = ("hostname", "uuid", "name", "launch_index",
+             "availability_zone", "project_id")
+"""The resources of the instance available in the templates."""
+
+FIELDS = (USER_DATA_TEMPLATE, ) + VARIABLES
+"""The resources required in order to render the user_data."""
+
+COMPILED = arestor_cache.LRUCache("templates",
+                                  CONFIG.template.compiled_cache_size)
+RENDERED = arestor_cache.LRUCache("rendered_user_data",
+                                  CONFIG.template.rendered_cache_size)
+LOADED = arestor_cache.LRUCache("loaded_templates",
+                                CONFIG.template.compiled_cache_size)
+
+Loaded = collections.namedtuple("Loaded", ["version", "digest", "compiled"])
+
+timer = timeit.default_timer
+
+_REDIS = []
+
+
+def _connection():
+    """Return the Redis connection used in order to load the templates."""
+    if not _REDIS:
+        _REDIS.append(arestor_util.RedisConnection())
+    return _REDIS[0].rcon
+
+
+def template_key(name):
+    """Return the key of the required template."""
+    return TEMPLATE_KEY.format(name=name)
+
+
+def store(connection, name, template):
+    """Create or update a template and return its new version."""
+    key = template_key(name)
+    version = connection.hincrby(VERSIONS_KEY, name, 1)
+    if version == 1:
+        # NOTE: The templates stored before the versions were kept apart
+        # have their version in the template itself.
+        previous = int(connection.hget(key, "version") or 0)
+        if previous:
+            version = connection.hincrby(VERSIONS_KEY, name, previous)
+    blob.write(connection, [(key, {"data": template, "version": version})])
+    LOADED.pop(name)
+    return version
+
+
+def delete(connection, name):
+    """Remove the required template."""
+    blob.delete(connection, [template_key(name)])
+    LOADED.pop(name)
+
+
+def load(connection, name, max_age=None):
+    """Return the :class:`Loaded` template (or None if it is missing).
+
+    :param max_age: the number of seconds a template loaded before can
+                    be used without checking the database again
+    """
+    if max_age:
+        cached = LOADED.get(name)
+        if cached is not None and timer() - cached[0] < max_age:
+            return cached[1]
+
+    data, version = connection.hmget(template_key(name), ["data", "version"])
+    loaded = None
+    if data is not None:
+        # NOTE: The compiled templates are cached by content, a template
+        # which is deleted and created again is never mixed up.
+        content_digest = blob.parse_reference(data) or blob.digest(data)
+        compiled = COMPILED.get(content_digest)
+        if compiled is None:
+            content = blob.resolve(connection, [data])[0]
+            compiled = string.Template(
+                arestor_util.get_as_string(content) or "")
+            COMPILED.set(content_digest, compiled)
+        loaded = Loaded(int(version or 0), content_digest, compiled)
+
+    LOADED.set(name, (timer(), loaded))
+    return loaded
+
+
+def _as_text(value):
+    """Return the representation of a variable in the rendered template."""
+    if value is None:
+        return ""
+    if isinstance(value, six.string_types):
+        return value
+    return json.dumps(value)
+
+
+def render(client_id, data, connection=None):
+    """Render the user_data template of an instance.
+
+    :param client_id: the instance which requested the user_data
+    :param data: the (decoded) resources of the instance, as listed in
+                 :data:`FIELDS`
+    :returns: the rendered user_data or None if the instance does not use
+              a template
+    """
+    spec = data.get(USER_DATA_TEMPLATE)
+    if not isinstance(spec, dict) or not spec.get("name"):
+        return None
+
+    loaded = load(connection or _connection(), spec["name"],
+                  CONFIG.template.cache_ttl)
+    if loaded is None:
+        return None
+
+    variables = dict((name, _as_text(data.get(name))) for name in VARIABLES)
+    variables.update((name, _as_text(value)) for name, value
+                     in (spec.get("variables") or {}).items())
+    signature = (loaded.digest, sorted(variables.items()))
+
+    cached = RENDERED.get(client_id)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    rendered = loaded.compiled.safe_substitute(variables)
+    RENDERED.set(client_id, (signature, rendered))
+    return rendered
+
+
+def user_data(client_id, data, connection=None):
+    """Return the user_data of an instance.
+
+    The template of the instance is rendered if it has one, otherwise the
+    stored (base64 encoded) user_data is returned.
+    """
+    rendered = render(client_id, data, connection)
+    if rendered is not None:
+        return arestor_util.get_as_bytes(rendered)
+    if data.get("user_data"):
+        return base64.b64decode(data["user_data"])
+    return None
@@ -0,0 +1,124 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Boot timeline of the instances served by the metadata API.
+
+Every metadata request of an instance is appended to a ring buffer of
+fixed size which belongs to that instance, so the order in which the
+instance fetched the endpoints and the latency of every request can be
+inspected. The timelines are kept only in memory: recording a request
+costs a few dictionary operations and no storage round trip.
+"""
+
+import collections
+import threading
+import time
+
+import cherrypy
+
+from arestor import config as arestor_config
+from arestor.common import timing as arestor_timing
+
+CONFIG = arestor_config.CONFIG
+
+Entry = collections.namedtuple(
+    "Entry", ["timestamp", "instance_id", "method", "path", "route",
+              "status", "latency"])
+
+
+class Timeline(object):
+
+    """The last requests of every instance.
+
+    :param size: the number of requests kept for every instance
+    :param max_instances: the number of instances kept in memory; the
+        timeline of the instance which was not seen for the longest time
+        is dropped first
+    """
+
+    def __init__(self, size=64, max_instances=10000):
+        self._size = size
+        self._max_instances = max_instances
+        self._timelines = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of instances with a timeline."""
+        return len(self._timelines)
+
+    def record(self, entry):
+        """Append the entry to the timeline of its instance."""
+        with self._lock:
+            # NOTE: The timeline is moved to the end, so the instances are
+            # kept in the order they were last seen.
+            timeline = self._timelines.pop(entry.instance_id, None)
+            if timeline is None:
+                timeline = collections.deque(maxlen=self._size)
+                if len(self._timelines) >= self._max_instances:
+                    self._timelines.popitem(last=False)
+            timeline.append(entry)
+            self._timelines[entry.instance_id] = timeline
+
+    def get(self, instance_id):
+        """Return the requests of the instance, from the oldest one."""
+        with self._lock:
+            timeline = list(self._timelines.get(instance_id, ()))
+        return [entry._asdict() for entry in timeline]
+
+    def instances(self):
+        """Return the number of recorded requests of every instance."""
+        with self._lock:
+            return dict((instance_id, len(timeline)) for instance_id, timeline
+                        in self._timelines.items())
+
+    def clear(self, instance_id=None):
+        """Drop the timeline of the instance (or all of them)."""
+        with self._lock:
+            if instance_id is None:
+                self._timelines.clear()
+            else:
+                self._timelines.pop(instance_id, None)
+
+
+TIMELINE = Timeline(CONFIG.api.timeline_size,
+                    CONFIG.api.timeline_max_instances)
+
+
+class TimelineRecorder(cherrypy.Tool):
+
+    """Append the metadata requests to the timeline of their instance."""
+
+    def __init__(self):
+        super(TimelineRecorder, self).__init__("on_end_request",
+                                               self._record)
+
+    @staticmethod
+    def _record():
+        """Record the request which was served."""
+        request, response = cherrypy.request, cherrypy.response
+        instance_id = request.headers.get("X-Arestor-Instance-ID")
+        if not instance_id:
+            return
+
+        provider, route = arestor_timing.route(request)
+        if provider == "admin":
+            return
+
+        # NOTE: The response is created when the request is received.
+        TIMELINE.record(Entry(
+            timestamp=response.time, instance_id=instance_id,
+            method=request.method, path=request.path_info,
+            route="%s/%s" % (provider, route),
+            status=int(str(response.status or 200).split(" ", 1)[0]),
+            latency=round(time.time() - response.time, 6)))
@@ -0,0 +1,235 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Per-phase timers for the requests and the slow request log.
+
+Every request served by the API keeps a few timers (a handful of clock
+reads and additions) for the phases it goes through:
+
+* `queue`: the time the connection waited for a worker thread
+* `dispatch`: reading the request headers and finding the handler
+* `prepare`: reading the body and the authentication (`auth`)
+* `handler`: running the handler, including the storage round trips
+  (`storage`) and the serialization of the response (`serialize`)
+* `write`: finalizing and writing the response to the client
+
+The requests which take longer than the `slow_request_threshold` option
+are logged with their breakdown.
+"""
+
+import functools
+import json
+import threading
+import time
+import timeit
+
+import cherrypy
+from oslo_log import log as logging
+
+from arestor import config as arestor_config
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+timer = timeit.default_timer
+
+_CURRENT = threading.local()
+
+
+class RequestTimings(object):
+
+    """The timers of the request served by the current thread."""
+
+    __slots__ = ("started", "mark", "phases", "round_trips")
+
+    def __init__(self, started):
+        self.started = started
+        self.mark = started
+        self.phases = {}
+        self.round_trips = 0
+
+    def add(self, phase, seconds):
+        """Add the seconds to the timer of the phase."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def lap(self, phase):
+        """Account the time since the last lap to the phase."""
+        now = timer()
+        self.add(phase, now - self.mark)
+        self.mark = now
+
+
+def current():
+    """Return the timers of the current request (or None)."""
+    return getattr(_CURRENT, "timings", None)
+
+
+def add_storage(seconds):
+    """Account a storage round trip to the current request."""
+    timings = current()
+    if timings is not None:
+        timings.round_trips += 1
+        timings.add("storage", seconds)
+
+
+def timed(phase):
+    """Account the time spent in the decorated function to the phase."""
+    def _decorator(function):
+        """Wrap the function with the timer."""
+        @functools.wraps(function)
+        def _wrapper(*args, **kwargs):
+            """Call the function and time it if a request is served."""
+            timings = current()
+            if timings is None:
+                return function(*args, **kwargs)
+
+            started = timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                timings.add(phase, timer() - started)
+        return _wrapper
+    return _decorator
+
+
+def route(request):
+    """Return the (provider, route) names for the handler of the request.
+
+    Only the names of the handlers are used, so the number of values
+    does not depend on the requested paths.
+    """
+    handler = request.handler
+    # NOTE: The encoding and the JSON tools wrap the handler of the request.
+    while hasattr(handler, "oldhandler"):
+        handler = handler.oldhandler
+    if not hasattr(handler, "callable"):
+        handler = getattr(request, "_json_inner_handler", handler)
+    handler = getattr(handler, "callable", None)
+    owner = getattr(handler, "__self__", None)
+    if owner is None:
+        return "none", "none"
+
+    provider = getattr(owner, "namespace", None)
+    if provider is None:
+        provider = type(owner).__module__.rsplit(".", 2)[-2]
+    return provider, "%s.%s" % (type(owner).__name__, handler.__name__)
+
+
+def stamp_connections():
+    """Record when the connections are queued for the worker threads.
+
+    The queue wait of the requests is known only for the HTTP servers
+    which expose `process_conn`.
+    """
+    server = getattr(cherrypy.server, "httpserver", None)
+    process_conn = getattr(server, "process_conn", None)
+    if process_conn is None or getattr(process_conn, "stamped", False):
+        return
+
+    def _process_conn(conn):
+        """Stamp the connection and put it in the queue."""
+        conn.arestor_queued_at = timer()
+        return process_conn(conn)
+
+    _process_conn.stamped = True
+    server.process_conn = _process_conn
+
+
+# NOTE: The HTTP server is created when the `server` plugin starts.
+stamp_connections.priority = 80
+
+
+def _queue_wait(started):
+    """Return the time the connection of the request was queued."""
+    connection = getattr(threading.current_thread(), "conn", None)
+    queued_at = getattr(connection, "arestor_queued_at", None)
+    if queued_at is None:
+        return None
+
+    # NOTE: The following requests from the same connection were not
+    # queued again.
+    connection.arestor_queued_at = None
+    return max(0.0, started - queued_at)
+
+
+class SlowRequestLog(cherrypy.Tool):
+
+    """Time the phases of the requests and log the slow ones."""
+
+    def __init__(self):
+        super(SlowRequestLog, self).__init__("on_start_resource",
+                                             self._start, priority=0)
+
+    def _setup(self):
+        """Hook the tool into the current request."""
+        super(SlowRequestLog, self)._setup()
+        hooks = cherrypy.request.hooks
+        hooks.attach("before_handler", self._prepared, priority=100)
+        hooks.attach("before_finalize", self._handled, priority=0)
+        hooks.attach("on_end_request", self._end)
+
+    @staticmethod
+    def _start():
+        """Start the timers of the request."""
+        timings = _CURRENT.timings = RequestTimings(timer())
+        # NOTE: The response is created when the request is received.
+        dispatch = max(0.0, time.time() - cherrypy.response.time)
+        timings.add("dispatch", dispatch)
+
+        queue = _queue_wait(timings.started)
+        if queue is not None:
+            timings.add("queue", max(0.0, queue - dispatch))
+
+    @staticmethod
+    def _prepared():
+        """The request is ready to be handled."""
+        timings = current()
+        if timings is not None:
+            timings.lap("prepare")
+
+    @staticmethod
+    def _handled():
+        """The handler returned the response."""
+        timings = current()
+        if timings is not None:
+            timings.lap("handler")
+
+    @staticmethod
+    def _end():
+        """Log the request if it was slow."""
+        timings = current()
+        _CURRENT.timings = None
+        if timings is None:
+            return
+
+        timings.lap("write")
+        total = (timings.mark - timings.started +
+                 timings.phases.get("dispatch", 0) +
+                 timings.phases.get("queue", 0))
+        if total < CONFIG.api.slow_request_threshold:
+            return
+
+        request = cherrypy.request
+        entry = {
+            "method": request.method,
+            "path": request.path_info,
+            "route": "%s/%s" % route(request),
+            "instance_id": request.headers.get("X-Arestor-Instance-ID"),
+            "status": str(cherrypy.response.status),
+            "total": round(total, 6),
+            "round_trips": timings.round_trips,
+        }
+        entry.update((phase, round(seconds, 6))
+                     for phase, seconds in timings.phases.items())
+        LOG.warning("Slow request: %s", json.dumps(entry, sort_keys=True))
@@ -24,6 +24,8 @@ import cherrypy
 from oslo_log import log as logging
 
 from arestor import config as arestor_config
+from arestor.common import timing as arestor_timing
+from arestor.common import tracing as arestor_tracing
 from arestor.common import util as arestor_util
 
 CONFIG = arestor_config.CONFIG
@@ -125,6 +127,8 @@ class UserManager(cherrypy.Tool):
 
         return True
 
+    @arestor_timing.timed("auth")
+    @arestor_tracing.traced("auth")
     def load(self):
         """Process information received from client."""
         request = cherrypy.request
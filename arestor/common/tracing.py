@@ -0,0 +1,437 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Lightweight tracing spans for the API and its clients.
+
+The clients send the context of the current span with the W3C
+`traceparent` header, the API continues the trace with a span for the
+request and with spans for the dispatch, the authentication, every
+storage round trip and the rendering of the response.
+
+The finished spans are buffered in memory and a background thread writes
+them to a local file in batches, using the Zipkin v2 JSON format: every
+line of the file is a JSON list of spans, which can be merged into a
+single list (eg. `jq -s add`) and loaded by the Zipkin UI. Spans are
+recorded only while tracing is enabled, otherwise every call is a
+no-op.
+"""
+
+import atexit
+import binascii
+import collections
+import contextlib
+import functools
+import json
+import os
+import re
+import threading
+import time
+
+import cherrypy
+from oslo_log import log as logging
+
+from arestor import config as arestor_config
+from arestor.common import timing as arestor_timing
+
+CONFIG = arestor_config.CONFIG
+LOG = logging.getLogger(__name__)
+
+TRACEPARENT = "traceparent"
+"""The header which propagates the context of the trace."""
+
+KIND_CLIENT = "CLIENT"
+KIND_SERVER = "SERVER"
+
+SERVICE_API = "arestor-api"
+SERVICE_CLIENT = "arestor-client"
+
+_TRACEPARENT = re.compile(
+    r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_CURRENT = threading.local()
+
+SpanContext = collections.namedtuple("SpanContext",
+                                     ["trace_id", "span_id", "parent_id"])
+"""The identifiers which place a span in its trace."""
+
+
+def _new_id(size):
+    """Return a random identifier of `size` bytes, as hex."""
+    return binascii.hexlify(os.urandom(size)).decode("ascii")
+
+
+def parse_traceparent(value):
+    """Return the (trace id, span id, sampled) from the header (or None)."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if match is None:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+class Span(object):
+
+    """An operation which is part of a trace.
+
+    :param name: the name of the operation
+    :param service: the name of the service which did the operation
+    :param trace_id: the trace of the span (a new trace by default)
+    :param parent_id: the span which caused the current one
+    :param kind: `CLIENT`, `SERVER` or None for a local operation
+    :param timestamp: when the operation started (now by default)
+    """
+
+    __slots__ = ("name", "service", "context", "kind", "timestamp",
+                 "duration", "tags")
+
+    def __init__(self, name, service, trace_id=None, parent_id=None,
+                 kind=None, timestamp=None):
+        self.name = name
+        self.service = service
+        self.context = SpanContext(trace_id or _new_id(16), _new_id(8),
+                                   parent_id)
+        self.kind = kind
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.duration = None
+        self.tags = {}
+
+    @property
+    def trace_id(self):
+        """The trace which contains the span."""
+        return self.context.trace_id
+
+    @property
+    def span_id(self):
+        """The identifier of the span."""
+        return self.context.span_id
+
+    @property
+    def parent_id(self):
+        """The span which caused the current one (or None)."""
+        return self.context.parent_id
+
+    @property
+    def traceparent(self):
+        """The value of the header which continues the trace."""
+        return "00-%s-%s-01" % (self.trace_id, self.span_id)
+
+    def tag(self, key, value):
+        """Attach a tag to the span."""
+        self.tags[key] = value
+
+    def finish(self, duration=None):
+        """End the operation and export the span."""
+        if self.duration is not None:
+            return
+        if duration is None:
+            duration = time.time() - self.timestamp
+        self.duration = max(0.0, duration)
+        span_exporter = exporter()
+        if span_exporter is not None:
+            span_exporter.export(self)
+
+    def as_zipkin(self):
+        """Return the span in the Zipkin v2 JSON format."""
+        zipkin_span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": int(self.timestamp * 1e6),
+            # NOTE: The duration is in microseconds and it can not be 0.
+            "duration": max(1, int((self.duration or 0) * 1e6)),
+            "localEndpoint": {"serviceName": self.service},
+            "tags": dict((key, str(value))
+                         for key, value in self.tags.items()),
+        }
+        if self.parent_id:
+            zipkin_span["parentId"] = self.parent_id
+        if self.kind:
+            zipkin_span["kind"] = self.kind
+        return zipkin_span
+
+
+class _SpanBuffer(object):
+
+    """The finished spans which were not written yet.
+
+    :param max_spans: the maximum number of buffered spans, the new spans
+                      are dropped when the buffer is full
+    """
+
+    def __init__(self, max_spans):
+        self.max_spans = max_spans
+        self.spans = []
+        self.lock = threading.Lock()
+        self.closed = False
+        self.dropped = 0
+
+
+class FileExporter(object):
+
+    """Write the finished spans to a file, in batches.
+
+    :param path: the file where the spans are appended
+    :param batch_size: the number of spans which triggers a write
+    :param flush_interval: the maximum number of seconds between writes
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=5.0):
+        self.path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        # NOTE: The spans are dropped if they can not be written fast
+        # enough, the memory used by the buffer is bounded.
+        self._buffer = _SpanBuffer(batch_size * 10)
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+    @property
+    def dropped(self):
+        """The number of spans which were dropped."""
+        return self._buffer.dropped
+
+    def export(self, finished):
+        """Buffer the finished span until the next write."""
+        pending = self._buffer
+        with pending.lock:
+            if self._worker is None and not pending.closed:
+                self._worker = threading.Thread(target=self._run,
+                                                name="arestor-tracing")
+                self._worker.daemon = True
+                self._worker.start()
+            if len(pending.spans) >= pending.max_spans:
+                pending.dropped += 1
+                return
+            pending.spans.append(finished)
+            full = len(pending.spans) >= self._batch_size
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        """Write the buffered spans until the exporter is closed."""
+        while not self._buffer.closed:
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write all the buffered spans."""
+        with self._buffer.lock:
+            spans, self._buffer.spans = self._buffer.spans, []
+        if not spans:
+            return
+
+        while spans:
+            batch, spans = spans[:self._batch_size], spans[self._batch_size:]
+            line = json.dumps([finished.as_zipkin() for finished in batch])
+            try:
+                with self._write_lock:
+                    with open(self.path, "a") as file_handle:
+                        file_handle.write(line + "\n")
+            except (IOError, OSError) as exc:
+                LOG.warning("Failed to export %d spans: %s", len(batch), exc)
+
+    def close(self):
+        """Write the buffered spans and stop the background thread."""
+        with self._buffer.lock:
+            self._buffer.closed = True
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._wake.set()
+            worker.join()
+        self.flush()
+
+
+_STATE = {"exporter": None, "configured": False}
+_STATE_LOCK = threading.Lock()
+
+
+def exporter():
+    """Return the exporter of the spans, or None if tracing is disabled.
+
+    The exporter is created from the `tracing` options on the first call,
+    unless tracing was already enabled or disabled explicitly.
+    """
+    if not _STATE["configured"]:
+        with _STATE_LOCK:
+            if not _STATE["configured"]:
+                if CONFIG.tracing.enabled:
+                    _enable(CONFIG.tracing.path or os.path.join(
+                        CONFIG.log_dir or "", "arestor-trace.json"),
+                        CONFIG.tracing.batch_size,
+                        CONFIG.tracing.flush_interval)
+                _STATE["configured"] = True
+    return _STATE["exporter"]
+
+
+def _enable(path, batch_size, flush_interval):
+    """Create the exporter and write the spans when the process exits."""
+    _STATE["exporter"] = FileExporter(path, batch_size, flush_interval)
+    atexit.register(disable)
+
+
+def enable(path, batch_size=100, flush_interval=5.0):
+    """Record the spans and export them to the given file."""
+    disable()
+    with _STATE_LOCK:
+        _enable(path, batch_size, flush_interval)
+        _STATE["configured"] = True
+    return _STATE["exporter"]
+
+
+def disable():
+    """Write the buffered spans and stop recording new ones."""
+    with _STATE_LOCK:
+        span_exporter, _STATE["exporter"] = _STATE["exporter"], None
+        _STATE["configured"] = True
+    if span_exporter is not None:
+        span_exporter.close()
+        if span_exporter.dropped:
+            LOG.warning("%d spans were dropped.", span_exporter.dropped)
+
+
+def current():
+    """Return the active span of the current thread (or None)."""
+    return getattr(_CURRENT, "span", None)
+
+
+def start_span(name, service=SERVICE_CLIENT, kind=None, parent=None,
+               timestamp=None):
+    """Return a new span, child of `parent` (or a new trace).
+
+    The span is not made active, it has to be finished by the caller.
+    Returns None when tracing is disabled.
+    """
+    if exporter() is None:
+        return None
+    if parent is None:
+        return Span(name, service, kind=kind, timestamp=timestamp)
+    return Span(name, service, parent.trace_id, parent.span_id, kind,
+                timestamp)
+
+
+@contextlib.contextmanager
+def span(name, service=SERVICE_CLIENT, kind=None, tags=None):
+    """Trace the block as a child of the active span (or a new trace).
+
+    The new span is the active one until the block ends. When tracing
+    is disabled None is returned.
+    """
+    parent = current()
+    new_span = start_span(name, service, kind, parent)
+    if new_span is None:
+        yield None
+        return
+
+    new_span.tags.update(tags or {})
+    _CURRENT.span = new_span
+    try:
+        yield new_span
+    except Exception as exc:
+        new_span.tag("error", exc)
+        raise
+    finally:
+        _CURRENT.span = parent
+        new_span.finish()
+
+
+def traced(name):
+    """Trace the decorated function when it is part of a traced request."""
+    def _decorator(function):
+        """Wrap the function with a span."""
+        @functools.wraps(function)
+        def _wrapper(*args, **kwargs):
+            """Call the function in a child span of the active one."""
+            parent = current()
+            if parent is None:
+                return function(*args, **kwargs)
+            with span(name, parent.service):
+                return function(*args, **kwargs)
+        return _wrapper
+    return _decorator
+
+
+def add_span(name, duration, tags=None):
+    """Record an operation of the active span which already ended."""
+    parent = current()
+    if parent is None:
+        return
+    child = Span(name, parent.service, parent.trace_id, parent.span_id,
+                 timestamp=time.time() - duration)
+    child.tags.update(tags or {})
+    child.finish(duration)
+
+
+class RequestTracer(cherrypy.Tool):
+
+    """Record a span for every request, which continues the trace of the
+    client when the `traceparent` header is provided.
+    """
+
+    def __init__(self):
+        super(RequestTracer, self).__init__("on_start_resource",
+                                            self._start, priority=0)
+
+    def _setup(self):
+        """Hook the tool into the current request."""
+        super(RequestTracer, self)._setup()
+        cherrypy.request.hooks.attach("on_end_request", self._end)
+
+    @staticmethod
+    def _start():
+        """Start the span of the request."""
+        _CURRENT.span = None
+        if exporter() is None:
+            return
+
+        request, response = cherrypy.request, cherrypy.response
+        context = parse_traceparent(request.headers.get(TRACEPARENT))
+        trace_id = parent_id = None
+        if context is not None:
+            trace_id, parent_id, sampled = context
+            if not sampled:
+                return
+
+        # NOTE: The response is created when the request is received.
+        request_span = Span(
+            "%s %s/%s" % ((request.method, ) +
+                          arestor_timing.route(request)),
+            SERVICE_API, trace_id, parent_id, KIND_SERVER, response.time)
+        request_span.tag("http.method", request.method)
+        request_span.tag("http.path", request.path_info)
+        instance_id = request.headers.get("X-Arestor-Instance-ID")
+        if instance_id:
+            request_span.tag("arestor.instance_id", instance_id)
+        _CURRENT.span = request_span
+
+        dispatch = Span("dispatch", SERVICE_API, request_span.trace_id,
+                        request_span.span_id, timestamp=response.time)
+        dispatch.finish()
+
+    @staticmethod
+    def _end():
+        """Finish the span of the request."""
+        request_span = current()
+        _CURRENT.span = None
+        if request_span is None:
+            return
+
+        status = str(cherrypy.response.status or 200).split(" ", 1)[0]
+        request_span.tag("http.status_code", status)
+        if status.startswith("5"):
+            request_span.tag("error", cherrypy.response.status)
+        request_span.finish()
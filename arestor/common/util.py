@@ -26,7 +26,10 @@ from Crypto import Random
 from oslo_log import log as logging
 import redis
 
+from arestor.common import constant
 from arestor.common import exception
+from arestor.common import metrics
+from arestor.common import tracing as arestor_tracing
 from arestor import config as arestor_config
 
 CONFIG = arestor_config.CONFIG
@@ -57,6 +60,16 @@ def get_as_bytes(value):
             LOG.error("Couldn't encode: %r", value)
 
 
+def profile_id(name):
+    """Return the client id used in order to store the required profile.
+
+    The shared resources of a profile are set with a client created for
+    this client id, eg. ``ArestorClient(url, key, secret,
+    profile_id("web"), "openstack").set_ssh_pubkeys(keys)``.
+    """
+    return constant.PROFILE_PREFIX + name
+
+
 def get_attribute(root, attribute):
     """Search for the received attribute name in the object tree.
 
@@ -111,7 +124,7 @@ class AESCipher(object):
 
     def encrypt(self, message):
         """Encrypt the received message."""
-        message = self._padding(message, self._block_size)
+        message = get_as_bytes(self._padding(message, self._block_size))
         initialization_vector = Random.new().read(self._block_size)
         cipher = AES.new(self._key, AES.MODE_CBC, initialization_vector)
         return base64.b64encode(initialization_vector +
@@ -137,6 +150,103 @@ class AESCipher(object):
         return message[:-ord(message[len(message) - 1:])]
 
 
+def _payload_size(value):
+    """Return the approximate size of a value sent to the database."""
+    if value is None:
+        return 0
+    if isinstance(value, (six.text_type, six.binary_type)):
+        return len(get_as_bytes(value) or b"")
+    if isinstance(value, dict):
+        return sum(_payload_size(key) + _payload_size(item)
+                   for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(item) for item in value)
+    return len(str(value))
+
+
+class MeteredPipeline(object):
+
+    """Pipeline which accounts the round trips to the database."""
+
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+
+    def __getattr__(self, name):
+        return getattr(self._pipeline, name)
+
+    def __len__(self):
+        return len(self._pipeline)
+
+    def __enter__(self):
+        self._pipeline.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._pipeline.__exit__(exc_type, exc_value, traceback)
+
+    def execute(self, *args, **kwargs):
+        """Send all the buffered commands with a single round trip."""
+        commands = len(self._pipeline)
+        accounted = metrics.storage_account() is not None
+        sent = received = 0
+        if accounted:
+            sent = _payload_size([command[0] for command
+                                  in getattr(self._pipeline,
+                                             "command_stack", ())])
+        started = metrics.timer()
+        result = None
+        try:
+            result = self._pipeline.execute(*args, **kwargs)
+            return result
+        finally:
+            duration = metrics.timer() - started
+            if accounted:
+                received = _payload_size(result)
+            metrics.record_storage("pipeline", commands, duration,
+                                   sent, received)
+            arestor_tracing.add_span("redis pipeline", duration,
+                                     {"db.type": "redis",
+                                      "arestor.commands": commands})
+
+
+class MeteredRedis(object):
+
+    """Redis client which accounts the round trips to the database."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def _command(*args, **kwargs):
+            """Send the command and account the round trip."""
+            started = metrics.timer()
+            result = None
+            try:
+                result = attribute(*args, **kwargs)
+                return result
+            finally:
+                duration = metrics.timer() - started
+                if metrics.storage_account() is None:
+                    metrics.record_storage("command", 1, duration)
+                else:
+                    metrics.record_storage(
+                        "command", 1, duration,
+                        _payload_size((name, ) + args) +
+                        _payload_size(kwargs),
+                        _payload_size(result))
+                arestor_tracing.add_span("redis %s" % name, duration,
+                                         {"db.type": "redis"})
+        return _command
+
+    def pipeline(self, *args, **kwargs):
+        """Return a new pipeline for the current client."""
+        return MeteredPipeline(self._client.pipeline(*args, **kwargs))
+
+
 class RedisConnection(object):
 
     """High level wrapper over the redis data structures operations."""
@@ -149,10 +259,25 @@ class RedisConnection(object):
         self._db = CONFIG.redis.database
         self.refresh()
 
+    @staticmethod
+    def metered():
+        """Whether the round trips to the database have to be accounted.
+
+        The client is wrapped only when the metrics, the storage debug
+        headers, the slow request log or the tracing are enabled,
+        otherwise every command would pay for the accounting without
+        anyone reading it.
+        """
+        return bool(CONFIG.api.metrics or CONFIG.api.debug_storage or
+                    CONFIG.api.slow_request_threshold > 0 or
+                    arestor_tracing.exporter() is not None)
+
     def _connect(self):
         """Try establishing a connection until succeeds."""
         try:
             rcon = redis.StrictRedis(self._host, self._port, self._db)
+            if self.metered():
+                rcon = MeteredRedis(rcon)
             # Return the connection only if is valid and reachable
             if not rcon.ping():
                 return None
@@ -181,5 +306,9 @@ class RedisConnection(object):
     @property
     def rcon(self):
         """Return a Redis connection."""
-        self.refresh()
+        # NOTE: The client reconnects on its own if a connection from its
+        # pool was dropped, checking the connection with a `PING` before
+        # every use would double the number of round trips.
+        if self._rcon is None:
+            self.refresh()
         return self._rcon
@@ -40,6 +40,63 @@ class ArestorAPIOptions(conf_base.Options):
                 "thread_pool", default=3, required=True,
                 help="The number of thread workers used in order "
                      "to serve clients."),
+            cfg.BoolOpt(
+                "source_ip_lookup", default=False,
+                help="Identify the instance by the source address of the "
+                     "request when the URL does not contain it."),
+            cfg.BoolOpt(
+                "metrics", default=True,
+                help="Collect the request and storage metrics and expose "
+                     "them on the /metrics endpoint."),
+            cfg.BoolOpt(
+                "debug_storage", default=False,
+                help="Report the storage calls made by every request in "
+                     "the X-Arestor-Storage-Calls and "
+                     "X-Arestor-Storage-Time headers (development "
+                     "only)."),
+            cfg.IntOpt(
+                "profiler_max_duration", default=60, min=1,
+                help="The maximum number of seconds a profiling session "
+                     "started through the admin API can run."),
+            cfg.FloatOpt(
+                "profiler_interval", default=0.01, min=0.001,
+                help="The default number of seconds between two samples "
+                     "taken by the sampling profiler."),
+            cfg.IntOpt(
+                "memory_max_duration", default=600, min=1,
+                help="The maximum number of seconds the allocations are "
+                     "traced by a diagnostic session started through the "
+                     "admin API."),
+            cfg.IntOpt(
+                "memory_max_snapshots", default=10, min=1,
+                help="The maximum number of allocation snapshots kept in "
+                     "memory."),
+            cfg.FloatOpt(
+                "slow_request_threshold", default=1.0, min=0,
+                help="Log the requests which take longer than the given "
+                     "number of seconds, with the time spent in every "
+                     "phase (0 disables the log)."),
+            cfg.BoolOpt(
+                "timeline", default=False,
+                help="Record the last metadata requests of every instance "
+                     "(the boot timeline), available through the admin "
+                     "API."),
+            cfg.IntOpt(
+                "timeline_size", default=64, min=1,
+                help="The number of requests kept in the boot timeline of "
+                     "every instance."),
+            cfg.IntOpt(
+                "timeline_max_instances", default=10000, min=1,
+                help="The maximum number of instances whose boot timeline "
+                     "is kept in memory."),
+            cfg.IntOpt(
+                "fleet_chunk_size", default=500, min=1,
+                help="The number of instances written to the database "
+                     "with a single round trip when a fleet is created."),
+            cfg.IntOpt(
+                "fleet_max_size", default=100000, min=1,
+                help="The maximum number of instances created with a "
+                     "single fleet request."),
         ]
 
     def register(self):
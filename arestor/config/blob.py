@@ -0,0 +1,51 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for the blob store."""
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class BlobOptions(conf_base.Options):
+
+    """Config options available for the blob store."""
+
+    def __init__(self, config):
+        super(BlobOptions, self).__init__(config, group="blob")
+        self._options = [
+            cfg.BoolOpt(
+                "enabled", default=True,
+                help="Store the large values only once, in the "
+                     "content-addressed blob store."),
+            cfg.IntOpt(
+                "min_size", default=1024, min=0,
+                help="The size (in bytes) starting from which a value is "
+                     "moved in the blob store."),
+            cfg.IntOpt(
+                "cache_size", default=512, min=0,
+                help="The maximum number of blobs kept in memory by "
+                     "every API process."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Blob Store Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
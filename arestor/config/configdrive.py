@@ -0,0 +1,61 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for the config drive images."""
+
+import os
+import tempfile
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class ConfigDriveOptions(conf_base.Options):
+
+    """Config options available for the config drive images."""
+
+    def __init__(self, config):
+        super(ConfigDriveOptions, self).__init__(config, group="configdrive")
+        self._options = [
+            cfg.StrOpt(
+                "cache_dir",
+                default=os.path.join(tempfile.gettempdir(),
+                                     "arestor-configdrive"),
+                help="The directory where the config drive images are "
+                     "cached."),
+            cfg.StrOpt(
+                "mkisofs_cmd", default="genisoimage",
+                help="The command used in order to build the ISO9660 "
+                     "images. The config drive endpoint requires "
+                     "genisoimage (or a compatible mkisofs) to be "
+                     "installed."),
+            cfg.IntOpt(
+                "workers", default=2, min=1,
+                help="The number of images built at the same time."),
+            cfg.IntOpt(
+                "build_timeout", default=30, min=0,
+                help="The number of seconds a request waits for an image "
+                     "before it is told to retry later."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Config Drive Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
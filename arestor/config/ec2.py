@@ -0,0 +1,47 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for the EC2 metadata provider."""
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class EC2Options(conf_base.Options):
+
+    """Config options available for the EC2 metadata provider."""
+
+    def __init__(self, config):
+        super(EC2Options, self).__init__(config, group="ec2")
+        self._options = [
+            cfg.BoolOpt(
+                "token_required", default=False,
+                help="Reject the metadata requests which do not provide "
+                     "a session token (IMDSv2 only)."),
+            cfg.IntOpt(
+                "max_tokens", default=100000, min=1,
+                help="The maximum number of session tokens kept in "
+                     "memory, the oldest ones are dropped first."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='EC2 Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
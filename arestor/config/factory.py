@@ -14,8 +14,15 @@
 
 _OPT_PATHS = (
     'arestor.config.api.ArestorAPIOptions',
+    'arestor.config.blob.BlobOptions',
+    'arestor.config.configdrive.ConfigDriveOptions',
     'arestor.config.default.ArestorOptions',
+    'arestor.config.ec2.EC2Options',
+    'arestor.config.log.AsyncLogOptions',
+    'arestor.config.profile.ProfileOptions',
     'arestor.config.redis.RedisOptions',
+    'arestor.config.template.TemplateOptions',
+    'arestor.config.tracing.TracingOptions',
 )
 
 
@@ -0,0 +1,56 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for the asynchronous logging."""
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class AsyncLogOptions(conf_base.Options):
+
+    """Config options available for the asynchronous logging."""
+
+    def __init__(self, config):
+        super(AsyncLogOptions, self).__init__(config, group="async_log")
+        self._options = [
+            cfg.BoolOpt(
+                "enabled", default=False,
+                help="Queue the log records in memory and write them "
+                     "from a background thread, the threads which serve "
+                     "the requests never wait for the log handlers."),
+            cfg.IntOpt(
+                "queue_size", default=10000, min=1,
+                help="The maximum number of log records waiting to be "
+                     "written."),
+            cfg.IntOpt(
+                "batch_size", default=256, min=1,
+                help="The maximum number of log records written at once."),
+            cfg.StrOpt(
+                "drop_policy", default="newest",
+                choices=["newest", "oldest"],
+                help="Which records are dropped when the queue is full: "
+                     "the new ones or the oldest queued ones."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Async Log Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
@@ -0,0 +1,49 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for instance profiles."""
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class ProfileOptions(conf_base.Options):
+
+    """Config options available for instance profiles."""
+
+    def __init__(self, config):
+        super(ProfileOptions, self).__init__(config, group="profile")
+        self._options = [
+            cfg.IntOpt(
+                "cache_size", default=256, min=0,
+                help="The maximum number of profiles kept in memory by "
+                     "every API process."),
+            cfg.IntOpt(
+                "cache_ttl", default=10, min=0,
+                help="The number of seconds a cached profile is used "
+                     "before it is retrieved again from the database. The "
+                     "profiles updated through the current process are "
+                     "dropped from its cache right away."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Profile Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
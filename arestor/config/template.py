@@ -0,0 +1,53 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for user_data templates."""
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class TemplateOptions(conf_base.Options):
+
+    """Config options available for user_data templates."""
+
+    def __init__(self, config):
+        super(TemplateOptions, self).__init__(config, group="template")
+        self._options = [
+            cfg.IntOpt(
+                "compiled_cache_size", default=128, min=0,
+                help="The maximum number of compiled templates kept in "
+                     "memory by every API process."),
+            cfg.IntOpt(
+                "rendered_cache_size", default=4096, min=0,
+                help="The maximum number of rendered user_data documents "
+                     "kept in memory by every API process (one for every "
+                     "instance)."),
+            cfg.FloatOpt(
+                "cache_ttl", default=1.0, min=0,
+                help="The number of seconds a template is used by an API "
+                     "process before it checks the database for a newer "
+                     "version (0 checks it for every request)."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Template Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
@@ -0,0 +1,56 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Config options available for the tracing of the requests."""
+
+from oslo_config import cfg
+
+from arestor.config import base as conf_base
+
+
+class TracingOptions(conf_base.Options):
+
+    """Config options available for the tracing of the requests."""
+
+    def __init__(self, config):
+        super(TracingOptions, self).__init__(config, group="tracing")
+        self._options = [
+            cfg.BoolOpt(
+                "enabled", default=False,
+                help="Record the spans of the requests served by the API "
+                     "and of the requests sent by the clients."),
+            cfg.StrOpt(
+                "path", default=None,
+                help="The file where the spans are exported, in the "
+                     "Zipkin v2 JSON format (one batch of spans on every "
+                     "line). By default `arestor-trace.json` from the "
+                     "`log_dir` is used."),
+            cfg.IntOpt(
+                "batch_size", default=100, min=1,
+                help="The number of spans written to the file at once."),
+            cfg.FloatOpt(
+                "flush_interval", default=5.0, min=0.1,
+                help="The maximum number of seconds a span waits before "
+                     "it is written to the file."),
+        ]
+
+    def register(self):
+        """Register the current options to the global ConfigOpts object."""
+        group = cfg.OptGroup(self.group_name, title='Tracing Options')
+        self._config.register_group(group)
+        self._config.register_opts(self._options, group=group)
+
+    def list(self):
+        """Return a list which contains all the available options."""
+        return self._options
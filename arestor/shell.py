@@ -21,6 +21,7 @@ from oslo_log import log as logging
 
 from arestor.cli import base as cli_base
 from arestor.cli import commands as cli_commands
+from arestor.common import constant
 from arestor import config
 
 CONFIG = config.CONFIG
@@ -33,6 +34,7 @@ class ArestorCli(cli_base.Application):
     commands = [
         (cli_commands.Server, "commands"),
         (cli_commands.User, "commands"),
+        (cli_commands.Bench, "commands"),
     ]
 
     def setup(self):
@@ -53,4 +55,4 @@ def main():
     logging.setup(CONFIG, "arestor")
     arestor = ArestorCli(sys.argv[1:])
     arestor.run()
-    return arestor.result
+    return 1 if arestor.status == constant.TASK_FAILED else 0
@@ -0,0 +1,36 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Unit tests for Arestor.
+
+The API modules connect to Redis when they are imported, the tests use
+an in-memory server (fakeredis) instead.
+"""
+
+import fakeredis
+import redis
+
+SERVER = fakeredis.FakeServer()
+
+
+class FakeStrictRedis(fakeredis.FakeStrictRedis):
+
+    """Redis client connected to the in-memory server of the tests."""
+
+    def __init__(self, host=None, port=None, db=0, **kwargs):
+        kwargs["server"] = SERVER
+        super(FakeStrictRedis, self).__init__(db=db, **kwargs)
+
+
+redis.StrictRedis = FakeStrictRedis
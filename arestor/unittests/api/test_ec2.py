@@ -0,0 +1,111 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import unittest
+
+from arestor import api as arestor_api
+from arestor.api.v1 import ec2
+from arestor import config as arestor_config
+from arestor.common import constant
+from arestor.common import util as arestor_util
+from arestor.unittests import base
+
+CONFIG = arestor_config.CONFIG
+
+CLIENT_ID = "instance-ec2"
+HOSTNAME = "/v1/ec2/%s/latest/meta-data/hostname"
+
+
+class TestTokenTable(unittest.TestCase):
+
+    def test_validate(self):
+        tokens = ec2.TokenTable(10)
+        token = tokens.issue(CLIENT_ID, 60)
+        self.assertTrue(tokens.validate(CLIENT_ID, token))
+        self.assertFalse(tokens.validate("instance-other", token))
+        self.assertFalse(tokens.validate(CLIENT_ID, "missing"))
+
+    def test_expired(self):
+        tokens = ec2.TokenTable(10)
+        token = tokens.issue(CLIENT_ID, -1)
+        self.assertFalse(tokens.validate(CLIENT_ID, token))
+        self.assertEqual(0, len(tokens))
+
+    def test_max_tokens(self):
+        tokens = ec2.TokenTable(2)
+        first = tokens.issue(CLIENT_ID, 60)
+        second = tokens.issue(CLIENT_ID, 60)
+        third = tokens.issue(CLIENT_ID, 60)
+        self.assertEqual(2, len(tokens))
+        self.assertFalse(tokens.validate(CLIENT_ID, first))
+        self.assertTrue(tokens.validate(CLIENT_ID, second))
+        self.assertTrue(tokens.validate(CLIENT_ID, third))
+
+    def test_max_tokens_expired(self):
+        tokens = ec2.TokenTable(2)
+        expired = tokens.issue(CLIENT_ID, -1)
+        valid = tokens.issue(CLIENT_ID, 60)
+        tokens.issue(CLIENT_ID, 60)
+        self.assertTrue(tokens.validate(CLIENT_ID, valid))
+        self.assertFalse(tokens.validate(CLIENT_ID, expired))
+
+
+class TestSessionTokens(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+        self.connection.hset(constant.KEY_FORMAT.format(
+            namespace=ec2.EC2Provider.namespace, user=CLIENT_ID,
+            name="hostname"), "data", json.dumps("host"))
+        config = dict((path, options)
+                      for path, options in arestor_api.Root.config().items()
+                      if path != "global")
+        self.application = base.application(arestor_api.Root(), config)
+
+    def _token(self, ttl="60", client_id=CLIENT_ID):
+        """Request a new session token."""
+        return base.request(
+            self.application, "/v1/ec2/%s/latest/api/token" % client_id,
+            "PUT", headers={ec2.TOKEN_TTL_HEADER: ttl})
+
+    def _hostname(self, token=None):
+        """Retrieve the hostname with the session token (if any)."""
+        headers = {ec2.TOKEN_HEADER: token} if token is not None else {}
+        return base.request(self.application, HOSTNAME % CLIENT_ID,
+                            headers=headers)
+
+    def test_token(self):
+        status, token = self._token()
+        self.assertEqual(200, status)
+        self.assertEqual((200, "host"), self._hostname(token))
+
+    def test_invalid_ttl(self):
+        for ttl in ("0", "-1", "abc", str(ec2.MAX_TOKEN_TTL + 1)):
+            self.assertEqual(400, self._token(ttl)[0])
+
+    def test_invalid_token(self):
+        _, token = self._token(client_id="instance-other")
+        self.assertEqual(401, self._hostname("invalid")[0])
+        self.assertEqual(401, self._hostname(token)[0])
+
+    def test_missing_token(self):
+        self.assertEqual((200, "host"), self._hostname())
+
+        CONFIG.set_override("token_required", True, "ec2")
+        self.addCleanup(CONFIG.clear_override, "token_required", "ec2")
+        self.assertEqual(401, self._hostname()[0])
+        _, token = self._token()
+        self.assertEqual((200, "host"), self._hostname(token))
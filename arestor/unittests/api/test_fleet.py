@@ -0,0 +1,150 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import unittest
+
+from arestor import api as arestor_api
+from arestor.api.admin import fleet as fleet_api
+from arestor.api.v1 import packet
+from arestor.client import resource as resource_client
+from arestor import config as arestor_config
+from arestor.common import constant
+from arestor.common import exception
+from arestor.common import profile
+from arestor.common import util as arestor_util
+from arestor.unittests import base
+
+CONFIG = arestor_config.CONFIG
+
+API_KEY = "fleet-api-key"
+SECRET = "fleet-secret"
+
+
+def _key(client_id, name, namespace="packet"):
+    return constant.KEY_FORMAT.format(namespace=namespace, user=client_id,
+                                      name=name)
+
+
+class _Client(base.WSGIClientMixin, resource_client.ResourceClient):
+
+    """Resource client which talks to the application without a server."""
+
+
+class TestFleet(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+
+    def _fleet(self, **description):
+        description.setdefault("namespace", "packet")
+        description.setdefault("count", 3)
+        return fleet_api.Fleet(description)
+
+    def test_generators(self):
+        fleet = self._fleet(
+            prefix="web-", resources={"public_keys": ["key"]},
+            generators={
+                "uuid": {"type": "uuid"},
+                "hostname": {"type": "format",
+                             "format": "{client_id}.{index}", "start": 1},
+                "launch_index": {"type": "index", "start": 10},
+            })
+        self.assertEqual(["web-0", "web-1", "web-2"], fleet.client_ids)
+
+        values, serialized = fleet.instance(2, "web-2")
+        self.assertEqual(["key"], values["public_keys"])
+        self.assertEqual("web-2.3", values["hostname"])
+        self.assertEqual(12, values["launch_index"])
+        self.assertEqual(36, len(values["uuid"]))
+        self.assertEqual(json.dumps(["key"]), serialized["public_keys"])
+
+    def test_invalid(self):
+        for description in (
+                [], {"count": 1},
+                {"namespace": "packet"},
+                {"namespace": "packet", "count": 1, "resources": ["key"]},
+                {"namespace": "packet", "count": 1, "generators": ["uuid"]},
+                {"namespace": "packet", "count": 1,
+                 "generators": {"uuid": {"type": "missing"}}},
+                {"namespace": "packet", "count": 1,
+                 "generators": {"hostname": {"type": "format",
+                                             "format": "{foo}"}}},
+                {"namespace": "packet", "count": 1,
+                 "generators": {"hostname": {"type": "format",
+                                             "format": "{0}"}}}):
+            self.assertRaises((ValueError, KeyError), fleet_api.Fleet,
+                              description)
+
+    def test_max_size(self):
+        CONFIG.set_override("fleet_max_size", 2, "api")
+        self.addCleanup(CONFIG.clear_override, "fleet_max_size", "api")
+        self.assertRaises(ValueError, self._fleet)
+
+    def test_write(self):
+        fleet = self._fleet(resources={"public_keys": ["key"]},
+                            generators={"hostname": {"type": "index"}})
+        fleet.write(self.connection, 1, ["instance-1", "instance-2"])
+        self.assertEqual(b"2", self.connection.hget(
+            _key("instance-2", "hostname"), "data"))
+        self.assertEqual(b"key", self.connection.hget(
+            _key("instance-1", packet.SSH_KEYS), "key-0"))
+        self.assertFalse(self.connection.exists(_key("instance-0",
+                                                     "hostname")))
+
+    def test_write_profile(self):
+        profile.CACHE.set(("packet", "web"), "stale")
+        fleet = self._fleet(ids=[arestor_util.profile_id("web")],
+                            resources={"hostname": "web"})
+        fleet.write(self.connection, 0, fleet.client_ids)
+        self.assertIsNone(profile.CACHE.get(("packet", "web")))
+
+
+class TestFleetEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+        self.connection.hset("user.secret", API_KEY, SECRET)
+        CONFIG.set_override("fleet_chunk_size", 2, "api")
+        self.addCleanup(CONFIG.clear_override, "fleet_chunk_size", "api")
+
+        config = dict((path, options)
+                      for path, options in arestor_api.Root.config().items()
+                      if path != "global")
+        self.client = _Client("http://localhost/", API_KEY, SECRET)
+        self.client.application = base.application(arestor_api.Root(),
+                                                   config)
+
+    def test_create_fleet(self):
+        chunks = []
+        created = self.client.create_fleet(
+            "packet", {"public_keys": ["key"]}, count=5, prefix="web-",
+            generators={"hostname": {"type": "format",
+                                     "format": "web-{index}"}},
+            callback=chunks.append)
+        self.assertEqual(["web-%d" % index for index in range(5)], created)
+        self.assertEqual([2, 2, 1], [len(chunk) for chunk in chunks])
+        self.assertEqual(b'"web-4"', self.connection.hget(
+            _key("web-4", "hostname"), "data"))
+
+    def test_create_fleet_invalid(self):
+        self.assertRaises(
+            exception.ClientError, self.client.create_fleet, "packet",
+            {}, count=3,
+            generators={"hostname": {"type": "format", "format": "{foo}"}})
+        self.assertRaises(exception.ClientError, self.client.create_fleet,
+                          "packet", ["key"], count=3)
+        self.assertEqual([], self.connection.keys("packet/*"))
@@ -0,0 +1,63 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import base64
+import json
+import unittest
+
+from arestor import api as arestor_api
+from arestor.api.v1 import openstack
+from arestor.common import constant
+from arestor.common import util as arestor_util
+from arestor.unittests import base
+
+CLIENT_ID = "instance-openstack"
+FILES = {
+    "/etc/hosts": base64.b64encode(b"hosts").decode(),
+    "/etc/motd": base64.b64encode(b"motd").decode(),
+}
+
+
+class TestOpenStackContent(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+        self.addCleanup(self.connection.flushdb)
+        config = dict((path, options)
+                      for path, options in arestor_api.Root.config().items()
+                      if path != "global")
+        self.application = base.application(arestor_api.Root(), config)
+
+    def _get(self, path, client_id=CLIENT_ID):
+        """Serve the request for the received OpenStack resource."""
+        return base.request(self.application, "/v1/openstack/%s/%s" % (
+            client_id, path))
+
+    def test_content(self):
+        # NOTE: The content is built on read from the injected files.
+        key = constant.KEY_FORMAT.format(
+            namespace=openstack.OpenStackProvider.namespace,
+            user=CLIENT_ID, name="files")
+        self.connection.hset(key, "data", json.dumps(FILES))
+
+        self.assertEqual((200, "0000\n0001"), self._get("openstack/content"))
+        self.assertEqual((200, "hosts"),
+                         self._get("openstack/content/0000"))
+        self.assertEqual((200, "motd"), self._get("openstack/content/0001"))
+        self.assertEqual(404, self._get("openstack/content/0002")[0])
+
+    def test_content_missing(self):
+        self.assertEqual((200, ""), self._get("openstack/content",
+                                              "instance-missing"))
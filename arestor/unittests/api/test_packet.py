@@ -0,0 +1,107 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import unittest
+
+from arestor import api as arestor_api
+from arestor.api.v1 import packet
+from arestor import config as arestor_config
+from arestor.common import constant
+from arestor.common import network
+from arestor.common import util as arestor_util
+from arestor.unittests import base
+
+CONFIG = arestor_config.CONFIG
+
+CLIENT_ID = "instance-packet"
+
+
+class TestPacketMetadata(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+        self.addCleanup(self.connection.flushdb)
+        network.INDEX.reload()
+        self.addCleanup(network.INDEX.reload)
+        for name, value in (("uuid", "uuid"), ("hostname", "host"),
+                            ("public_keys", ["key"])):
+            key = constant.KEY_FORMAT.format(
+                namespace=packet.PacketProvider.namespace, user=CLIENT_ID,
+                name=name)
+            self.connection.hset(key, "data", json.dumps(value))
+        config = dict((path, options)
+                      for path, options in arestor_api.Root.config().items()
+                      if path != "global")
+        self.application = base.application(arestor_api.Root(), config)
+
+    def _get(self, path, remote="127.0.0.1"):
+        """Serve the request and return the status and the JSON body."""
+        status, body = base.request(self.application, path, remote=remote)
+        return status, json.loads(body)
+
+    def test_metadata(self):
+        status, body = self._get("/v1/packet/%s/metadata" % CLIENT_ID)
+        self.assertEqual(200, status)
+        self.assertEqual(
+            "http://localhost/v1/packet/%s/%s" % (
+                CLIENT_ID, packet.FAKE_PHONE_HOME_URL),
+            body["phone_home_url"])
+
+    def test_metadata_source_address(self):
+        CONFIG.set_override("source_ip_lookup", True, group="api")
+        self.addCleanup(CONFIG.clear_override, "source_ip_lookup",
+                        group="api")
+        network.INDEX.add(self.connection, "10.0.0.0/24", CLIENT_ID)
+
+        status, body = self._get("/v1/packet/metadata", remote="10.0.0.5")
+        self.assertEqual(200, status)
+        self.assertEqual("host", body["hostname"])
+        self.assertEqual(
+            "http://localhost/v1/packet/%s" % packet.FAKE_PHONE_HOME_URL,
+            body["phone_home_url"])
+
+    def test_ssh_keys_built_on_read(self):
+        # NOTE: The instance was stored without the derived resource.
+        key = constant.KEY_FORMAT.format(
+            namespace=packet.PacketProvider.namespace, user=CLIENT_ID,
+            name=packet.SSH_KEYS)
+        self.assertFalse(self.connection.exists(key))
+
+        for path, expected in (("metadata/ssh_keys", "1"),
+                               ("metadata/ssh_keys/0", "key")):
+            status, body = base.request(
+                self.application, "/v1/packet/%s/%s" % (CLIENT_ID, path))
+            self.assertEqual((200, expected), (status, body))
+        self.assertEqual({b"count": b"1", b"key-0": b"key"},
+                         self.connection.hgetall(key))
+
+    def test_ssh_keys_missing_instance(self):
+        status, body = base.request(
+            self.application, "/v1/packet/instance-missing/metadata/ssh_keys")
+        self.assertEqual((200, "0"), (status, body))
+        self.assertEqual([], self.connection.keys("*instance-missing*"))
+
+    def test_phone_home(self):
+        path = "/v1/packet/%s/%s" % (CLIENT_ID, packet.FAKE_PHONE_HOME_URL)
+        for body in (b"{", b"[]", b'"password"'):
+            status, _ = base.request(self.application, path, "POST", body)
+            self.assertEqual(400, status)
+
+        status, _ = base.request(self.application, path, "POST",
+                                 b'{"password": "secret"}')
+        self.assertEqual(200, status)
+        self.assertEqual((200, "secret"),
+                         base.request(self.application, path + "/password"))
@@ -0,0 +1,162 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import unittest
+
+import cherrypy
+
+from arestor.api import schema
+from arestor.common import constant
+from arestor.common import util as arestor_util
+from arestor.unittests import base
+
+CLIENT_ID = "instance-schema"
+
+
+def _render_key(data, key_id):
+    """Return the public key with the required index."""
+    try:
+        return data["keys"][int(key_id)]
+    except (IndexError, ValueError):
+        raise cherrypy.NotFound()
+
+
+def _parse_hostname(body):
+    """Store the hostname received in the request body."""
+    return {"hostname": body}
+
+
+class ExampleProvider(schema.Provider):
+
+    namespace = "example"
+    directory_suffix = "/"
+    endpoints = [
+        schema.Endpoint("latest/hostname", fields=["hostname"],
+                        methods={"POST": schema.store(_parse_hostname)}),
+        schema.Endpoint("latest/meta-data.json",
+                        fields=["hostname", "uuid"]),
+        schema.Endpoint("latest/keys", fields=[
+            schema.Field("public_keys", alias="keys")],
+            render=lambda data: "\n".join(
+                str(index) for index in range(len(data["keys"] or ())))),
+        schema.Endpoint("latest/keys/{key_id}", fields=[
+            schema.Field("public_keys", alias="keys")], render=_render_key),
+        schema.Endpoint("latest/raw", fields=[
+            schema.Field("raw", decode=False)], content_type="text/plain"),
+    ]
+    derived = [
+        schema.Derived("upper_hostname", ["hostname"],
+                       lambda data: (data["hostname"] or "").upper()),
+    ]
+
+
+class _Root(object):
+
+    """Serve the compiled provider under the instance segment."""
+
+    exposed = True
+
+    def __init__(self):
+        self.example = ExampleProvider.compile()(self)
+
+
+class TestProviderCompile(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+        self.addCleanup(self.connection.flushdb)
+        for name, value in (("hostname", "host"), ("uuid", "uuid"),
+                            ("public_keys", ["key-0", "key-1"]),
+                            ("raw", "raw value")):
+            key = constant.KEY_FORMAT.format(
+                namespace=ExampleProvider.namespace, user=CLIENT_ID,
+                name=name)
+            self.connection.hset(key, "data", json.dumps(value)
+                                 if name != "raw" else value)
+        self.application = base.application(_Root())
+
+    def _request(self, path, method="GET", body=b""):
+        """Serve the request for a path of the example provider."""
+        return base.request(self.application,
+                            "/example/%s/%s" % (CLIENT_ID, path),
+                            method=method, body=body)
+
+    def test_tree(self):
+        node_class = ExampleProvider.compile()
+        self.assertEqual(["latest"],
+                         [segment for segment, _ in node_class.children])
+        latest = dict(node_class.children)["latest"]
+        self.assertEqual(["hostname", "meta-data.json", "keys", "raw"],
+                         [segment for segment, _ in latest.children])
+        self.assertEqual("hostname\nmeta-data.json\nkeys/\nraw",
+                         latest.listing)
+        self.assertEqual(set(["GET", "POST"]),
+                         set(dict(latest.children)["hostname"].handlers))
+        self.assertEqual(set([0, 1]), set(
+            dict(latest.children)["keys"].handlers["GET"]))
+
+    def test_derived_once(self):
+        ExampleProvider.compile()
+        ExampleProvider.compile()
+        self.assertEqual(
+            ExampleProvider.derived,
+            schema.derived_resources(ExampleProvider.namespace,
+                                     ["hostname"]))
+
+    def test_attribute_name(self):
+        self.assertEqual("meta_data_json",
+                         schema.attribute_name("meta-data.json"))
+
+    def test_listing(self):
+        self.assertEqual((200, "latest/"), self._request(""))
+        self.assertEqual(
+            (200, "hostname\nmeta-data.json\nkeys/\nraw"),
+            self._request("latest"))
+
+    def test_single_field(self):
+        self.assertEqual((200, "host"), self._request("latest/hostname"))
+
+    def test_several_fields(self):
+        status, body = self._request("latest/meta-data.json")
+        self.assertEqual(200, status)
+        self.assertEqual({"hostname": "host", "uuid": "uuid"},
+                         json.loads(body))
+
+    def test_arguments(self):
+        self.assertEqual((200, "0\n1"), self._request("latest/keys"))
+        self.assertEqual((200, "key-1"), self._request("latest/keys/1"))
+        self.assertEqual(404, self._request("latest/keys/2")[0])
+        self.assertEqual(404, self._request("latest/keys/1/2")[0])
+
+    def test_raw_field(self):
+        self.assertEqual((200, "raw value"), self._request("latest/raw"))
+
+    def test_missing_route(self):
+        self.assertEqual(404, self._request("latest/missing")[0])
+        self.assertEqual(404, self._request("missing")[0])
+
+    def test_method_not_allowed(self):
+        self.assertEqual(405, self._request("latest/raw", "POST")[0])
+
+    def test_store(self):
+        status, _ = self._request("latest/hostname", "POST", b"new-host")
+        self.assertEqual(200, status)
+        self.assertEqual((200, "new-host"),
+                         self._request("latest/hostname"))
+        self.assertEqual(b"NEW-HOST", self.connection.hget(
+            constant.KEY_FORMAT.format(namespace=ExampleProvider.namespace,
+                                       user=CLIENT_ID,
+                                       name="upper_hostname"), "data"))
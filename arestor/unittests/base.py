@@ -0,0 +1,112 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Helpers shared by the unit tests."""
+
+import io
+
+import cherrypy
+from requests import adapters
+from requests import compat as url_parse
+from requests import models
+
+from arestor.api import base as api_base
+
+
+def application(root, config=None):
+    """Return a CherryPy application which serves the root object."""
+    config = config or {"/": {"request.dispatch": api_base.MethodDispatcher()}}
+    app = cherrypy.Application(root, "", config)
+    app.log.screen = False
+    return app
+
+
+def request(app, path, method="GET", body=b"", remote="127.0.0.1",
+            headers=None):
+    """Serve a request with the application.
+
+    The path can contain the query string.
+
+    :returns: the (status code, body) tuple of the response
+    """
+    status = []
+    path, _, query = path.partition("?")
+    environ = {
+        "REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost", "SERVER_PROTOCOL": "HTTP/1.1",
+        "REMOTE_ADDR": remote, "CONTENT_LENGTH": str(len(body)),
+        "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(), "wsgi.multithread": False,
+        "wsgi.multiprocess": False,
+    }
+    for name, value in (headers or {}).items():
+        name = name.upper().replace("-", "_")
+        if name == "CONTENT_TYPE":
+            environ[name] = value
+        elif name != "CONTENT_LENGTH":
+            environ["HTTP_" + name] = value
+
+    response = app(environ,
+                   lambda code, headers, *args: status.append(code))
+    try:
+        content = b"".join(response)
+    finally:
+        # NOTE: The `on_end_request` hooks run when the response is closed.
+        response.close()
+    return int(status[0].split(" ", 1)[0]), content.decode()
+
+
+class WSGIAdapter(adapters.BaseAdapter):
+
+    """Send the requests of a client to a WSGI application."""
+
+    def __init__(self, app):
+        super(WSGIAdapter, self).__init__()
+        self.application = app
+
+    def send(self, prepared, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        """Serve the request with the application."""
+        # pylint: disable=unused-argument
+        url = url_parse.urlparse(prepared.url)
+        body = prepared.body or b""
+        if not isinstance(body, bytes):
+            body = body.encode()
+        status, content = request(
+            self.application,
+            url.path + ("?" + url.query if url.query else ""),
+            prepared.method, body, headers=dict(prepared.headers))
+        response = models.Response()
+        response.status_code = status
+        response.raw = io.BytesIO(content.encode())
+        response.request = prepared
+        response.url = prepared.url
+        return response
+
+    def close(self):
+        """Nothing to release."""
+
+
+class WSGIClientMixin(object):
+
+    """Send the requests of an Arestor client to the `application`."""
+
+    application = None
+
+    def _create_session(self):
+        """Mount the application instead of the HTTP adapters."""
+        session = super(WSGIClientMixin, self)._create_session()
+        session.mount("http://", WSGIAdapter(self.application))
+        return session
@@ -0,0 +1,82 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import unittest
+
+from arestor.client import arestor_client
+
+
+class _Client(arestor_client.ArestorClient):
+
+    """Client which records the requests instead of sending them."""
+
+    def __init__(self):
+        super(_Client, self).__init__("http://localhost", "key", "secret",
+                                      "instance-1", "openstack")
+        self.sent = []
+
+    def create_resource(self, resource):
+        self.sent.append([resource])
+
+    def create_resources(self, resources):
+        self.sent.append(resources)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.client = _Client()
+
+    def test_batch(self):
+        with self.client.batch():
+            with self.client.batch():
+                self.client.set_hostname("first")
+                self.client.set_uuid("uuid")
+            self.assertEqual([], self.client.sent)
+            self.client.set_hostname("second")
+
+        self.assertEqual(1, len(self.client.sent))
+        self.assertEqual([("uuid", "uuid"), ("hostname", "second")],
+                         [(resource["resource"], json.loads(resource["data"]))
+                          for resource in self.client.sent[0]])
+
+        self.client.set_hostname("third")
+        self.assertEqual(2, len(self.client.sent))
+
+    def test_batch_discarded(self):
+        def _fail():
+            with self.client.batch():
+                self.client.set_hostname("host")
+                raise KeyboardInterrupt()
+
+        self.assertRaises(KeyboardInterrupt, _fail)
+        self.assertEqual([], self.client.sent)
+
+        self.client.set_hostname("host")
+        self.assertEqual(1, len(self.client.sent))
+
+    def test_batch_generator_closed(self):
+        def _writes():
+            with self.client.batch():
+                self.client.set_hostname("host")
+                yield
+
+        writes = _writes()
+        next(writes)
+        writes.close()
+        self.assertEqual([], self.client.sent)
+
+        self.client.set_hostname("host")
+        self.assertEqual(1, len(self.client.sent))
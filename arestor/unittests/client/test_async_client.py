@@ -0,0 +1,68 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sys
+import unittest
+
+from arestor.common import exception
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+@unittest.skipIf(sys.version_info < (3, 5),
+                 "The asynchronous client requires Python 3.5+.")
+class TestAsyncArestorClient(unittest.TestCase):
+
+    def setUp(self):
+        # NOTE: The module can not be parsed by the older interpreters.
+        from arestor.client import async_client
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.client = async_client.AsyncArestorClient(
+            "http://127.0.0.1/", "key", "secret", "instance-1")
+
+    def _done(self, result=None, error=None):
+        """Return a future which is already resolved."""
+        future = self.loop.create_future()
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+        return future
+
+    def test_delete_all_data_failures(self):
+        # NOTE: The fakes return futures instead of being coroutines, so
+        # the module can still be parsed by the older interpreters.
+        deleted = []
+
+        def _delete_resource(resource_id):
+            if resource_id == "r2":
+                return self._done(error=exception.ClientError(msg="failed"))
+            deleted.append(resource_id)
+            return self._done()
+
+        progress = []
+        self.client.resources = lambda **_: self._done(["r1", "r2", "r3"])
+        self.client.delete_resource = _delete_resource
+        summary = self.loop.run_until_complete(self.client.delete_all_data(
+            callback=lambda resource_id, error, done, total: progress.append(
+                (resource_id, error is None, total))))
+
+        self.assertEqual(["r1", "r3"], sorted(summary["deleted"]))
+        self.assertEqual(["r2"], list(summary["failed"]))
+        self.assertEqual([("r1", True, 3), ("r2", False, 3),
+                          ("r3", True, 3)], sorted(progress))
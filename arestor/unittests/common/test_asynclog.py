@@ -0,0 +1,105 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import logging
+from logging import handlers as logging_handlers
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from oslo_log import handlers as oslo_handlers
+import six
+
+from arestor.common import asynclog
+
+
+class _CustomHandler(logging.StreamHandler):
+
+    def emit(self, record):
+        pass
+
+
+class TestAsyncHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir, ignore_errors=True)
+        self.path = os.path.join(self.log_dir, "arestor.log")
+
+    def _logger(self, target):
+        """Return a logger which writes through an asynchronous handler."""
+        target.setFormatter(logging.Formatter("%(message)s"))
+        async_handler = asynclog.AsyncHandler([target], batch_size=64)
+        async_handler.start()
+        self.addCleanup(async_handler.close)
+        logger = logging.getLogger("arestor.unittests.%s" % self.id())
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(async_handler)
+        self.addCleanup(logger.removeHandler, async_handler)
+        return logger, async_handler
+
+    def _read(self, path):
+        with open(path) as file_handle:
+            return file_handle.read().splitlines()
+
+    def _handled(self, target):
+        """Log a record and return the records handled one at a time."""
+        handled = []
+        target.handle = handled.append
+        logger, async_handler = self._logger(target)
+        logger.info("message")
+        async_handler.flush()
+        return handled
+
+    def test_batched(self):
+        for target_class in (logging.StreamHandler,
+                             oslo_handlers.ColorHandler):
+            stream = six.StringIO()
+            self.assertEqual([], self._handled(target_class(stream)))
+            # NOTE: The colored handler resets the color at the end.
+            self.assertTrue(stream.getvalue().startswith("message"))
+            self.assertTrue(stream.getvalue().endswith("\n"))
+
+    def test_unbatched(self):
+        rotating = logging_handlers.RotatingFileHandler(self.path)
+        self.addCleanup(rotating.close)
+        for target in (rotating, _CustomHandler()):
+            self.assertEqual(["message"], [record.msg for record
+                                           in self._handled(target)])
+
+    @unittest.skipIf(sys.version_info < (3, 6),
+                     "WatchedFileHandler.reopenIfNeeded requires Python 3.6")
+    def test_watched_file(self):
+        target = logging_handlers.WatchedFileHandler(self.path)
+        self.addCleanup(target.close)
+        handled = []
+        target.handle = handled.append
+        logger, async_handler = self._logger(target)
+        for index in range(10):
+            logger.info("first %d", index)
+        async_handler.flush()
+        self.assertEqual(["first %d" % index for index in range(10)],
+                         self._read(self.path))
+
+        # NOTE: The file is moved away by logrotate.
+        os.rename(self.path, self.path + ".1")
+        logger.info("second")
+        async_handler.flush()
+        self.assertEqual(["second"], self._read(self.path))
+        self.assertEqual(10, len(self._read(self.path + ".1")))
+        self.assertEqual([], handled)
+        self.assertEqual(11, async_handler.written)
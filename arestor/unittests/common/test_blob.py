@@ -0,0 +1,101 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import fakeredis
+
+from arestor.common import blob
+from arestor import config as arestor_config
+
+CONFIG = arestor_config.CONFIG
+
+SMALL = "small"
+LARGE = "x" * 64
+OTHER = "y" * 64
+
+
+class TestBlobStore(unittest.TestCase):
+
+    def setUp(self):
+        CONFIG.set_override("enabled", True, group="blob")
+        CONFIG.set_override("min_size", 32, group="blob")
+        self.addCleanup(CONFIG.clear_override, "enabled", group="blob")
+        self.addCleanup(CONFIG.clear_override, "min_size", group="blob")
+        blob.CACHE.clear()
+        self.connection = fakeredis.FakeStrictRedis(decode_responses=True)
+
+    def _refs(self, value):
+        """Return the reference counter of the blob (None if missing)."""
+        refs = self.connection.hget(
+            blob.BLOB_KEY.format(digest=blob.digest(value)), "refs")
+        return None if refs is None else int(refs)
+
+    def test_small_values_are_inlined(self):
+        blob.write(self.connection, [("k1", {"f": SMALL})])
+        self.assertEqual(SMALL, self.connection.hget("k1", "f"))
+
+    def test_large_value_is_shared(self):
+        blob.write(self.connection, [("k1", {"f": LARGE}),
+                                     ("k2", {"f": LARGE})])
+        reference = blob.REFERENCE_PREFIX + blob.digest(LARGE)
+        self.assertEqual(reference, self.connection.hget("k1", "f"))
+        self.assertEqual(reference, self.connection.hget("k2", "f"))
+        self.assertEqual(2, self._refs(LARGE))
+
+    def test_overwrite_releases_blob(self):
+        blob.write(self.connection, [("k1", {"f": LARGE})])
+        blob.write(self.connection, [("k1", {"f": SMALL})])
+        self.assertIsNone(self._refs(LARGE))
+
+    def test_overwrite_several_keys(self):
+        blob.write(self.connection, [("k1", {"f": LARGE})])
+        blob.write(self.connection, [("k1", {"f": SMALL}),
+                                     ("k2", {"g": OTHER})])
+        self.assertIsNone(self._refs(LARGE))
+        self.assertEqual(1, self._refs(OTHER))
+
+    def test_overwrite_shared_blob(self):
+        blob.write(self.connection, [("k1", {"f": LARGE}),
+                                     ("k2", {"f": LARGE})])
+        blob.write(self.connection, [("k1", {"f": SMALL}),
+                                     ("k3", {"f": OTHER})])
+        self.assertEqual(1, self._refs(LARGE))
+
+    def test_rewrite_same_value(self):
+        blob.write(self.connection, [("k1", {"f": LARGE})])
+        blob.write(self.connection, [("k1", {"f": LARGE})])
+        self.assertEqual(1, self._refs(LARGE))
+
+    def test_delete_releases_blobs(self):
+        blob.write(self.connection, [("k1", {"f": LARGE, "g": OTHER}),
+                                     ("k2", {"f": LARGE})])
+        blob.delete(self.connection, ["k1"])
+        self.assertFalse(self.connection.exists("k1"))
+        self.assertEqual(1, self._refs(LARGE))
+        self.assertIsNone(self._refs(OTHER))
+
+        blob.delete(self.connection, ["k2"])
+        self.assertIsNone(self._refs(LARGE))
+
+    def test_resolve(self):
+        blob.write(self.connection, [("k1", {"f": LARGE, "g": SMALL})])
+        fields = self.connection.hgetall("k1")
+        self.assertEqual({"f": LARGE, "g": SMALL},
+                         blob.resolve_fields(self.connection, fields))
+        # NOTE: The blob is served from the cache the second time.
+        self.connection.delete(
+            blob.BLOB_KEY.format(digest=blob.digest(LARGE)))
+        self.assertEqual([LARGE], blob.resolve(
+            self.connection, [blob.REFERENCE_PREFIX + blob.digest(LARGE)]))
@@ -0,0 +1,70 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from arestor.common import configdrive
+
+
+class TestConfigDriveBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def _builder(self, script):
+        """Return a builder which runs the Python script as mkisofs."""
+        command = os.path.join(self.cache_dir, "mkisofs")
+        with open(command, "w") as file_handle:
+            file_handle.write("#!%s\n%s\n" % (sys.executable, script))
+        os.chmod(command, 0o755)
+        return configdrive.ConfigDriveBuilder(
+            os.path.join(self.cache_dir, "images"), command, 1)
+
+    def test_path_segments(self):
+        self.assertEqual(["openstack", "latest", "user_data"],
+                         configdrive.path_segments(
+                             "openstack/latest/user_data"))
+        for path in ("", "/etc/passwd", "openstack/../../etc",
+                     "openstack/./x", "openstack/content/.."):
+            self.assertRaises(ValueError, configdrive.path_segments, path)
+
+    def test_build(self):
+        builder = self._builder(
+            "import sys\n"
+            "open(sys.argv[sys.argv.index('-o') + 1], 'w').write('iso')")
+        path = builder.build({"openstack/latest/a": b"a"}).result(10)
+        self.assertEqual(["%s.iso" % configdrive.content_hash(
+            {"openstack/latest/a": b"a"})],
+            os.listdir(os.path.dirname(path)))
+
+    def test_build_failure(self):
+        builder = self._builder(
+            "import sys\n"
+            "open(sys.argv[sys.argv.index('-o') + 1], 'w').write('partial')\n"
+            "sys.exit(1)")
+        build = builder.build({"openstack/latest/a": b"a"})
+        self.assertRaises(subprocess.CalledProcessError, build.result, 10)
+        self.assertEqual([], os.listdir(os.path.join(self.cache_dir,
+                                                     "images")))
+
+    def test_build_invalid_path(self):
+        builder = self._builder("")
+        self.assertRaises(ValueError, builder.build,
+                          {"openstack/content/../../x": b"x"})
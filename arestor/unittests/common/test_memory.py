@@ -0,0 +1,68 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import unittest
+
+from arestor.common import memory
+
+
+class _RacingTracemalloc(object):
+
+    """Stop the session while the snapshot is being taken."""
+
+    def __init__(self, tracer):
+        self._tracer = tracer
+        self._tracemalloc = memory.tracemalloc
+        self.stop = None
+        self.stopped = None
+
+    def __getattr__(self, name):
+        return getattr(self._tracemalloc, name)
+
+    def take_snapshot(self):
+        self.stop = threading.Thread(target=self._tracer.stop)
+        self.stop.start()
+        self.stop.join(0.1)
+        self.stopped = not self.stop.is_alive()
+        return self._tracemalloc.take_snapshot()
+
+
+@unittest.skipIf(memory.tracemalloc is None, "requires tracemalloc")
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.tracer = memory.Tracer(max_snapshots=2)
+        self.addCleanup(self.tracer.stop, True)
+
+    def test_snapshot(self):
+        self.assertRaises(ValueError, self.tracer.snapshot)
+        self.tracer.start(60)
+        ids = [self.tracer.snapshot() for _ in range(3)]
+        self.assertEqual([2, 3], [snapshot["id"] for snapshot
+                                  in self.tracer.status()["snapshots"]])
+        self.assertEqual([1, 2, 3], ids)
+
+    def test_snapshot_while_stopping(self):
+        self.tracer.start(60)
+        racing = _RacingTracemalloc(self.tracer)
+        original, memory.tracemalloc = memory.tracemalloc, racing
+        try:
+            snapshot_id = self.tracer.snapshot()
+        finally:
+            memory.tracemalloc = original
+        self.assertFalse(racing.stopped)
+        self.assertEqual(1, snapshot_id)
+        racing.stop.join()
+        self.assertRaises(ValueError, self.tracer.snapshot)
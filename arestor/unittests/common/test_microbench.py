@@ -0,0 +1,46 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from arestor.common import microbench
+from arestor.common import util as arestor_util
+
+
+class TestMicroBenchmarks(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = arestor_util.RedisConnection().rcon
+        self.connection.flushdb()
+
+    def _run(self, name):
+        return microbench.run([name], repeat=1, min_time=0)["benchmarks"]
+
+    def test_user_manager(self):
+        self.connection.hset("user.secret", "microbench", "production")
+        self._run("tools.UserManager.load")
+        self.assertEqual({b"microbench": b"production"},
+                         self.connection.hgetall("user.secret"))
+
+    def test_user_manager_existing_key(self):
+        self.connection.hset("user.secret", microbench.API_KEY, "production")
+        results = self._run("tools.UserManager.load")
+        self.assertIn("skipped", results["tools.UserManager.load"])
+        self.assertEqual(b"production", self.connection.hget(
+            "user.secret", microbench.API_KEY))
+
+    def test_compare_skipped(self):
+        baseline = {"benchmarks": {"cipher.encrypt": {"median": 1.0}}}
+        current = {"benchmarks": {"cipher.encrypt": {"skipped": "reason"}}}
+        self.assertEqual([], microbench.compare(baseline, current))
@@ -0,0 +1,151 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import socket
+import unittest
+
+import fakeredis
+
+from arestor.common import network
+
+
+def _tree(*mappings):
+    """Return a radix tree with the received (network, value) mappings."""
+    trees = {socket.AF_INET: network.RadixTree(32),
+             socket.AF_INET6: network.RadixTree(128)}
+    for cidr, value in mappings:
+        family, prefix, length = network.parse_network(cidr)
+        trees[family].insert(prefix, length, value)
+    return trees
+
+
+def _lookup(trees, address):
+    """Return the value of the longest network which contains address."""
+    family, value = network.parse_address(address)
+    return trees[family].lookup(value)
+
+
+class TestParse(unittest.TestCase):
+
+    def test_parse_host_bits(self):
+        self.assertEqual((socket.AF_INET, 0x0a000000, 8),
+                         network.parse_network("10.1.2.3/8"))
+
+    def test_parse_host(self):
+        family, value, length = network.parse_network("2001:db8::1")
+        self.assertEqual((socket.AF_INET6, 128), (family, length))
+        self.assertEqual("2001:db8::1/128",
+                         network.format_network(family, value, length))
+
+    def test_parse_mapped_address(self):
+        self.assertEqual(network.parse_address("10.0.0.1"),
+                         network.parse_address("::ffff:10.0.0.1"))
+
+    def test_parse_invalid(self):
+        self.assertRaises(ValueError, network.parse_address, "10.0.0.256")
+        self.assertRaises(ValueError, network.parse_network, "10.0.0.0/33")
+
+
+class TestRadixTree(unittest.TestCase):
+
+    def test_longest_prefix(self):
+        trees = _tree(("10.0.0.0/8", "a"), ("10.1.0.0/16", "b"),
+                      ("10.1.2.0/24", "c"), ("10.1.2.3/32", "d"))
+        self.assertEqual("a", _lookup(trees, "10.200.0.1"))
+        self.assertEqual("b", _lookup(trees, "10.1.3.1"))
+        self.assertEqual("c", _lookup(trees, "10.1.2.4"))
+        self.assertEqual("d", _lookup(trees, "10.1.2.3"))
+        self.assertIsNone(_lookup(trees, "11.0.0.1"))
+
+    def test_insert_order(self):
+        trees = _tree(("10.1.2.0/24", "c"), ("10.1.0.0/16", "b"),
+                      ("10.0.0.0/8", "a"))
+        self.assertEqual("a", _lookup(trees, "10.2.0.1"))
+        self.assertEqual("b", _lookup(trees, "10.1.3.1"))
+        self.assertEqual("c", _lookup(trees, "10.1.2.4"))
+
+    def test_sibling_networks(self):
+        trees = _tree(("192.168.1.0/24", "a"), ("192.168.2.0/24", "b"))
+        self.assertEqual("a", _lookup(trees, "192.168.1.10"))
+        self.assertEqual("b", _lookup(trees, "192.168.2.10"))
+        self.assertIsNone(_lookup(trees, "192.168.3.10"))
+        self.assertEqual(2, len(trees[socket.AF_INET]))
+
+    def test_default_route(self):
+        trees = _tree(("0.0.0.0/0", "default"), ("10.0.0.0/8", "a"))
+        self.assertEqual("default", _lookup(trees, "8.8.8.8"))
+        self.assertEqual("a", _lookup(trees, "10.0.0.1"))
+
+    def test_update(self):
+        trees = _tree(("10.0.0.0/8", "a"), ("10.0.0.0/8", "b"))
+        self.assertEqual("b", _lookup(trees, "10.0.0.1"))
+        self.assertEqual(1, len(trees[socket.AF_INET]))
+
+    def test_ipv6(self):
+        trees = _tree(("2001:db8::/32", "a"), ("2001:db8:1::/48", "b"),
+                      ("10.0.0.0/8", "v4"))
+        self.assertEqual("a", _lookup(trees, "2001:db8:2::1"))
+        self.assertEqual("b", _lookup(trees, "2001:db8:1::1"))
+        self.assertIsNone(_lookup(trees, "2001:db9::1"))
+        self.assertIsNone(_lookup(trees, "::a00:1"))
+
+    def test_remove(self):
+        mappings = (("10.0.0.0/8", "a"), ("10.1.0.0/16", "b"),
+                    ("10.1.2.0/24", "c"), ("10.1.3.0/24", "d"))
+        trees = _tree(*mappings)
+        tree = trees[socket.AF_INET]
+
+        _, prefix, length = network.parse_network("10.1.2.0/24")
+        self.assertTrue(tree.remove(prefix, length))
+        self.assertFalse(tree.remove(prefix, length))
+        self.assertEqual("b", _lookup(trees, "10.1.2.4"))
+        self.assertEqual("d", _lookup(trees, "10.1.3.4"))
+
+        _, prefix, length = network.parse_network("10.1.0.0/16")
+        self.assertTrue(tree.remove(prefix, length))
+        self.assertEqual("a", _lookup(trees, "10.1.2.4"))
+        self.assertEqual("d", _lookup(trees, "10.1.3.4"))
+        self.assertEqual(2, len(tree))
+
+    def test_remove_missing(self):
+        trees = _tree(("10.0.0.0/8", "a"))
+        family, prefix, length = network.parse_network("10.0.0.0/16")
+        self.assertFalse(trees[family].remove(prefix, length))
+        self.assertEqual("a", _lookup(trees, "10.0.0.1"))
+
+
+class TestNetworkIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = fakeredis.FakeStrictRedis()
+        self.index = network.NetworkIndex()
+
+    def test_add_remove(self):
+        self.assertEqual("10.0.0.0/24", self.index.add(
+            self.connection, "10.0.0.7/24", "instance-1"))
+        self.assertEqual("instance-1",
+                         self.index.lookup("10.0.0.5", self.connection))
+        self.assertEqual({"10.0.0.0/24": "instance-1"},
+                         self.index.mappings(self.connection))
+
+        self.index.remove(self.connection, "10.0.0.0/24")
+        self.assertIsNone(self.index.lookup("10.0.0.5", self.connection))
+
+    def test_load(self):
+        self.connection.hset(network.NETWORKS_KEY, "2001:db8::/64",
+                             "instance-6")
+        self.connection.hset(network.NETWORKS_KEY, "invalid", "instance-0")
+        self.assertEqual("instance-6",
+                         self.index.lookup("2001:db8::1", self.connection))
+        self.assertIsNone(self.index.lookup("invalid", self.connection))
@@ -0,0 +1,110 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+import fakeredis
+
+from arestor import config as arestor_config
+from arestor.common import blob
+from arestor.common import template
+
+CONFIG = arestor_config.CONFIG
+
+
+def _data(name, **variables):
+    """Return the data of an instance which uses the template."""
+    data = {template.USER_DATA_TEMPLATE: {"name": name,
+                                          "variables": variables},
+            "hostname": "h"}
+    return data
+
+
+class _CountingRedis(fakeredis.FakeStrictRedis):
+
+    """Redis client which counts the commands it sends."""
+
+    commands = 0
+
+    def execute_command(self, *args, **kwargs):
+        self.commands += 1
+        return super(_CountingRedis, self).execute_command(*args, **kwargs)
+
+
+class TestTemplate(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = _CountingRedis()
+        for cache in (template.COMPILED, template.RENDERED, template.LOADED,
+                      blob.CACHE):
+            cache.clear()
+
+    def test_render(self):
+        self.assertEqual(1, template.store(self.connection, "t",
+                                           "$hostname $extra $unknown"))
+        self.assertEqual("h 1 $unknown", template.render(
+            "instance-1", _data("t", extra=1), self.connection))
+
+    def test_update(self):
+        template.store(self.connection, "t", "old $hostname")
+        self.assertEqual("old h", template.render(
+            "instance-1", _data("t"), self.connection))
+        self.assertEqual(2, template.store(self.connection, "t",
+                                           "new $hostname"))
+        self.assertEqual("new h", template.render(
+            "instance-1", _data("t"), self.connection))
+
+    def test_delete_and_create(self):
+        template.store(self.connection, "t", "old $hostname")
+        self.assertEqual("old h", template.render(
+            "instance-1", _data("t"), self.connection))
+
+        template.delete(self.connection, "t")
+        self.assertIsNone(template.render("instance-1", _data("t"),
+                                          self.connection))
+        self.assertEqual(2, template.store(self.connection, "t",
+                                           "NEW $hostname"))
+        self.assertEqual("NEW h", template.render(
+            "instance-1", _data("t"), self.connection))
+
+    def test_legacy_version(self):
+        self.connection.hset(template.template_key("t"), "version", 3)
+        self.assertEqual(4, template.store(self.connection, "t", "x"))
+
+    def test_large_template(self):
+        CONFIG.set_override("min_size", 16, group="blob")
+        self.addCleanup(CONFIG.clear_override, "min_size", group="blob")
+        content = "#cloud-config $hostname " + "x" * 32
+        template.store(self.connection, "t", content)
+        loaded = template.load(self.connection, "t")
+        self.assertEqual(blob.digest(content), loaded.digest)
+        self.assertEqual(content, loaded.compiled.template)
+
+    def test_cached_template(self):
+        CONFIG.set_override("cache_ttl", 60, group="template")
+        self.addCleanup(CONFIG.clear_override, "cache_ttl", group="template")
+        template.store(self.connection, "t", "$hostname")
+        template.render("instance-1", _data("t"), self.connection)
+
+        commands = self.connection.commands
+        self.assertEqual("h", template.render("instance-1", _data("t"),
+                                              self.connection))
+        self.assertEqual(commands, self.connection.commands)
+
+    def test_without_template(self):
+        self.assertIsNone(template.render("instance-1", {}, self.connection))
+        self.assertIsNone(template.render("instance-1", _data("missing"),
+                                          self.connection))
+        self.assertEqual(b"data", template.user_data(
+            "instance-1", {"user_data": "ZGF0YQ=="}, self.connection))
@@ -0,0 +1,173 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from arestor import api as arestor_api
+from arestor.client import base as base_client
+from arestor import config as arestor_config
+from arestor.common import tracing
+from arestor.unittests import base
+
+CONFIG = arestor_config.CONFIG
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+SPAN_ID = "00f067aa0ba902b7"
+
+
+class _Client(base.WSGIClientMixin, base_client.BaseClient):
+
+    """Client which talks to the application without a server."""
+
+    def __init__(self, application):
+        super(_Client, self).__init__("http://localhost/")
+        self.application = application
+
+
+class TestParseTraceparent(unittest.TestCase):
+
+    def test_valid(self):
+        self.assertEqual(
+            (TRACE_ID, SPAN_ID, True),
+            tracing.parse_traceparent("00-%s-%s-01" % (TRACE_ID, SPAN_ID)))
+        self.assertEqual(
+            (TRACE_ID, SPAN_ID, False),
+            tracing.parse_traceparent(" 00-%s-%s-00 " % (TRACE_ID.upper(),
+                                                         SPAN_ID)))
+
+    def test_invalid(self):
+        for value in (None, "", "garbage",
+                      "01-%s-%s-01" % (TRACE_ID, SPAN_ID),
+                      "00-%s-%s-01" % (TRACE_ID[1:], SPAN_ID),
+                      "00-%s-%s-01" % ("0" * 32, SPAN_ID),
+                      "00-%s-%s-01" % (TRACE_ID, "0" * 16)):
+            self.assertIsNone(tracing.parse_traceparent(value))
+
+
+class TestSpan(unittest.TestCase):
+
+    def test_as_zipkin(self):
+        span = tracing.Span("GET /", tracing.SERVICE_API, TRACE_ID, SPAN_ID,
+                            tracing.KIND_SERVER, timestamp=10)
+        span.tag("http.status_code", 200)
+        span.duration = 0
+        self.assertEqual("00-%s-%s-01" % (TRACE_ID, span.span_id),
+                         span.traceparent)
+        self.assertEqual({
+            "traceId": TRACE_ID, "id": span.span_id, "parentId": SPAN_ID,
+            "name": "GET /", "timestamp": 10000000, "duration": 1,
+            "kind": tracing.KIND_SERVER,
+            "localEndpoint": {"serviceName": tracing.SERVICE_API},
+            "tags": {"http.status_code": "200"},
+        }, span.as_zipkin())
+
+    def test_disabled(self):
+        tracing.disable()
+        with tracing.span("operation") as span:
+            self.assertIsNone(span)
+        self.assertIsNone(tracing.start_span("operation"))
+
+
+class _TracingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        trace_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, trace_dir, ignore_errors=True)
+        self.path = os.path.join(trace_dir, "trace.json")
+        self.addCleanup(tracing.disable)
+
+    def _lines(self):
+        with open(self.path) as file_handle:
+            return [json.loads(line) for line in file_handle]
+
+
+class TestFileExporter(_TracingTestCase):
+
+    def test_batches(self):
+        exporter = tracing.FileExporter(self.path, batch_size=2,
+                                        flush_interval=60)
+        for index in range(5):
+            exporter.export(tracing.Span("span-%d" % index,
+                                         tracing.SERVICE_API))
+        exporter.close()
+        lines = self._lines()
+        self.assertTrue(all(len(line) <= 2 for line in lines))
+        self.assertEqual(["span-%d" % index for index in range(5)],
+                         [span["name"] for line in lines for span in line])
+
+    def test_dropped(self):
+        exporter = tracing.FileExporter(self.path, batch_size=1)
+        exporter.close()
+        for _ in range(12):
+            exporter.export(tracing.Span("span", tracing.SERVICE_API))
+        self.assertEqual(2, exporter.dropped)
+        exporter.flush()
+        self.assertEqual(10, len(self._lines()))
+
+
+class TestPropagation(_TracingTestCase):
+
+    def setUp(self):
+        super(TestPropagation, self).setUp()
+        CONFIG.set_override("enabled", True, "tracing")
+        self.addCleanup(CONFIG.clear_override, "enabled", "tracing")
+        tracing.enable(self.path)
+        config = dict((path, options)
+                      for path, options in arestor_api.Root.config().items()
+                      if path != "global")
+        self.application = base.application(arestor_api.Root(), config)
+
+    def test_server_continues_trace(self):
+        status, _ = base.request(
+            self.application, "/v1/openstack/instance-1/openstack",
+            headers={"traceparent": "00-%s-%s-01" % (TRACE_ID, SPAN_ID)})
+        self.assertEqual(200, status)
+        tracing.disable()
+
+        spans = [span for line in self._lines() for span in line]
+        server = [span for span in spans
+                  if span.get("kind") == tracing.KIND_SERVER]
+        self.assertEqual(1, len(server))
+        self.assertEqual((TRACE_ID, SPAN_ID),
+                         (server[0]["traceId"], server[0]["parentId"]))
+        self.assertTrue(all(span["traceId"] == TRACE_ID for span in spans))
+
+    def test_server_not_sampled(self):
+        base.request(
+            self.application, "/v1/openstack/instance-1/openstack",
+            headers={"traceparent": "00-%s-%s-00" % (TRACE_ID, SPAN_ID)})
+        tracing.disable()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_client_to_server(self):
+        with _Client(self.application) as client:
+            with tracing.span("provision") as root:
+                response = client.get("v1/openstack/instance-1/openstack")
+        self.assertEqual(200, response.status_code)
+        tracing.disable()
+
+        spans = dict((span["name"], span)
+                     for line in self._lines() for span in line)
+        client_span = spans["GET /v1/openstack/instance-1/openstack"]
+        server_span = [span for span in spans.values()
+                       if span.get("kind") == tracing.KIND_SERVER][0]
+        self.assertEqual(root.span_id, client_span["parentId"])
+        self.assertEqual(tracing.KIND_CLIENT, client_span["kind"])
+        self.assertEqual(client_span["id"], server_span["parentId"])
+        self.assertEqual({root.trace_id},
+                         set(span["traceId"] for span in spans.values()))
@@ -0,0 +1,60 @@
+# Copyright 2017 Cloudbase Solutions Srl
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from arestor import config as arestor_config
+from arestor.common import tracing as arestor_tracing
+from arestor.common import util as arestor_util
+
+CONFIG = arestor_config.CONFIG
+
+
+class TestRedisConnection(unittest.TestCase):
+
+    def setUp(self):
+        arestor_tracing.disable()
+        self.addCleanup(CONFIG.clear_override, "metrics", "api")
+        self.addCleanup(CONFIG.clear_override, "debug_storage", "api")
+        self.addCleanup(CONFIG.clear_override, "slow_request_threshold",
+                        "api")
+
+    def _client(self, metrics, debug_storage, slow_request_threshold=0):
+        CONFIG.set_override("metrics", metrics, "api")
+        CONFIG.set_override("debug_storage", debug_storage, "api")
+        CONFIG.set_override("slow_request_threshold",
+                            slow_request_threshold, "api")
+        return arestor_util.RedisConnection().rcon
+
+    def test_plain_client(self):
+        client = self._client(False, False)
+        self.assertNotIsInstance(client, arestor_util.MeteredRedis)
+        self.assertTrue(client.ping())
+
+    def test_metered_client(self):
+        for options in ((True, False), (False, True), (False, False, 1)):
+            client = self._client(*options)
+            self.assertIsInstance(client, arestor_util.MeteredRedis)
+            self.assertTrue(client.ping())
+
+    def test_traced_client(self):
+        trace_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, trace_dir, ignore_errors=True)
+        arestor_tracing.enable(os.path.join(trace_dir, "trace.json"))
+        self.addCleanup(arestor_tracing.disable)
+        self.assertIsInstance(self._client(False, False),
+                              arestor_util.MeteredRedis)